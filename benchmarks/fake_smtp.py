@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import zlib
+from typing import Optional
+
+
+class FakeSMTPServer:
+    """
+    Local SMTP server answering the verification commands without
+    delivering anything. Every reply is delayed by `latency` seconds
+
+    The RCPT replies are deterministic for a given address: a share of
+    `temporary_ratio` of the addresses gets a 450 reply, a share of
+    `permanent_ratio` a 550 reply and the others are accepted. Addresses
+    whose local part does not start with `user_prefix`, such as the
+    random probes of the catch-all detection, are rejected unless the
+    server is a `catch_all` one. With `greylist`, the first RCPT of each
+    address is answered with 451
+
+    The server runs its own event loop in a background thread so that
+    both the synchronous and the asynchronous verifiers can use it
+
+    >>> with FakeSMTPServer(latency=0.005, permanent_ratio=0.1) as server:
+    ...     smtp_check_many(emails, ['127.0.0.1'], port=server.port)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0, temporary_ratio: float = 0, permanent_ratio: float = 0, greylist: bool = False, catch_all: bool = False, user_prefix: str = 'user'):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.temporary_ratio = temporary_ratio
+        self.permanent_ratio = permanent_ratio
+        self.greylist = greylist
+        self.catch_all = catch_all
+        self.user_prefix = user_prefix.upper()
+        self.connections = 0
+        self.commands = 0
+        self._greylisted = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.host}:{self.port}>'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _get_rcpt_reply(self, command: str) -> bytes:
+        address = command.partition(':')[2].strip().strip('<>')
+        user = address.rpartition('@')[0]
+
+        if self.greylist and address not in self._greylisted:
+            self._greylisted.add(address)
+            return b'451 Greylisted, try again later\r\n'
+
+        if self.catch_all:
+            return b'250 OK\r\n'
+
+        if not user.startswith(self.user_prefix):
+            return b'550 No such user\r\n'
+
+        # The same address always gets the same reply
+        score = (zlib.crc32(address.encode()) % 10000) / 10000
+        if score < self.temporary_ratio:
+            return b'450 Mailbox unavailable\r\n'
+        elif score < self.temporary_ratio + self.permanent_ratio:
+            return b'550 No such user\r\n'
+        return b'250 OK\r\n'
+
+    async def _reply(self, writer: asyncio.StreamWriter, reply: bytes):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(reply)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            await self._reply(writer, b'220 localhost ESMTP\r\n')
+            while line := await reader.readline():
+                self.commands += 1
+                command = line.decode(errors='replace').strip().upper()
+
+                if command.startswith('EHLO'):
+                    reply = b'250-localhost\r\n250 SIZE 10240000\r\n'
+                elif command.startswith('RCPT'):
+                    reply = self._get_rcpt_reply(command)
+                elif command.startswith('QUIT'):
+                    await self._reply(writer, b'221 Bye\r\n')
+                    break
+                else:
+                    reply = b'250 OK\r\n'
+                await self._reply(writer, reply)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def start(self) -> int:
+        """Starts the server and returns the port it listens on"""
+        started = threading.Event()
+
+        async def serve():
+            self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self):
+        if self._loop is None or self._server is None or self._thread is None:
+            return
+
+        # The open sessions are dropped with the loop
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
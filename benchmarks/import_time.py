@@ -0,0 +1,124 @@
+"""
+Import time of the entry points of the package. Each module is imported
+in a fresh interpreter with `-X importtime` so that nothing is cached
+between two measures and the best of `--repeat` runs is reported
+
+    $ python -m benchmarks.import_time
+    $ python -m benchmarks.import_time --modules py_email_verifier.syntax --repeat 20
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+ENTRY_POINTS = (
+    'py_email_verifier.syntax',
+    'py_email_verifier.validators',
+    'py_email_verifier.pipeline',
+    'py_email_verifier.verifiers.dns_verifier',
+    'py_email_verifier.verifiers.smtp_verifier'
+)
+
+# Packages that are only loaded once an address goes
+# through the DNS or SMTP checks
+LAZY_MODULES = ('asgiref', 'asyncio', 'dns', 'idna', 'smtplib', 'sqlite3', 'ssl')
+
+# The syntax entry point does not load these
+# either, they take longer than the checks
+SYNTAX_LAZY_MODULES = LAZY_MODULES + ('logging', 'typing')
+
+# Import time of the syntax entry point in seconds. The budget is
+# generous for slow machines, a regression loading one of the lazy
+# modules is caught by the module checks
+SYNTAX_IMPORT_BUDGET = 0.05
+
+# The json module is imported last since it
+# would otherwise preload the re module
+_SCRIPT = (
+    'import sys\n'
+    'before = set(sys.modules)\n'
+    'import {module}\n'
+    'loaded = sorted(set(sys.modules) - before)\n'
+    'import json\n'
+    'print(json.dumps(loaded))\n'
+)
+
+
+def parse_import_time(output: str, module: str) -> float:
+    """Returns the cumulative import time of the module, in seconds,
+    from the output of `python -X importtime`"""
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() == module and not name[1:].startswith(' '):
+            return int(cumulative) / 1_000_000
+    raise ValueError(f'No import time for {module}')
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """Imports the module in a new interpreter and returns its import
+    time and the modules that were loaded by the import"""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _SCRIPT.format(module=module)],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return parse_import_time(process.stderr, module), json.loads(process.stdout)
+
+
+def get_lazy_modules_loaded(loaded: List[str], lazy_modules: Tuple[str, ...] = LAZY_MODULES) -> List[str]:
+    return sorted({name.split('.')[0] for name in loaded} & set(lazy_modules))
+
+
+def benchmark(module: str, repeat: int = 5) -> Dict[str, Any]:
+    timings = []
+    loaded: List[str] = []
+    for _ in range(repeat):
+        seconds, loaded = measure_import(module)
+        timings.append(seconds)
+
+    return {
+        'module': module,
+        'best_ms': round(min(timings) * 1000, 2),
+        'median_ms': round(sorted(timings)[len(timings) // 2] * 1000, 2),
+        'modules': len(loaded),
+        'lazy_modules_loaded': ','.join(get_lazy_modules_loaded(loaded, SYNTAX_LAZY_MODULES)) or '-'
+    }
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    columns = ('module', 'best_ms', 'median_ms', 'modules', 'lazy_modules_loaded')
+    rows = [columns] + [tuple(str(item[x]) for x in columns) for item in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return '\n'.join('  '.join(value.ljust(width) for value, width in zip(row, widths)) for row in rows)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Import time of the entry points of the package')
+    parser.add_argument('--modules', default=','.join(ENTRY_POINTS), help='Comma separated modules to import')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of fresh interpreters for each module')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON lines')
+    return parser
+
+
+def main(argv=None):
+    namespace = build_parser().parse_args(argv)
+
+    results = []
+    for module in namespace.modules.split(','):
+        result = benchmark(module.strip(), repeat=namespace.repeat)
+        results.append(result)
+
+        if namespace.json:
+            print(json.dumps(result), flush=True)
+
+    if not namespace.json:
+        print(format_table(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Offline benchmarks of the verification paths. A local fake SMTP server
+and a stub DNS resolver replace the network so that the numbers can be
+compared between two revisions
+
+    $ python -m benchmarks.run --addresses 2000 --domains 20 --latency 0.002
+    $ python -m benchmarks.run --modes async,batch --permanent-ratio 0.2 --greylist
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fake_smtp import FakeSMTPServer
+from benchmarks.stub_dns import StubResolver
+from py_email_verifier import resolvers
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.pipeline import run_pipeline
+from py_email_verifier.verifiers import dns_verifier, smtp_verifier
+from py_email_verifier.verifiers.async_smtp_verifier import async_smtp_check
+from py_email_verifier.verifiers.dns_verifier import (async_verify_dns,
+                                                      verify_dns)
+from py_email_verifier.verifiers.smtp_verifier import (smtp_check,
+                                                       smtp_check_many)
+
+MODES = ('sync', 'async', 'batch', 'pipeline')
+
+
+def generate_addresses(count: int, domains: int) -> List[str]:
+    return [f'user{i}@domain{i % domains}.test' for i in range(count)]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_sync(addresses: List[str], port: int, concurrency: int, **kwargs) -> List[float]:
+    """One `SMTPVerifier` session for each address"""
+    def verify(address):
+        start = time.perf_counter()
+        email = EmailAddress(address)
+        try:
+            mx_records = verify_dns(email)
+            smtp_check(email, mx_records, port=port, **kwargs)
+        except Exception:
+            pass
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(verify, addresses))
+
+
+def run_async(addresses: List[str], port: int, concurrency: int, **kwargs) -> List[float]:
+    """One `AsyncSMTPVerifier` session for each address"""
+    kwargs.pop('check_catch_all', None)
+
+    async def verify(address, semaphore):
+        async with semaphore:
+            start = time.perf_counter()
+            email = EmailAddress(address)
+            try:
+                mx_records = await async_verify_dns(email)
+                await async_smtp_check(email, mx_records, port=port, **kwargs)
+            except Exception:
+                pass
+            return time.perf_counter() - start
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(verify(address, semaphore) for address in addresses))
+
+    return list(asyncio.run(main()))
+
+
+def run_batch(addresses: List[str], port: int, concurrency: int, **kwargs) -> List[float]:
+    """The addresses of each domain share a single session. The
+    latency of an address is the one of its whole batch"""
+    groups: Dict[str, List[EmailAddress]] = {}
+    for address in addresses:
+        email = EmailAddress(address)
+        groups.setdefault(email.ace_formatted_domain, []).append(email)
+
+    def verify(emails):
+        start = time.perf_counter()
+        try:
+            mx_records = verify_dns(emails[0])
+            smtp_check_many(emails, mx_records, port=port, **kwargs)
+        except Exception:
+            pass
+        return [time.perf_counter() - start] * len(emails)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return [latency for batch in executor.map(verify, groups.values()) for latency in batch]
+
+
+def run_streaming(addresses: List[str], port: int, concurrency: int, **kwargs) -> List[float]:
+    """The streaming pipeline, which only reports the throughput"""
+    stream = io.StringIO('\n'.join(addresses))
+    run_pipeline(stream, io.StringIO(), port=port, **kwargs)
+    return []
+
+
+RUNNERS: Dict[str, Callable[..., List[float]]] = {
+    'sync': run_sync,
+    'async': run_async,
+    'batch': run_batch,
+    'pipeline': run_streaming
+}
+
+
+def benchmark(mode: str, addresses: List[str], server_options: Dict[str, Any], dns_latency: float = 0, concurrency: int = 50, trace_memory: bool = True, **kwargs) -> Dict[str, Any]:
+    # Every mode starts with cold caches and a new server
+    dns_verifier.mx_cache.clear()
+    dns_verifier.host_address_cache.clear()
+    smtp_verifier.catch_all_cache.clear()
+    previous = resolvers.set_resolver(StubResolver(latency=dns_latency))
+
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        with FakeSMTPServer(**server_options) as server:
+            start = time.perf_counter()
+            latencies = RUNNERS[mode](addresses, server.port, concurrency, **kwargs)
+            elapsed = time.perf_counter() - start
+            connections = server.connections
+    finally:
+        resolvers.set_resolver(previous)
+        peak = None
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    p50 = percentile(latencies, 0.5)
+    p99 = percentile(latencies, 0.99)
+    return {
+        'mode': mode,
+        'addresses': len(addresses),
+        'seconds': round(elapsed, 3),
+        'addresses_per_second': round(len(addresses) / elapsed, 1),
+        'p50_ms': None if p50 is None else round(p50 * 1000, 2),
+        'p99_ms': None if p99 is None else round(p99 * 1000, 2),
+        'peak_memory_mb': None if peak is None else round(peak / 1024 / 1024, 2),
+        'connections': connections
+    }
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    columns = ('mode', 'addresses', 'seconds', 'addresses_per_second', 'p50_ms', 'p99_ms', 'peak_memory_mb', 'connections')
+    rows = [columns] + [tuple('-' if item[x] is None else str(item[x]) for x in columns) for item in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return '\n'.join('  '.join(value.rjust(width) for value, width in zip(row, widths)) for row in rows)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the verification paths')
+    parser.add_argument('--modes', default=','.join(MODES), help=f"Comma separated modes among {', '.join(MODES)}")
+    parser.add_argument('--addresses', type=int, default=1000)
+    parser.add_argument('--domains', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=50, help='Threads, or tasks for the async mode')
+    parser.add_argument('--latency', type=float, default=0.001, help='Delay of each SMTP reply in seconds')
+    parser.add_argument('--dns-latency', type=float, default=0.001, help='Delay of each DNS query in seconds')
+    parser.add_argument('--temporary-ratio', type=float, default=0.05, help='Share of the addresses getting a 450 reply')
+    parser.add_argument('--permanent-ratio', type=float, default=0.1, help='Share of the addresses getting a 550 reply')
+    parser.add_argument('--greylist', action='store_true', help='Greylist the first RCPT of each address')
+    parser.add_argument('--catch-all', action='store_true', help='Accept every recipient')
+    parser.add_argument('--no-catch-all-check', dest='check_catch_all', action='store_false', help='Skip the catch-all detection')
+    parser.add_argument('--no-memory', dest='trace_memory', action='store_false', help='Do not trace the memory, which slows the run down')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON lines')
+    return parser
+
+
+def main(argv=None):
+    namespace = build_parser().parse_args(argv)
+
+    addresses = generate_addresses(namespace.addresses, namespace.domains)
+    server_options = {
+        'latency': namespace.latency,
+        'temporary_ratio': namespace.temporary_ratio,
+        'permanent_ratio': namespace.permanent_ratio,
+        'greylist': namespace.greylist,
+        'catch_all': namespace.catch_all
+    }
+
+    results = []
+    for mode in namespace.modes.split(','):
+        result = benchmark(
+            mode.strip(),
+            addresses,
+            server_options,
+            dns_latency=namespace.dns_latency,
+            concurrency=namespace.concurrency,
+            trace_memory=namespace.trace_memory,
+            check_catch_all=namespace.check_catch_all
+        )
+        results.append(result)
+
+        if namespace.json:
+            print(json.dumps(result), flush=True)
+
+    if not namespace.json:
+        print(format_table(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union, cast
+
+import dns.message
+import dns.name
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+from dns import resolver
+from dns.resolver import Answer
+
+MXRecords = Iterable[Union[str, Tuple[int, str]]]
+
+
+class StubResolver:
+    """
+    Answers the MX queries from memory so that the benchmarks do not
+    depend on the network. Every domain that is not in `records` is
+    answered with `default`, unless `default` is None in which case
+    NXDOMAIN is raised, and a domain without any record gets NoAnswer.
+    Records are either a host or a `(preference, host)` tuple and
+    `latency` simulates the round trip to the server
+
+    The A and AAAA queries are answered from `addresses`. The addresses
+    of the MX hosts are also sent in the additional section of the MX
+    answers, like most servers do
+
+    >>> stub = StubResolver({'gmail.com': [(5, 'mx1.local'), (10, 'mx2.local')]}, addresses={'mx1.local': ['127.0.0.1']})
+    ... set_resolver(stub)
+    """
+
+    def __init__(self, records: Optional[Dict[str, MXRecords]] = None, default: Optional[MXRecords] = ('127.0.0.1',), addresses: Optional[Dict[str, Iterable[str]]] = None, latency: float = 0, ttl: int = 300):
+        self.records = {key.lower(): value for key, value in (records or {}).items()}
+        self.default = default
+        self.addresses = {key.lower(): list(value) for key, value in (addresses or {}).items()}
+        self.latency = latency
+        self.ttl = ttl
+        self.queries = 0
+
+    def _get_records(self, domain: str) -> List[Tuple[int, str]]:
+        records = self.records.get(domain.lower().rstrip('.'), self.default)
+        if records is None:
+            raise resolver.NXDOMAIN()
+
+        result = []
+        for index, record in enumerate(records):
+            if isinstance(record, str):
+                record = ((index + 1) * 10, record)
+            result.append(record)
+        return result
+
+    def _get_addresses(self, host: str, rdtype) -> List[str]:
+        addresses = self.addresses.get(host.lower().rstrip('.'), [])
+        is_ipv6 = rdtype == dns.rdatatype.AAAA
+        return [address for address in addresses if (':' in address) == is_ipv6]
+
+    def _add_rrset(self, response: dns.message.Message, section, name: dns.name.Name, rdtype, values: List[str]):
+        rrset = response.find_rrset(section, name, dns.rdataclass.IN, rdtype, create=True)
+        rrset.update(dns.rrset.from_text_list(name, self.ttl, dns.rdataclass.IN, rdtype, values))
+
+    def _build_answer(self, qname: str, rdtype=dns.rdatatype.MX) -> Answer:
+        name = dns.name.from_text(qname)
+        query = dns.message.make_query(name, rdtype)
+        response = cast(dns.message.QueryMessage, dns.message.make_response(query))
+
+        if rdtype in (dns.rdatatype.A, dns.rdatatype.AAAA):
+            values = self._get_addresses(qname, rdtype)
+            if not values:
+                raise resolver.NoAnswer()
+            self._add_rrset(response, response.answer, name, rdtype, values)
+            return Answer(name, rdtype, dns.rdataclass.IN, response)
+
+        records = self._get_records(qname)
+        if not records:
+            raise resolver.NoAnswer()
+
+        values = [f'{preference} {host}.' for preference, host in records]
+        self._add_rrset(response, response.answer, name, dns.rdatatype.MX, values)
+
+        for _, host in records:
+            for address_type in (dns.rdatatype.A, dns.rdatatype.AAAA):
+                addresses = self._get_addresses(host, address_type)
+                if addresses:
+                    host_name = dns.name.from_text(host)
+                    self._add_rrset(response, response.additional, host_name, address_type, addresses)
+        return Answer(name, dns.rdatatype.MX, dns.rdataclass.IN, response)
+
+    def resolve(self, qname: str, rdtype=dns.rdatatype.MX, lifetime: Optional[float] = None) -> Answer:
+        self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._build_answer(qname, rdtype)
+
+    async def async_resolve(self, qname: str, rdtype=dns.rdatatype.MX, lifetime: Optional[float] = None) -> Answer:
+        self.queries += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._build_answer(qname, rdtype)
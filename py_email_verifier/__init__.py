@@ -1,8 +1,14 @@
-import logging
-
-
-class Logger:
-    pass
-
-
-logger = Logger()
+# The logging package is only imported by the modules that
+# log something so that the syntax checks start up quickly
+_logger = None
+
+
+def __getattr__(name):
+    global _logger
+    if name == 'logger':
+        if _logger is None:
+            import logging
+            _logger = logging.getLogger('py_email_verifier')
+            _logger.addHandler(logging.NullHandler())
+        return _logger
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
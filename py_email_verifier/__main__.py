@@ -0,0 +1,132 @@
+import argparse
+import sys
+
+from py_email_verifier.blacklist import blacklist
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.pipeline import open_input, verify_file
+from py_email_verifier.store import VerificationStore
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='py_email_verifier',
+        description='Verify the deliverability of email addresses'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    verify = subparsers.add_parser(
+        'verify',
+        help='Stream a CSV, JSONL or text file of addresses through the verification pipeline'
+    )
+    verify.add_argument('input', help="Path to the input file or '-' for the standard input")
+    verify.add_argument('-o', '--output', default='-', help='Path to the JSONL output file')
+    verify.add_argument('--format', dest='file_format', choices=['csv', 'jsonl', 'text'], help='Format of the input, detected from the extension by default')
+    verify.add_argument('--column', default='email', help='Column or key holding the address in CSV and JSONL inputs')
+    verify.add_argument('--checkpoint', dest='checkpoint_path', help='File used to resume an interrupted run')
+    verify.add_argument('--no-blacklist', dest='check_blacklist', action='store_false', help='Skip the disposable and blocked domain checks')
+    verify.add_argument('--blacklist', dest='blacklist_paths', action='append', default=[], metavar='PATH', help='Additional file of blocked domains, one per line')
+    verify.add_argument('--cache', dest='cache_path', metavar='PATH', help='SQLite file keeping the results between runs')
+    verify.add_argument('--no-dns', dest='check_dns', action='store_false', help='Skip the DNS and SMTP checks')
+    verify.add_argument('--no-smtp', dest='check_smtp', action='store_false', help='Skip the SMTP checks')
+    verify.add_argument('--dns-timeout', type=int, default=10)
+    verify.add_argument('--nameserver', dest='nameservers', action='append', default=[], metavar='IP', help='DNS server to query instead of the system ones, can be repeated')
+    verify.add_argument('--race-after', type=float, default=0.2, help='Seconds before a slow DNS query is also sent to another nameserver')
+    verify.add_argument('--smtp-timeout', dest='timeout', type=int, default=10)
+    verify.add_argument('--helo-host', help='Host name used in the EHLO/HELO command')
+    verify.add_argument('--from-address', help='Address used in the MAIL FROM command')
+    verify.add_argument('--source-address', metavar='IP', help='Local address the SMTP connections leave from')
+    verify.add_argument('--identity', dest='identities', action='append', default=[], metavar='IP[,HELO[,MAIL_FROM]]', help='Sender identity the SMTP sessions are spread over, can be repeated')
+    verify.add_argument('--identity-rate', type=float, default=1, help='Maximum number of new SMTP sessions per second for each identity')
+    verify.add_argument('--identity-strategy', choices=['round_robin', 'least_loaded'], default='round_robin', help='How the identities are assigned to the sessions')
+    verify.add_argument('--retry-temporary', action='store_true', help='Rate limit the SMTP sessions and retry the temporary failures, greylisting included, with a backoff')
+    verify.add_argument('--max-retries', type=int, default=3, help='Number of retries of a temporary failure with --retry-temporary')
+    verify.add_argument('--greylist-delay', type=float, default=300, help='Seconds before retrying a greylisted address with --retry-temporary')
+    verify.add_argument('--host-rate', type=float, default=1, help='Maximum number of SMTP sessions per second for each MX host and worker with --retry-temporary')
+    verify.add_argument('--batch-size', type=int, default=100, help='Number of rows grouped by domain before the SMTP checks')
+    verify.add_argument('--workers', type=int, default=1, help='Number of processes, the addresses are sharded between them by domain')
+    verify.add_argument('--queue-size', type=int, default=1000, help='Maximum number of rows buffered between two stages')
+
+    convert = subparsers.add_parser('convert', help='Convert the JSONL output of the verify command to the compact binary format')
+    convert.add_argument('input', help="Path to the JSONL results or '-' for the standard input")
+    convert.add_argument('output', help='Path to the binary file')
+    convert.add_argument('--chunk-size', type=int, default=65536, help='Number of results in each chunk of the file')
+
+    prune = subparsers.add_parser('prune', help='Delete the expired entries of a result cache')
+    prune.add_argument('cache_path', metavar='PATH', help='Path to the SQLite cache file')
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    namespace = parser.parse_args(argv)
+
+    if namespace.command == 'verify':
+        options = vars(namespace)
+        options.pop('command')
+
+        from_address = options.pop('from_address')
+        if from_address is not None:
+            options['from_address'] = EmailAddress(from_address)
+
+        identities = options.pop('identities')
+        identity_rate = options.pop('identity_rate')
+        identity_strategy = options.pop('identity_strategy')
+        if identities:
+            from py_email_verifier.verifiers.identities import (IdentityPool,
+                                                                parse_identity)
+            options['identities'] = IdentityPool(
+                [parse_identity(value) for value in identities],
+                strategy=identity_strategy,
+                rate=identity_rate
+            )
+
+        scheduling = {
+            'max_retries': options.pop('max_retries'),
+            'greylist_delay': options.pop('greylist_delay'),
+            'host_rate': options.pop('host_rate')
+        }
+        if options.pop('retry_temporary'):
+            options['scheduling'] = scheduling
+
+        nameservers = options.pop('nameservers')
+        race_after = options.pop('race_after')
+        if nameservers:
+            from py_email_verifier import resolvers
+            resolvers.configure(nameservers, race_after=race_after)
+
+        cache_path = options.pop('cache_path')
+        store = VerificationStore(cache_path) if cache_path is not None else None
+        options['store'] = store
+
+        blacklist_paths = options.pop('blacklist_paths')
+        if options.pop('check_blacklist'):
+            for path in blacklist_paths:
+                blacklist.add_path(path)
+            options['check_blacklist'] = blacklist.is_blacklisted
+
+        try:
+            count = verify_file(options.pop('input'), **options)
+        finally:
+            if store is not None:
+                store.close()
+        print(f'Verified {count} addresses', file=sys.stderr)
+    elif namespace.command == 'convert':
+        from py_email_verifier.results import convert_json_lines
+
+        stream = open_input(namespace.input)
+        try:
+            count = convert_json_lines(stream, namespace.output, chunk_size=namespace.chunk_size)
+        finally:
+            if namespace.input != '-':
+                stream.close()
+        print(f'Converted {count} results', file=sys.stderr)
+    elif namespace.command == 'prune':
+        with VerificationStore(namespace.cache_path) as store:
+            deleted = store.prune()
+        for table, count in deleted.items():
+            print(f'{table}: {count} expired entries deleted', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from typing import (TYPE_CHECKING, Dict, FrozenSet, Iterable, Optional, Tuple,
+                    Union)
+
+from py_email_verifier.domains import normalize_domain
+
+if TYPE_CHECKING:
+    from py_email_verifier.models import EmailAddress
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+DISPOSABLE_DOMAINS_PATH = os.path.join(DATA_DIR, 'disposable_domains.txt')
+
+
+def _normalize_entry(entry: str) -> Optional[str]:
+    info = normalize_domain(entry.strip().rstrip('.'))
+    if info.ace_formatted_domain is None:
+        return None
+    return info.ace_formatted_domain.lower()
+
+
+def parse_domains(lines: Iterable[str]) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Parses a domain list with one domain per line and returns the
+    exact domains and the suffix rules. An entry starting with a dot,
+    or with `*.`, blocks the domain and every one of its subdomains
+
+    >>> parse_domains(['mailinator.com', '.yopmail.com'])
+    ... (frozenset({'mailinator.com'}), frozenset({'yopmail.com'}))
+    """
+    domains = set()
+    suffixes = set()
+
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+
+        is_suffix = line.startswith(('.', '*.'))
+        entry = _normalize_entry(line.lstrip('*.'))
+        if entry is None:
+            continue
+
+        if is_suffix:
+            suffixes.add(entry)
+        else:
+            domains.add(entry)
+    return frozenset(domains), frozenset(suffixes)
+
+
+class Blacklist:
+    """
+    Answers whether the domain of an address is blacklisted. The
+    domains are kept in frozensets so that an exact lookup is O(1) and
+    a suffix lookup is O(number of labels of the domain)
+
+    The files are checked for changes at most every `check_interval`
+    seconds and are reloaded when their modification time changes which
+    allows updating the lists of running workers without restarting them
+
+    >>> blacklist = Blacklist(['/path/to/domains.txt'], domains=['example.com'])
+    ... blacklist.is_blacklisted(EmailAddress('foo@example.com'))
+    ... True
+    """
+
+    def __init__(self, paths: Optional[Iterable[str]] = None, domains: Optional[Iterable[str]] = None, suffixes: Optional[Iterable[str]] = None, check_interval: float = 30, timer=time.monotonic):
+        self.paths = list(paths or [])
+        self.check_interval = check_interval
+        self.timer = timer
+        self._extra_domains, extra_suffixes = parse_domains(domains or [])
+        self._extra_suffixes = extra_suffixes | parse_domains(f'.{x}' for x in suffixes or [])[1]
+        self._mtimes: Dict[str, Optional[float]] = {}
+        self._index: Tuple[FrozenSet[str], FrozenSet[str]] = (frozenset(), frozenset())
+        self._checked_at = timer()
+        self._lock = threading.Lock()
+        self.reload()
+
+    def __repr__(self):
+        domains, suffixes = self._index
+        return f'<{self.__class__.__name__}: {len(domains)} domains, {len(suffixes)} suffixes>'
+
+    def __len__(self):
+        domains, suffixes = self._index
+        return len(domains) + len(suffixes)
+
+    def __contains__(self, value: Union[str, 'EmailAddress']):
+        return self.is_blacklisted(value)
+
+    def __getstate__(self):
+        # The lock cannot be sent to the worker processes
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get_mtimes(self) -> Dict[str, Optional[float]]:
+        mtimes = {}
+        for path in self.paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def reload(self):
+        """Reads the files again and swaps the index in a single
+        assignment so that concurrent lookups are never blocked"""
+        with self._lock:
+            mtimes = self._get_mtimes()
+            domains = set(self._extra_domains)
+            suffixes = set(self._extra_suffixes)
+
+            for path, mtime in mtimes.items():
+                if mtime is None:
+                    continue
+
+                with open(path, encoding='utf-8') as f:
+                    file_domains, file_suffixes = parse_domains(f)
+                domains.update(file_domains)
+                suffixes.update(file_suffixes)
+
+            self._index = (frozenset(domains), frozenset(suffixes))
+            self._mtimes = mtimes
+            self._checked_at = self.timer()
+
+    def add_path(self, path: str):
+        if path not in self.paths:
+            self.paths.append(path)
+            self.reload()
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the files when one of them changed since the last
+        load and returns True if the lists were reloaded"""
+        if self.timer() - self._checked_at < self.check_interval:
+            return False
+
+        self._checked_at = self.timer()
+        if self._get_mtimes() == self._mtimes:
+            return False
+
+        self.reload()
+        return True
+
+    def is_blacklisted_domain(self, domain: str) -> bool:
+        self.reload_if_changed()
+        domains, suffixes = self._index
+
+        domain = domain.lower().rstrip('.')
+        if domain in domains or domain in suffixes:
+            return True
+
+        # Walk up the parent domains: a.b.example.com,
+        # b.example.com, example.com and com
+        index = domain.find('.')
+        while index != -1:
+            if domain[index + 1:] in suffixes:
+                return True
+            index = domain.find('.', index + 1)
+        return False
+
+    def is_blacklisted(self, value: Union[str, 'EmailAddress']) -> bool:
+        """Returns True if the domain of the email address, or the
+        domain itself when a string without @ is given, is blacklisted"""
+        if isinstance(value, str):
+            domain = value.rpartition('@')[2]
+            ace_formatted_domain = normalize_domain(domain).ace_formatted_domain
+            return ace_formatted_domain is not None and self.is_blacklisted_domain(ace_formatted_domain)
+
+        if value.ace_formatted_domain is None:
+            return False
+        return self.is_blacklisted_domain(value.ace_formatted_domain)
+
+
+blacklist = Blacklist([DISPOSABLE_DOMAINS_PATH])
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """A thread safe cache that expires its entries after a
+    given time to live and evicts the least recently used
+    entries when it grows beyond `maxsize`
+
+    >>> cache = TTLCache(maxsize=100, ttl=60)
+    ... cache.set('gmail.com', {'gmail-smtp-in.l.google.com'})
+    ... cache.get('gmail.com')
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: 'OrderedDict[Hashable, tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self)}/{self.maxsize}>'
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable):
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > self.timer()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires, value = item
+            if expires <= self.timer():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Stores the value for the key. When `ttl` is not
+        provided, the default time to live of the cache is used"""
+        ttl = self.ttl if ttl is None else ttl
+
+        with self._lock:
+            if ttl <= 0:
+                self._data.pop(key, None)
+                return
+
+            self._data[key] = (self.timer() + ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def expire(self):
+        """Removes all the entries that have expired"""
+        with self._lock:
+            now = self.timer()
+            expired = [key for key, item in self._data.items() if item[0] <= now]
+            for key in expired:
+                del self._data[key]
+            return len(expired)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate
+        }
@@ -0,0 +1,61 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from py_email_verifier.constants import HOST_REGEX, LITERAL_REGEX
+
+# Maximum number of raw domains kept by the normalisation cache
+DOMAIN_CACHE_SIZE = 100000
+
+
+class DomainInfo(namedtuple('DomainInfo', ('domain', 'ace_formatted_domain', 'literal_ip', 'is_valid', 'idna_error'), defaults=(None,))):
+    """Normalised form of the domain part of an email address. The
+    syntax checks depend on it, which is why it does not use the
+    typing module that takes longer to import than the checks"""
+
+    __slots__ = ()
+
+
+def _is_ipv6_address(value: str) -> bool:
+    # Only the literal domains need the ipaddress module
+    from ipaddress import IPv6Address
+
+    try:
+        IPv6Address(value)
+    except ValueError:
+        return False
+    else:
+        return True
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def normalize_domain(domain: str) -> DomainInfo:
+    """Returns the ASCII-compatible encoding of the domain, the IP
+    address of a literal domain such as `[IPv6:...]` and whether the
+    domain passes the syntax checks. The result is memoised for each
+    raw domain so repeated domains only cost a dictionary lookup
+
+    >>> normalize_domain('bücher.de')
+    ... DomainInfo(domain='bücher.de', ace_formatted_domain='xn--bcher-kva.de', ...)
+    """
+    if domain.startswith('[') and domain.endswith(']'):
+        literal_ip = domain[1:-1]
+        result = LITERAL_REGEX.match(domain)
+        is_valid = result is not None and _is_ipv6_address(result[1])
+        return DomainInfo(domain, domain, literal_ip, is_valid)
+
+    if domain.isascii():
+        # The ASCII-compatible encoding of a
+        # plain ASCII domain is the domain itself
+        ace_formatted_domain = domain
+    else:
+        # The idna tables are only loaded for
+        # the internationalized domains
+        import idna
+
+        try:
+            ace_formatted_domain = idna.encode(domain).decode('ascii')
+        except idna.IDNAError as e:
+            return DomainInfo(domain, None, None, False, str(e))
+
+    is_valid = HOST_REGEX.match(ace_formatted_domain) is not None
+    return DomainInfo(domain, ace_formatted_domain, None, is_valid)
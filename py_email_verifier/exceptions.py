@@ -16,3 +16,22 @@ class AddressNotDeliverableError(BaseException):
     def __init__(self, email, message):
         message = self.message.format(email=email)
         super().__init__(message, email=email)
+
+
+class DomainBlacklistedError(BaseException):
+    message = 'Domain is blacklisted: {email}'
+
+    def __init__(self, email):
+        message = self.message.format(email=email)
+        super().__init__(message, email=email)
+
+
+class CircuitOpenError(OSError):
+    """Raised instead of connecting to a MX host which kept
+    timing out and is in its cool-off period"""
+
+    message = 'Circuit open for host: {host}'
+
+    def __init__(self, host):
+        super().__init__(self.message.format(host=host))
+        self.host = host
@@ -0,0 +1,233 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple, TypeVar
+
+from py_email_verifier.cache import TTLCache
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Sinks receiving the events of the verification stages
+sinks: List['Sink'] = []
+
+# Caches whose statistics are exported, registered
+# by the modules that create them
+caches: Dict[str, TTLCache] = {}
+
+SinkType = TypeVar('SinkType', bound='Sink')
+
+
+class Sink:
+    """Receives the timing of each verification stage. `host` is the
+    MX host for the SMTP stages and `error` is the exception name or
+    the reply code when the stage failed
+
+    >>> class PrintSink(Sink):
+    ...     def on_timing(self, stage, host, duration, error=None):
+    ...         print(stage, host, duration, error)
+    ... add_sink(PrintSink())
+    """
+
+    def on_timing(self, stage: str, host: Optional[str], duration: float, error: Optional[str] = None):
+        pass
+
+
+def add_sink(sink: SinkType) -> SinkType:
+    if sink not in sinks:
+        sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink: Sink):
+    if sink in sinks:
+        sinks.remove(sink)
+
+
+def register_cache(name: str, cache: TTLCache):
+    caches[name] = cache
+
+
+def emit_timing(stage: str, host: Optional[str], duration: float, error: Optional[str] = None):
+    for sink in sinks:
+        sink.on_timing(stage, host, duration, error)
+
+
+class StageTimer:
+    """Measures the duration of a stage and emits it to the sinks.
+    An exception raised in the block is reported as the error unless
+    `error` was set explicitly"""
+
+    __slots__ = ('stage', 'host', 'error', 'start')
+
+    def __init__(self, stage: str, host: Optional[str] = None):
+        self.stage = stage
+        self.host = host
+        self.error: Optional[str] = None
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        error = self.error
+        if error is None and exc_type is not None:
+            error = exc_type.__name__
+        emit_timing(self.stage, self.host, duration, error)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    # Writes are ignored so that the call sites
+    # do not have to check whether a sink exists
+    error = property(lambda self: None, lambda self, value: None)
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def timed(stage: str, host: Optional[str] = None):
+    """Returns a context manager timing the stage. When no sink is
+    attached, a shared timer that does nothing is returned
+
+    >>> with timed('rcpt', 'mx.example.com') as timer:
+    ...     code, message = smtp.rcpt(recipient)
+    ...     if code >= 400:
+    ...         timer.error = str(code)
+    """
+    if not sinks:
+        return _NOOP_TIMER
+    return StageTimer(stage, host)
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket boundaries"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.count}>'
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Returns the upper bound of the bucket holding the
+        quantile which is an estimate of its real value"""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        for bound, total in self.cumulative_counts():
+            if total >= rank:
+                return bound
+        return float('inf')
+
+
+def _format_labels(**labels: Optional[str]) -> str:
+    items = []
+    for key, value in labels.items():
+        value = '' if value is None else str(value)
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        items.append(f'{key}="{value}"')
+    return '{' + ','.join(items) + '}'
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class MetricsRegistry(Sink):
+    """
+    Sink keeping a latency histogram for each stage and the number
+    of errors for each MX host and stage. The metrics, along with the
+    statistics of the registered caches, are exported in the Prometheus
+    text format
+
+    >>> registry = add_sink(MetricsRegistry())
+    ... validate_or_fail('test@gmail.com')
+    ... print(registry.export())
+    """
+
+    prefix = 'py_email_verifier'
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms: Dict[str, Histogram] = {}
+        self.errors: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {list(self.histograms)}>'
+
+    def on_timing(self, stage: str, host: Optional[str], duration: float, error: Optional[str] = None):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.buckets)
+            histogram.observe(duration)
+
+            if error is not None:
+                key = (host or '', stage, error)
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.errors.clear()
+
+    def export(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format"""
+        lines = []
+        name = f'{self.prefix}_stage_duration_seconds'
+
+        with self._lock:
+            lines.append(f'# HELP {name} Duration of the verification stages')
+            lines.append(f'# TYPE {name} histogram')
+            for stage, histogram in sorted(self.histograms.items()):
+                for bound, total in histogram.cumulative_counts():
+                    labels = _format_labels(stage=stage, le=_format_bound(bound))
+                    lines.append(f'{name}_bucket{labels} {total}')
+                labels = _format_labels(stage=stage)
+                lines.append(f'{name}_sum{labels} {histogram.sum}')
+                lines.append(f'{name}_count{labels} {histogram.count}')
+
+            name = f'{self.prefix}_errors_total'
+            lines.append(f'# HELP {name} Failed stages for each MX host')
+            lines.append(f'# TYPE {name} counter')
+            for (host, stage, error), count in sorted(self.errors.items()):
+                labels = _format_labels(host=host, stage=stage, error=error)
+                lines.append(f'{name}{labels} {count}')
+
+        for metric, kind, description in (('hits', 'counter', 'Cache hits'), ('misses', 'counter', 'Cache misses'), ('hit_rate', 'gauge', 'Ratio of cache hits'), ('size', 'gauge', 'Number of cached entries')):
+            suffix = '_total' if kind == 'counter' else ''
+            name = f'{self.prefix}_cache_{metric}{suffix}'
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for cache_name, cache in sorted(caches.items()):
+                lines.append(f'{name}{_format_labels(cache=cache_name)} {cache.stats()[metric]}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,383 @@
+import itertools
+import queue
+import threading
+import time
+from typing import (Any, Dict, Iterable, Iterator, List, Optional, Tuple,
+                    Union)
+
+from py_email_verifier import logger
+from py_email_verifier.models import EmailAddress, VerificationResult
+from py_email_verifier.store import get_address_key
+from py_email_verifier.validators import (build_email_objects,
+                                          rejected_result, validate_domain)
+
+# Priority lanes, the tasks of a lower
+# lane are always picked up first
+INTERACTIVE = 0
+BULK = 10
+
+
+class Job:
+    """
+    Verification of a list of addresses submitted to a `JobQueue`. The
+    result of each address is available as soon as it is done, which
+    makes it possible to report the progress of a large job and to
+    return partial results while it runs
+
+    >>> job = jobs.submit(['foo@gmail.com', 'bar@outlook.com'])
+    ... job.progress()
+    ... {'id': 1, 'total': 2, 'completed': 1, 'ratio': 0.5, 'done': False, 'cancelled': False}
+    ... for offset, result in job.iter_results():
+    ...     print(offset, result.result)
+    """
+
+    def __init__(self, job_id: int, values: List[Union[str, EmailAddress]], priority: int = BULK, timer=time.time):
+        self.id = job_id
+        self.values = values
+        self.priority = priority
+        self.total = len(values)
+        self.results: Dict[int, VerificationResult] = {}
+        self.timer = timer
+        self.created_at = timer()
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+        # Offsets in the order in which they completed
+        self._completed: List[int] = []
+        self._condition = threading.Condition()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.id} [{len(self.results)}/{self.total}]>'
+
+    @property
+    def done(self) -> bool:
+        return self.cancelled or len(self.results) >= self.total
+
+    def _complete(self, offset: int, result: VerificationResult):
+        with self._condition:
+            if offset in self.results or self.cancelled:
+                return
+
+            self.results[offset] = result
+            self._completed.append(offset)
+            if len(self.results) >= self.total:
+                self.finished_at = self.timer()
+            self._condition.notify_all()
+
+    def cancel(self):
+        """Stops the job. The addresses that were not started yet are
+        not verified unless another job is waiting for them"""
+        with self._condition:
+            if not self.done:
+                self.cancelled = True
+                self.finished_at = self.timer()
+            self._condition.notify_all()
+
+    def progress(self) -> Dict[str, Any]:
+        with self._condition:
+            completed = len(self.results)
+            return {
+                'id': self.id,
+                'total': self.total,
+                'completed': completed,
+                'ratio': completed / self.total if self.total else 1.0,
+                'done': self.done,
+                'cancelled': self.cancelled
+            }
+
+    def partial_results(self) -> Dict[int, VerificationResult]:
+        """Returns a copy of the results that are available
+        so far, indexed by the offset of the address"""
+        with self._condition:
+            return dict(self.results)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the job is done and returns False
+        if it is still running after `timeout` seconds"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.done, timeout=timeout)
+
+    def iter_results(self, timeout: Optional[float] = None) -> Iterator[Tuple[int, VerificationResult]]:
+        """Yields the `(offset, result)` of each address in the order in
+        which they complete until the job is done. `timeout` is the
+        longest time to wait for the next result"""
+        position = 0
+        while True:
+            with self._condition:
+                available = lambda: position < len(self._completed) or self.done
+                if not self._condition.wait_for(available, timeout=timeout):
+                    raise TimeoutError(f'No result for job {self.id} after {timeout} seconds')
+
+                offsets = self._completed[position:]
+                items = [(offset, self.results[offset]) for offset in offsets]
+                position += len(offsets)
+                finished = self.done and position >= len(self._completed)
+
+            yield from items
+            if finished:
+                return
+
+    def ordered_results(self) -> List[VerificationResult]:
+        """Returns the results in the order of the input,
+        once the job is done"""
+        self.wait()
+        return [self.results[offset] for offset in range(self.total) if offset in self.results]
+
+
+class _Entry:
+    """An address in flight and the jobs waiting for its result"""
+
+    __slots__ = ('email', 'task', 'waiters')
+
+    def __init__(self, email: EmailAddress, task: '_DomainTask'):
+        self.email = email
+        self.task = task
+        self.waiters: List[Tuple[Job, int, str]] = []
+
+
+class _DomainTask:
+    """Addresses of a domain verified together, over a single
+    DNS lookup and the same SMTP sessions"""
+
+    __slots__ = ('domain', 'priority', 'keys', 'started')
+
+    def __init__(self, domain: str, priority: int):
+        self.domain = domain
+        self.priority = priority
+        self.keys: Dict[str, None] = {}
+        self.started = False
+
+
+class JobQueue:
+    """
+    Runs verification jobs on a pool of threads
+
+    Identical addresses in flight, within a job or across jobs, are
+    verified once and their result is given to every job waiting for
+    them. The pending addresses of a domain are collapsed into a single
+    task of at most `batch_size` addresses which shares the DNS lookup
+    and the SMTP sessions. Tasks are picked by priority lane, the
+    `INTERACTIVE` lane before the `BULK` one, then in submission order.
+    An address waiting in the bulk lane moves to the interactive lane
+    when an interactive job asks for it
+
+    Finished jobs stay in `jobs` for `retention` seconds and at most
+    `max_jobs` of them are kept, the oldest ones being removed first.
+    Running jobs are never removed
+
+    The options are the ones of `validate_many`
+
+    >>> with JobQueue(workers=8, smtp_timeout=5) as jobs:
+    ...     bulk = jobs.submit(addresses, priority=BULK)
+    ...     result = jobs.check('foo@gmail.com')
+    ...     bulk.progress()
+    """
+
+    def __init__(self, workers: int = 4, batch_size: int = 100, check_format: bool = True, check_blacklist: bool = True, retention: float = 3600, max_jobs: int = 1000, timer=time.time, **options):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self.timer = timer
+        self.check_format = check_format
+        self.check_blacklist = check_blacklist
+        self.options = options
+        self.jobs: Dict[int, Job] = {}
+        self.deduplicated = 0
+        self._inflight: Dict[str, _Entry] = {}
+        # Task of each domain and lane that can still take addresses
+        self._open_tasks: Dict[Tuple[str, int], _DomainTask] = {}
+        self._tasks: 'queue.PriorityQueue[Tuple[float, int, Optional[_DomainTask]]]' = queue.PriorityQueue()
+        self._counter = itertools.count(1)
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self._inflight)} addresses in flight>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._run,
+                name=f'py_email_verifier-jobs-{len(self._threads)}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _add_to_task(self, domain: str, priority: int, key: str) -> _DomainTask:
+        task = self._open_tasks.get((domain, priority))
+        if task is None or task.started or len(task.keys) >= self.batch_size:
+            task = _DomainTask(domain, priority)
+            self._open_tasks[(domain, priority)] = task
+            self._tasks.put((priority, next(self._counter), task))
+
+        task.keys[key] = None
+        return task
+
+    def submit(self, values: Iterable[Union[str, EmailAddress]], priority: int = BULK) -> Job:
+        """Queues the addresses and returns the job
+        which tracks their verification"""
+        if self._closed:
+            raise Exception('The queue is closed')
+
+        job = Job(next(self._job_ids), list(values), priority, timer=self.timer)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._evict()
+
+        groups, rejected = build_email_objects(
+            job.values,
+            check_format=self.check_format,
+            check_blacklist=self.check_blacklist
+        )
+
+        for offset, value in rejected:
+            job._complete(offset, rejected_result(value))
+
+        with self._lock:
+            for domain, items in groups.items():
+                for offset, email_object in items:
+                    key = get_address_key(email_object)
+                    waiter = (job, offset, email_object.email)
+
+                    entry = self._inflight.get(key)
+                    if entry is None:
+                        task = self._add_to_task(domain, priority, key)
+                        entry = self._inflight[key] = _Entry(email_object, task)
+                    else:
+                        self.deduplicated += 1
+                        if not entry.task.started and entry.task.priority > priority:
+                            # Move the address to the more urgent lane
+                            entry.task.keys.pop(key, None)
+                            entry.task = self._add_to_task(domain, priority, key)
+                    entry.waiters.append(waiter)
+            self._start()
+        return job
+
+    def check(self, value: Union[str, EmailAddress], timeout: Optional[float] = None) -> Optional[VerificationResult]:
+        """Verifies a single address in the interactive lane and
+        returns its result, or None after `timeout` seconds"""
+        job = self.submit([value], priority=INTERACTIVE)
+        if not job.wait(timeout):
+            return None
+
+        with self._lock:
+            self.jobs.pop(job.id, None)
+        return job.results.get(0)
+
+    def get_job(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def forget(self, job_id: int) -> Optional[Job]:
+        """Removes a job from `jobs`, cancelling it if it is not done"""
+        with self._lock:
+            job = self.jobs.pop(job_id, None)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _evict(self):
+        """Removes the jobs that finished more than `retention` seconds
+        ago and then the oldest finished jobs above `max_jobs`. The
+        lock has to be held by the caller"""
+        limit = self.timer() - self.retention
+        finished = [job for job in self.jobs.values() if job.done]
+        excess = len(self.jobs) - self.max_jobs
+
+        for job in finished:
+            if excess > 0 or (job.finished_at is not None and job.finished_at <= limit):
+                self.jobs.pop(job.id, None)
+                excess -= 1
+
+    def _take(self, task: _DomainTask) -> List[Tuple[str, EmailAddress]]:
+        """Marks the task as started and returns the addresses that
+        still belong to it and that a job is waiting for"""
+        with self._lock:
+            task.started = True
+            if self._open_tasks.get((task.domain, task.priority)) is task:
+                del self._open_tasks[(task.domain, task.priority)]
+
+            items = []
+            for key in task.keys:
+                entry = self._inflight.get(key)
+                if entry is None or entry.task is not task:
+                    continue
+
+                entry.waiters = [waiter for waiter in entry.waiters if not waiter[0].cancelled]
+                if not entry.waiters:
+                    del self._inflight[key]
+                    continue
+                items.append((key, entry.email))
+            return items
+
+    def _finish(self, key: str, result: VerificationResult):
+        with self._lock:
+            entry = self._inflight.pop(key, None)
+
+        if entry is not None:
+            for job, offset, value in entry.waiters:
+                if value != result.email:
+                    job._complete(offset, result._replace(email=value))
+                else:
+                    job._complete(offset, result)
+
+    def _run(self):
+        while True:
+            _, _, task = self._tasks.get()
+            if task is None:
+                break
+
+            items = self._take(task)
+            if not items:
+                continue
+
+            keys = {id(email_object): key for key, email_object in items}
+            try:
+                for _, result, email_object in validate_domain(list(enumerate(email for _, email in items)), **self.options):
+                    self._finish(keys.pop(id(email_object)), email_object.to_result(result))
+            except Exception:
+                logger.exception('Could not verify the addresses of %s', task.domain)
+            finally:
+                # The addresses left over by an error are
+                # returned as ambiguous rather than lost
+                for key in keys.values():
+                    entry = self._inflight.get(key)
+                    if entry is not None:
+                        self._finish(key, entry.email.to_result(None))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict()
+            lanes: Dict[int, int] = {}
+            for entry in self._inflight.values():
+                if not entry.task.started:
+                    lanes[entry.task.priority] = lanes.get(entry.task.priority, 0) + 1
+
+            return {
+                'jobs': len(self.jobs),
+                'running_jobs': sum(not job.done for job in self.jobs.values()),
+                'inflight': len(self._inflight),
+                'queued': lanes,
+                'deduplicated': self.deduplicated
+            }
+
+    def close(self, wait: bool = True):
+        """Stops the workers once the queued tasks are done"""
+        self._closed = True
+        # The sentinels come after every queued task
+        for _ in self._threads:
+            self._tasks.put((float('inf'), next(self._counter), None))
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
@@ -1,17 +1,46 @@
-from functools import cached_property, lru_cache
-from typing import Dict, List, Set, Tuple, Union
+from types import MappingProxyType
+from typing import (AbstractSet, Any, Dict, FrozenSet, Iterable, List, Mapping,
+                    NamedTuple, Optional, Sequence, Set, Tuple, Union)
 
-import idna
-from nslookup import Nslookup
+from py_email_verifier.domains import normalize_domain
 
+# Shared immutable placeholders that are replaced by real
+# containers the first time something is recorded
+_EMPTY_SET = frozenset()
+_EMPTY_DICT = MappingProxyType({})
+_EMPTY_LIST = ()
 
-class EmailAddress:
-    """Represents the raw email object"""
 
-    evaluation: Set[str] = set()
-    mx_records: Set[str] = set()
-    messages = []
-    errors = {}
+class EmailAddress:
+    """Represents the raw email object. The instances are slotted and
+    the containers holding the state of the verification are only
+    created once something is recorded on the address"""
+
+    __slots__ = (
+        'email',
+        'user',
+        'domain',
+        'ace_formatted_domain',
+        'evaluation',
+        'mx_records',
+        'mx_preferences',
+        'messages',
+        '_literal_ip',
+        '_ns_records'
+    )
+
+    email: str
+    user: str
+    domain: str
+    ace_formatted_domain: str
+    # Either the shared placeholders or the containers
+    # created for the instance
+    evaluation: AbstractSet[str]
+    mx_records: AbstractSet[str]
+    mx_preferences: Mapping[str, int]
+    messages: Sequence[Tuple[Optional[str], int, str]]
+    _literal_ip: Optional[str]
+    _ns_records: Optional[Tuple[List[str], List[str]]]
 
     def __init__(self, email: str):
         self.email = email
@@ -21,14 +50,19 @@ class EmailAddress:
         except Exception:
             raise ValueError(f'Email is not valid. Got: {email}')
 
-        if self.get_literal_ip is None:
-            self.ace_formatted_domain = self.domain
-        else:
-            try:
-                self.ace_formatted_domain = idna.encode(
-                    self.domain).decode('ascii')
-            except idna.IDNAError:
-                raise
+        info = normalize_domain(self.domain)
+        if info.idna_error is not None:
+            import idna
+            raise idna.IDNAError(info.idna_error)
+
+        self._literal_ip = info.literal_ip
+        self._ns_records = None
+        self.ace_formatted_domain = info.ace_formatted_domain
+
+        self.evaluation = _EMPTY_SET
+        self.mx_records = _EMPTY_SET
+        self.mx_preferences = _EMPTY_DICT
+        self.messages = _EMPTY_LIST
 
     def __repr__(self):
         return f'<EmailAddress: {self.email}>'
@@ -42,15 +76,30 @@ class EmailAddress:
     def __hash__(self):
         return hash((self.email))
 
-    @cached_property
+    def __getstate__(self):
+        # The placeholders are not sent in order to
+        # keep the instances cheap to pickle
+        state = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not _EMPTY_SET and value is not _EMPTY_DICT and value is not _EMPTY_LIST:
+                state[name] = value
+        return state
+
+    def __setstate__(self, state):
+        self.evaluation = _EMPTY_SET
+        self.mx_records = _EMPTY_SET
+        self.mx_preferences = _EMPTY_DICT
+        self.messages = _EMPTY_LIST
+
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
     def get_literal_ip(self):
-        logic = [
-            self.domain.startswith('['),
-            self.domain.endswith(']')
-        ]
-        return self.domain[1:-1] if all(logic) else None
+        return self._literal_ip
 
-    @cached_property
+    @property
     def restructure(self):
         """The ASCII-compatible encoding for the email address"""
         return '@'.join((self.user, self.ace_formatted_domain))
@@ -58,34 +107,99 @@ class EmailAddress:
     @property
     def is_risky(self):
         return any([
-            'protected' in self.evaluation
+            'protected' in self.evaluation,
+            'catch_all' in self.evaluation
         ])
 
-    @lru_cache(maxsize=100)
-    def ns_lookup(self) -> Tuple[list[str], list[str]]:
-        instance = Nslookup(dns_servers=['1.1.1.1'])
-        ips_record = instance.dns_lookup(self.domain)
-        return ips_record.response_full, ips_record.answer
+    def ns_lookup(self, timeout: int = 10) -> Tuple[list[str], list[str]]:
+        """Returns the full A records of the domain and their
+        addresses using the resolver configured in `resolvers`"""
+        if self._ns_records is None:
+            # dnspython is only loaded by the addresses that need it
+            from dns.exception import DNSException
+            from dns.rdatatype import A as rdtype_a
+
+            from py_email_verifier import resolvers
+
+            try:
+                answer = resolvers.resolve(self.ace_formatted_domain, rdtype_a, timeout)
+            except DNSException:
+                self._ns_records = ([], [])
+            else:
+                response_full = answer.rrset.to_text().splitlines() if answer.rrset is not None else []
+                self._ns_records = (response_full, [record.to_text() for record in answer])
+        return self._ns_records
 
     def add_error(self, error: str):
-        self.evaluation.add(error)
+        evaluation = self.evaluation
+        if not isinstance(evaluation, set):
+            evaluation = self.evaluation = set(evaluation)
+        evaluation.add(error)
 
-    def add_mx_records(self, records: Set[str]):
+    def add_mx_records(self, records: Set[str], preferences: Optional[Mapping[str, int]] = None):
         """Adds the records to the current email
-        address instance"""
+        address instance with their MX preference"""
         self.mx_records = records
+        self.mx_preferences = preferences or _EMPTY_DICT
 
         for record in records:
             if 'protection' in record:
                 self.add_error('protected')
 
-    def add_message(self, host: str, code: int, message: str):
-        message = message.encode('utf-8').decode('utf-8')
-        self.messages.append([host, code, message])
+    def sort_mx_records(self, records: Optional[Iterable[str]] = None) -> List[str]:
+        """Returns the records sorted by MX preference, the most
+        preferred one first. Records without a known preference
+        keep their original order"""
+        if records is None:
+            records = self.mx_records
+        return sorted(records, key=lambda x: self.mx_preferences.get(x, 0))
+
+    def add_message(self, host: Optional[str], code: int, message: Union[str, bytes]):
+        if isinstance(message, bytes):
+            message = message.decode('utf-8', errors='replace')
 
-    def json_response(self) -> Dict[str, str | bool | List[str]]:
+        messages = self.messages
+        if not isinstance(messages, list):
+            messages = self.messages = list(messages)
+        messages.append((host, code, message))
+
+    def json_response(self) -> Dict[str, Any]:
         return {
             'risky': self.is_risky,
             'email': self.email,
             'evaluation': list(self.evaluation)
         }
+
+    def to_result(self, result: Optional[bool]) -> 'VerificationResult':
+        """Returns the immutable record of the verification
+        which does not keep a reference to the address"""
+        return VerificationResult(
+            self.email,
+            result,
+            self.is_risky,
+            frozenset(self.evaluation)
+        )
+
+
+class VerificationResult(NamedTuple):
+    """Lightweight and immutable outcome of the verification
+    of an address used by the batch APIs"""
+
+    email: str
+    result: Optional[bool]
+    risky: bool = False
+    evaluation: FrozenSet[str] = frozenset()
+
+    @property
+    def flags(self) -> int:
+        """The evaluation as `results.Evaluation` flags"""
+        from py_email_verifier.results import to_flags
+        return to_flags(self.evaluation)
+
+    def json_response(self) -> Dict[str, Any]:
+        return {
+            'risky': self.risky,
+            'email': self.email,
+            'evaluation': list(self.evaluation),
+            'result': self.result
+        }
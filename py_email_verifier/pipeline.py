@@ -0,0 +1,395 @@
+import csv
+import io
+import json
+import os
+import queue
+import sys
+import threading
+from functools import partial
+from typing import (IO, TYPE_CHECKING, Any, Callable, Dict, Generator,
+                    Iterable, Iterator, List, Optional, Tuple, Union)
+
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.verifiers.email_verifier import check_syntax
+
+if TYPE_CHECKING:
+    from py_email_verifier.store import VerificationStore
+
+# Sentinel used to signal the end of a stage
+_DONE = object()
+
+
+class PipelineItem:
+    """A single row flowing through the stages of the pipeline.
+    `offset` is the position of the row in the input"""
+
+    __slots__ = ('offset', 'value', 'email', 'result', 'done')
+
+    def __init__(self, offset: int, value: str):
+        self.offset = offset
+        self.value = value
+        self.email: Optional[EmailAddress] = None
+        self.result: Optional[bool] = None
+        self.done = False
+
+    def __repr__(self):
+        return f'<PipelineItem: {self.offset} {self.value}>'
+
+    def finish(self, result: Optional[bool]):
+        self.result = result
+        self.done = True
+
+    def json_response(self) -> Dict[str, Any]:
+        if self.email is None:
+            response = {'risky': False, 'email': self.value, 'evaluation': ['syntax_error']}
+        else:
+            response = self.email.json_response()
+        response['offset'] = self.offset
+        response['result'] = self.result
+        return response
+
+
+def detect_format(path: str) -> str:
+    _, extension = os.path.splitext(path.lower())
+    if extension == '.csv':
+        return 'csv'
+    elif extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return 'text'
+
+
+def read_addresses(stream: IO[str], file_format: str = 'text', column: str = 'email', start: int = 0) -> Iterator[PipelineItem]:
+    """Lazily reads the addresses from a CSV, JSONL or plain text stream
+    with one address per line. The rows before the `start` offset
+    are skipped in order to resume a previous run"""
+    if file_format == 'csv':
+        rows = csv.DictReader(stream)
+        values = (row.get(column) or '' for row in rows)
+    elif file_format == 'jsonl':
+        def parse(line):
+            data = json.loads(line)
+            return data.get(column, '') if isinstance(data, dict) else str(data)
+        values = (parse(line) for line in stream if line.strip())
+    else:
+        values = (line for line in stream if line.strip())
+
+    for offset, value in enumerate(values):
+        if offset >= start:
+            yield PipelineItem(offset, value.strip())
+
+
+def buffered(iterator: Iterable[Any], maxsize: int = 1000) -> Generator[Any, None, None]:
+    """Runs the iterator in a background thread and yields its items
+    through a bounded queue so that consecutive stages run concurrently
+    without ever holding more than `maxsize` items in memory
+
+    When the consumer stops early, the background thread stops reading
+    and closes the iterator, which stops the upstream stages in turn"""
+    items: 'queue.Queue[Any]' = queue.Queue(maxsize=maxsize)
+    errors: List[BaseException] = []
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        # Wait for room in the queue unless
+        # the consumer stopped reading
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(item):
+                    break
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            close = getattr(iterator, 'close', None)
+            try:
+                if close is not None:
+                    close()
+            except BaseException as e:
+                errors.append(e)
+            put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stopped.set()
+
+    if errors:
+        raise errors[0]
+
+
+def syntax_stage(items: Iterable[PipelineItem]) -> Iterator[PipelineItem]:
+    for item in items:
+        if not item.done:
+            # Malformed rows are rejected without
+            # building the model or raising
+            if check_syntax(item.value) is None:
+                item.email = EmailAddress(item.value)
+            else:
+                item.finish(False)
+        yield item
+
+
+def blacklist_stage(items: Iterable[PipelineItem], is_blacklisted: Optional[Callable[[EmailAddress], bool]] = None) -> Iterator[PipelineItem]:
+    for item in items:
+        email = item.email
+        if not item.done and email is not None and is_blacklisted is not None:
+            if is_blacklisted(email):
+                email.add_error('blacklisted')
+                item.finish(False)
+        yield item
+
+
+def store_stage(items: Iterable[PipelineItem], store: 'VerificationStore') -> Iterator[PipelineItem]:
+    """Finishes the rows whose address was already
+    verified during a previous run"""
+    for item in items:
+        email = item.email
+        if not item.done and email is not None:
+            cached = store.get_result(email)
+            if cached is not None:
+                for error in cached.evaluation:
+                    email.add_error(error)
+                item.finish(cached.result)
+        yield item
+
+
+def dns_stage(items: Iterable[PipelineItem], timeout: int = 10) -> Iterator[PipelineItem]:
+    from py_email_verifier.verifiers.dns_verifier import verify_dns
+
+    for item in items:
+        if not item.done and item.email is not None:
+            try:
+                verify_dns(item.email, timeout=timeout)
+            except Exception:
+                item.finish(False)
+        yield item
+
+
+def smtp_stage(items: Iterable[PipelineItem], batch_size: int = 100, store: Optional['VerificationStore'] = None, scheduling: Optional[Dict[str, Any]] = None, **smtp_kwargs) -> Iterator[PipelineItem]:
+    """Collects up to `batch_size` rows and probes the addresses
+    of each domain of the batch over a single session
+
+    With `scheduling`, the options of an `SMTPScheduler`, the probes go
+    through a scheduler shared by the batches of the stage which rate
+    limits the sessions and retries the temporary failures, greylisting
+    included, before the rows of the batch are released"""
+    from py_email_verifier.store import is_cacheable_result
+    from py_email_verifier.verifiers.smtp_verifier import smtp_check_many
+
+    scheduler = None
+    if scheduling is not None:
+        from py_email_verifier.verifiers.scheduler import SMTPScheduler
+        scheduler = SMTPScheduler(**scheduling, **smtp_kwargs)
+
+    def probe(groups: Dict[str, List[Tuple[PipelineItem, EmailAddress]]]) -> Dict[EmailAddress, Optional[bool]]:
+        results: Dict[EmailAddress, Optional[bool]] = {}
+        if scheduler is not None:
+            for group in groups.values():
+                scheduler.submit([email for _, email in group], group[0][1].mx_records)
+
+            try:
+                for email, result in scheduler.run():
+                    results[email] = result
+            except Exception:
+                # Drop the probes left over by the error
+                scheduler.clear()
+            return results
+
+        for group in groups.values():
+            first = group[0][1]
+            try:
+                results.update(smtp_check_many(
+                    [email for _, email in group],
+                    mx_records=first.mx_records,
+                    **smtp_kwargs
+                ))
+            except Exception:
+                pass
+        return results
+
+    def flush(batch: List[PipelineItem]):
+        groups: Dict[str, List[Tuple[PipelineItem, EmailAddress]]] = {}
+        for item in batch:
+            if not item.done and item.email is not None:
+                groups.setdefault(item.email.ace_formatted_domain.lower(), []).append((item, item.email))
+
+        results = probe(groups)
+        for group in groups.values():
+            for item, email in group:
+                result = results.get(email)
+                if store is not None and email in results:
+                    if is_cacheable_result(email, result):
+                        store.set_result(email, result)
+                item.finish(result)
+        return batch
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from flush(batch)
+            batch = []
+
+    if batch:
+        yield from flush(batch)
+
+
+def accept_stage(items: Iterable[PipelineItem]) -> Iterator[PipelineItem]:
+    for item in items:
+        if not item.done:
+            item.finish(True)
+        yield item
+
+
+class Checkpoint:
+    """Keeps track of the offset below which every row has been
+    written to the output. Rows can complete out of order, so the
+    offset only moves forward once all the previous rows are done"""
+
+    def __init__(self, path: Optional[str] = None, every: int = 1000):
+        self.path = path
+        self.every = every
+        self.offset = 0
+        self._completed = set()
+        self._since_save = 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.offset}>'
+
+    def load(self) -> int:
+        if self.path is not None and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.offset = int(f.read().strip() or 0)
+        return self.offset
+
+    def save(self):
+        if self.path is None:
+            return
+
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            f.write(str(self.offset))
+        os.replace(temporary_path, self.path)
+        self._since_save = 0
+
+    def complete(self, offset: int) -> bool:
+        """Marks the row as written and returns True when
+        the checkpoint should be saved"""
+        self._completed.add(offset)
+        while self.offset in self._completed:
+            self._completed.remove(self.offset)
+            self.offset += 1
+
+        self._since_save += 1
+        return self._since_save >= self.every
+
+
+def run_pipeline(stream: IO[str], output: IO[str], *, file_format: str = 'text', column: str = 'email', checkpoint: Optional[Checkpoint] = None, check_blacklist: Optional[Callable[[EmailAddress], bool]] = None, store: Optional['VerificationStore'] = None, check_dns: bool = True, dns_timeout: int = 10, check_smtp: bool = True, batch_size: int = 100, queue_size: int = 1000, **smtp_kwargs) -> int:
+    """
+    Streams the addresses of the input through the syntax, blacklist,
+    DNS and SMTP stages and writes a JSON line for each one of them as
+    soon as it is done. The stages are connected by bounded queues so
+    the memory stays constant regardless of the size of the input
+
+    When a `checkpoint` is given, the rows that were already processed
+    by a previous run are skipped. Rows that were written after the last
+    saved checkpoint can be written twice after a crash
+
+    When a `store` is given, the addresses verified during a previous
+    run are not probed again and the new SMTP outcomes are kept in it
+
+    Temporary SMTP failures are retried when `scheduling` gives the
+    options of an `SMTPScheduler`, see `smtp_stage`
+
+    >>> with open('emails.csv') as f:
+    ...     run_pipeline(f, sys.stdout, file_format='csv')
+    """
+    start = checkpoint.load() if checkpoint is not None else 0
+
+    items = buffered(read_addresses(stream, file_format, column, start), queue_size)
+    items = buffered(syntax_stage(items), queue_size)
+    items = blacklist_stage(items, check_blacklist)
+
+    # The outcomes are only kept when the addresses are probed
+    if not (check_dns and check_smtp):
+        store = None
+
+    if store is not None:
+        items = store_stage(items, store)
+
+    if check_dns:
+        items = buffered(dns_stage(items, timeout=dns_timeout), queue_size)
+
+    if check_dns and check_smtp:
+        items = smtp_stage(items, batch_size=batch_size, store=store, **smtp_kwargs)
+    else:
+        items = accept_stage(items)
+
+    count = 0
+    for item in items:
+        output.write(json.dumps(item.json_response()) + '\n')
+        count += 1
+
+        if checkpoint is not None and checkpoint.complete(item.offset):
+            # The rows have to be on disk before
+            # the checkpoint moves past them
+            output.flush()
+            if store is not None:
+                store.flush()
+            checkpoint.save()
+
+    output.flush()
+    if store is not None:
+        store.flush()
+    if checkpoint is not None:
+        checkpoint.save()
+    return count
+
+
+def open_input(path: str, encoding: str = 'utf-8') -> IO[str]:
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding=encoding)
+    return open(path, encoding=encoding, newline='')
+
+
+def verify_file(path: str, output: Union[str, IO[str]] = '-', file_format: Optional[str] = None, checkpoint_path: Optional[str] = None, workers: int = 1, **kwargs) -> int:
+    """Runs the pipeline on a file, or on the standard input when
+    `path` is '-', and writes the results to `output`. With more than
+    one worker, the addresses are verified by a pool of processes"""
+    file_format = file_format or detect_format(path)
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+
+    runner = run_pipeline
+    if workers > 1:
+        # The workers module builds on the stages of this one
+        from py_email_verifier.workers import run_parallel_pipeline
+        runner = partial(run_parallel_pipeline, workers=workers)
+
+    stream = open_input(path)
+    try:
+        if output == '-':
+            return runner(stream, sys.stdout, file_format=file_format, checkpoint=checkpoint, **kwargs)
+        elif isinstance(output, str):
+            # Resumed runs append to the previous results
+            mode = 'a' if checkpoint is not None and checkpoint.load() else 'w'
+            with open(output, mode, encoding='utf-8') as f:
+                return runner(stream, f, file_format=file_format, checkpoint=checkpoint, **kwargs)
+        return runner(stream, output, file_format=file_format, checkpoint=checkpoint, **kwargs)
+    finally:
+        if path != '-':
+            stream.close()
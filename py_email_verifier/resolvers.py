@@ -0,0 +1,315 @@
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Union
+
+from dns import asyncresolver, resolver
+from dns.rdatatype import MX as rdtype_mx
+from dns.resolver import Answer
+
+# Answers given by the server, the query does not need
+# to be sent to another upstream when they are received
+DEFINITIVE_ERRORS = (resolver.NXDOMAIN, resolver.NoAnswer, resolver.YXDOMAIN)
+
+
+class Upstream:
+    """A single DNS server with the health statistics used to choose
+    the servers. The latency is an exponentially weighted moving
+    average of the response times"""
+
+    def __init__(self, address: str, port: int = 53):
+        self.address = address
+        self.port = port
+        self.latency: Optional[float] = None
+        self.queries = 0
+        self.errors = 0
+        self.failures = 0
+        self.sidelined_until = 0.0
+
+        self.resolver = resolver.Resolver(configure=False)
+        self.resolver.nameservers = [address]
+        self.resolver.port = port
+
+        self.async_resolver = asyncresolver.Resolver(configure=False)
+        self.async_resolver.nameservers = [address]
+        self.async_resolver.port = port
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.address}:{self.port}>'
+
+    def is_available(self, now: float) -> bool:
+        return self.sidelined_until <= now
+
+    def record_success(self, duration: float):
+        self.queries += 1
+        self.failures = 0
+        if self.latency is None:
+            self.latency = duration
+        else:
+            self.latency = self.latency * 0.8 + duration * 0.2
+
+    def record_failure(self):
+        self.queries += 1
+        self.errors += 1
+        self.failures += 1
+
+    def stats(self) -> Dict[str, Union[str, int, float, None]]:
+        return {
+            'address': self.address,
+            'latency': self.latency,
+            'queries': self.queries,
+            'errors': self.errors,
+            'sidelined_until': self.sidelined_until
+        }
+
+
+class MultiResolver:
+    """
+    Spreads the DNS queries over several upstream servers. A query is
+    sent to the next upstream in turn and, when it did not answer after
+    `race_after` seconds, to the fastest of the other ones as well. The
+    first answer wins
+
+    An upstream failing `failure_threshold` times in a row, or whose
+    average latency goes above `slow_threshold`, is sidelined for
+    `sideline_time` seconds. The system nameservers are used when
+    `nameservers` is not provided
+
+    >>> set_resolver(MultiResolver(['1.1.1.1', '8.8.8.8', '9.9.9.9'], race_after=0.1))
+    """
+
+    def __init__(self, nameservers: Optional[Iterable[str]] = None, port: int = 53, race_after: float = 0.2, failure_threshold: int = 3, slow_threshold: float = 2, sideline_time: float = 30, max_workers: int = 32, timer=time.monotonic):
+        addresses = nameservers
+        if addresses is None:
+            addresses = [str(x) for x in resolver.Resolver().nameservers]
+
+        self.upstreams = [Upstream(str(address), port) for address in addresses]
+        if not self.upstreams:
+            raise ValueError('At least one nameserver is required')
+
+        self.race_after = race_after
+        self.failure_threshold = failure_threshold
+        self.slow_threshold = slow_threshold
+        self.sideline_time = sideline_time
+        self.max_workers = max_workers
+        self.timer = timer
+        self._counter = itertools.count()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {[x.address for x in self.upstreams]}>'
+
+    def get_candidates(self) -> List[Upstream]:
+        """Returns the upstreams in the order they should be queried:
+        the next available upstream in turn, in order to spread the
+        load, followed by the other ones from the fastest"""
+        now = self.timer()
+        with self._lock:
+            available = [x for x in self.upstreams if x.is_available(now)]
+            if not available:
+                # Every upstream is sidelined, the one that
+                # will be back first is better than nothing
+                available = sorted(self.upstreams, key=lambda x: x.sidelined_until)[:1]
+
+            first = available[next(self._counter) % len(available)]
+
+        others = [x for x in available if x is not first]
+        others.sort(key=lambda x: float('inf') if x.latency is None else x.latency)
+        return [first] + others
+
+    def _record(self, upstream: Upstream, duration: float, error: Optional[Exception] = None):
+        with self._lock:
+            if error is None or isinstance(error, DEFINITIVE_ERRORS):
+                upstream.record_success(duration)
+            else:
+                upstream.record_failure()
+
+            is_slow = upstream.latency is not None and upstream.latency > self.slow_threshold
+            if upstream.failures >= self.failure_threshold or is_slow:
+                upstream.sidelined_until = self.timer() + self.sideline_time
+                upstream.failures = 0
+                # Give the upstream a fresh start once it is back
+                upstream.latency = None
+
+    def _query(self, upstream: Upstream, qname: str, rdtype, lifetime: float) -> Answer:
+        start = time.perf_counter()
+        try:
+            answer = upstream.resolver.resolve(qname, rdtype, lifetime=lifetime)
+        except Exception as e:
+            self._record(upstream, time.perf_counter() - start, e)
+            raise
+        self._record(upstream, time.perf_counter() - start)
+        return answer
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='py_email_verifier-dns'
+                )
+            return self._executor
+
+    def resolve(self, qname: str, rdtype=rdtype_mx, lifetime: float = 10) -> Answer:
+        candidates = self.get_candidates()
+        if len(candidates) == 1:
+            return self._query(candidates[0], qname, rdtype, lifetime)
+
+        executor = self._get_executor()
+        deadline = time.monotonic() + lifetime
+        pending: set[Future] = set()
+        last_error: Optional[Exception] = None
+
+        def launch():
+            upstream = candidates.pop(0)
+            remaining = max(0.001, deadline - time.monotonic())
+            pending.add(executor.submit(self._query, upstream, qname, rdtype, remaining))
+
+        launch()
+        while pending or candidates:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            if not pending:
+                launch()
+                continue
+
+            timeout = min(self.race_after, remaining) if candidates else remaining
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # The upstream is slow, race the next one
+                if candidates:
+                    launch()
+                continue
+
+            for future in done:
+                pending.discard(future)
+                try:
+                    return future.result()
+                except DEFINITIVE_ERRORS:
+                    raise
+                except Exception as e:
+                    last_error = e
+
+        if last_error is not None and not pending:
+            raise last_error
+        raise resolver.LifetimeTimeout(timeout=lifetime, errors=[])
+
+    async def _async_query(self, upstream: Upstream, qname: str, rdtype, lifetime: float) -> Answer:
+        start = time.perf_counter()
+        try:
+            answer = await upstream.async_resolver.resolve(qname, rdtype, lifetime=lifetime)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record(upstream, time.perf_counter() - start, e)
+            raise
+        self._record(upstream, time.perf_counter() - start)
+        return answer
+
+    async def async_resolve(self, qname: str, rdtype=rdtype_mx, lifetime: float = 10) -> Answer:
+        candidates = self.get_candidates()
+        if len(candidates) == 1:
+            return await self._async_query(candidates[0], qname, rdtype, lifetime)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lifetime
+        pending: set[asyncio.Task] = set()
+        last_error: Optional[Exception] = None
+
+        def launch():
+            upstream = candidates.pop(0)
+            remaining = max(0.001, deadline - loop.time())
+            pending.add(asyncio.ensure_future(self._async_query(upstream, qname, rdtype, remaining)))
+
+        launch()
+        try:
+            while pending or candidates:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                if not pending:
+                    launch()
+                    continue
+
+                timeout = min(self.race_after, remaining) if candidates else remaining
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if candidates:
+                        launch()
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    try:
+                        return task.result()
+                    except DEFINITIVE_ERRORS:
+                        raise
+                    except Exception as e:
+                        last_error = e
+        finally:
+            # The answer is known, the queries
+            # still in flight are not needed
+            for task in pending:
+                task.cancel()
+
+        if last_error is not None and not pending:
+            raise last_error
+        raise resolver.LifetimeTimeout(timeout=lifetime, errors=[])
+
+    def stats(self) -> List[Dict[str, Union[str, int, float, None]]]:
+        with self._lock:
+            return [upstream.stats() for upstream in self.upstreams]
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+# Resolver answering every DNS query of the package, the
+# default system resolver of dnspython is used when None
+_resolver = None
+
+
+def get_resolver():
+    return _resolver
+
+
+def set_resolver(instance) -> Optional[object]:
+    """Replaces the resolver used by every DNS lookup. Any object with
+    a `resolve(qname, rdtype, lifetime)` method and an `async_resolve`
+    coroutine with the same signature can be used, for example a
+    `MultiResolver` or a stub answering from memory. Passing None
+    restores the default resolver. The previous one is returned"""
+    global _resolver
+    previous, _resolver = _resolver, instance
+    return previous
+
+
+def configure(nameservers: Optional[Iterable[str]] = None, **kwargs) -> MultiResolver:
+    """Uses a `MultiResolver` for every DNS lookup
+
+    >>> configure(['1.1.1.1', '8.8.8.8'], race_after=0.1)
+    """
+    instance = MultiResolver(nameservers, **kwargs)
+    set_resolver(instance)
+    return instance
+
+
+def resolve(qname: str, rdtype=rdtype_mx, lifetime: float = 10) -> Answer:
+    if _resolver is None:
+        return resolver.resolve(qname=qname, rdtype=rdtype, lifetime=lifetime)
+    return _resolver.resolve(qname, rdtype, lifetime)
+
+
+async def async_resolve(qname: str, rdtype=rdtype_mx, lifetime: float = 10) -> Answer:
+    if _resolver is None:
+        return await asyncresolver.resolve(qname=qname, rdtype=rdtype, lifetime=lifetime)
+    return await _resolver.async_resolve(qname, rdtype, lifetime)
@@ -0,0 +1,433 @@
+import json
+import mmap
+import struct
+import sys
+import weakref
+from array import array
+from enum import IntFlag
+from typing import (IO, Any, Dict, FrozenSet, Iterable, Iterator, List,
+                    Literal, NamedTuple, Optional, Tuple, Union)
+
+from py_email_verifier.models import VerificationResult
+
+MAGIC = b'PEVR'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHH')
+CHUNK = struct.Struct('<QII')
+TRAILER = struct.Struct('<QI4s')
+
+# Bytes used by each row in the fixed-width columns
+ROW_SIZE = 8 + 4 + 4 + 1 + 1
+
+COLUMNS = ('offset', 'evaluation', 'end', 'result', 'risky')
+
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+class Evaluation(IntFlag):
+    """Fixed set of the evaluations recorded on the addresses. The
+    free-form codes of `EmailAddress.evaluation` are mapped to these
+    flags by `to_flags` and back by `from_flags`"""
+
+    PROTECTED = 1 << 0
+    CATCH_ALL = 1 << 1
+    BLACKLISTED = 1 << 2
+    SYNTAX_ERROR = 1 << 3
+    DOMAIN_ERROR = 1 << 4
+    DNS_ERROR = 1 << 5
+    DNS_TIMEOUT = 1 << 6
+    DEAD_SERVER = 1 << 7
+    SMTP_PROTOCOL = 1 << 8
+    SMTP_UNREACHABLE = 1 << 9
+    ATTEMPT_REJECTED = 1 << 10
+    UNKNOWN_EMAIL = 1 << 11
+    ERROR = 1 << 12
+    # Any code that is not part of this set
+    OTHER = 1 << 31
+
+
+EVALUATION_CODES: Dict[str, Evaluation] = {
+    'protected': Evaluation.PROTECTED,
+    'catch_all': Evaluation.CATCH_ALL,
+    'blacklisted': Evaluation.BLACKLISTED,
+    'syntax_error': Evaluation.SYNTAX_ERROR,
+    'domain_error': Evaluation.DOMAIN_ERROR,
+    'dns_error': Evaluation.DNS_ERROR,
+    'timeout': Evaluation.DNS_TIMEOUT,
+    'dead_server': Evaluation.DEAD_SERVER,
+    'smtp_protocol': Evaluation.SMTP_PROTOCOL,
+    'Timeout or dead server or port 25 blocked': Evaluation.SMTP_UNREACHABLE,
+    'attempt_rejected': Evaluation.ATTEMPT_REJECTED,
+    'unknown_email': Evaluation.UNKNOWN_EMAIL,
+    'error': Evaluation.ERROR,
+    'other': Evaluation.OTHER
+}
+
+_FLAGS = {code: int(flag) for code, flag in EVALUATION_CODES.items()}
+
+_OTHER = int(Evaluation.OTHER)
+
+_CODES: Dict[int, FrozenSet[str]] = {}
+
+
+def to_flags(codes: Iterable[str]) -> int:
+    """Returns the flags of the evaluation codes. Unknown
+    codes are all recorded as `Evaluation.OTHER`"""
+    flags = 0
+    for code in codes:
+        flags |= _FLAGS.get(code, _OTHER)
+    return flags
+
+
+def from_flags(flags: int) -> FrozenSet[str]:
+    """Returns the evaluation codes of the flags"""
+    codes = _CODES.get(flags)
+    if codes is None:
+        codes = frozenset(code for code, flag in _FLAGS.items() if flags & flag)
+        if len(_CODES) < 4096:
+            _CODES[flags] = codes
+    return codes
+
+
+def _encode_result(result: Optional[bool]) -> int:
+    return -1 if result is None else int(result)
+
+
+def _decode_result(value: int) -> Optional[bool]:
+    return None if value < 0 else bool(value)
+
+
+def _padding(position: int) -> bytes:
+    return b'\x00' * (-position % 8)
+
+
+def _to_bytes(values: array) -> bytes:
+    if not _LITTLE_ENDIAN and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class ResultWriter:
+    """
+    Writes verification results to the compact binary format. The rows
+    of the current chunk are buffered and written once `chunk_size`
+    rows are collected, so the memory stays constant regardless of the
+    number of results. The footer is only written by `close`
+
+    Each chunk stores its columns one after another so that a column
+    can be scanned without decoding the rows:
+
+        offset      uint64   position of the address in the input
+        evaluation  uint32   `Evaluation` flags
+        end         uint32   end of the address in the chunk's string heap
+        result      int8     1 deliverable, 0 undeliverable, -1 unknown
+        risky       uint8
+        heap                 UTF-8 encoded addresses
+
+    The chunks are followed by a footer listing their position, row
+    count and heap size, then by a trailer pointing to the footer. All
+    the integers are little-endian and the chunks are aligned on 8 bytes
+    so that the columns can be cast directly from a memory map
+
+    >>> with ResultWriter('results.pevr') as writer:
+    ...     writer.write(email.to_result(True))
+    """
+
+    def __init__(self, file: Union[str, IO[bytes]], chunk_size: int = 65536):
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.closed = False
+        self._owns_file = isinstance(file, str)
+        self._file: IO[bytes] = open(file, 'wb') if isinstance(file, str) else file
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0))
+        self._position = HEADER.size
+        self._chunks: List[Tuple[int, int, int]] = []
+        self._reset()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.count} results>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _reset(self):
+        self._offsets = array('Q')
+        self._flags = array('I')
+        self._ends = array('I')
+        self._results = array('b')
+        self._risky = array('B')
+        self._heap = bytearray()
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._position += len(data)
+
+    def _flush_chunk(self):
+        if not self._offsets:
+            return
+
+        self._write(_padding(self._position))
+        self._chunks.append((self._position, len(self._offsets), len(self._heap)))
+        for column in (self._offsets, self._flags, self._ends, self._results, self._risky):
+            self._write(_to_bytes(column))
+        self._write(bytes(self._heap))
+        self._reset()
+
+    def write(self, result: VerificationResult, offset: Optional[int] = None):
+        """Adds a result. `offset` is the position of the address in
+        the input and defaults to the number of results written"""
+        if self.closed:
+            raise Exception('The writer is closed')
+
+        self._heap += result.email.encode('utf-8', errors='surrogatepass')
+        self._ends.append(len(self._heap))
+        self._offsets.append(self.count if offset is None else offset)
+        self._flags.append(to_flags(result.evaluation))
+        self._results.append(_encode_result(result.result))
+        self._risky.append(bool(result.risky))
+        self.count += 1
+
+        if len(self._offsets) >= self.chunk_size:
+            self._flush_chunk()
+
+    def write_many(self, results: Iterable[VerificationResult]) -> int:
+        before = self.count
+        for result in results:
+            self.write(result)
+        return self.count - before
+
+    def write_response(self, response: Dict[str, Any]):
+        """Adds a result from its `json_response`, for example a line
+        of the output of the pipeline"""
+        result = VerificationResult(
+            response['email'],
+            response.get('result'),
+            response.get('risky', False),
+            frozenset(response.get('evaluation', ()))
+        )
+        self.write(result, response.get('offset'))
+
+    def close(self):
+        if self.closed:
+            return
+
+        self._flush_chunk()
+        self._write(_padding(self._position))
+        footer = self._position
+        for chunk in self._chunks:
+            self._write(CHUNK.pack(*chunk))
+        self._write(TRAILER.pack(footer, len(self._chunks), MAGIC))
+        self._file.flush()
+        if self._owns_file:
+            self._file.close()
+        self.closed = True
+
+
+class Chunk(NamedTuple):
+    position: int
+    count: int
+    heap_size: int
+    # Index of the first row of the chunk
+    start: int
+
+
+class ResultReader:
+    """
+    Reads a file written by `ResultWriter` through a memory map. Rows
+    are only decoded when they are accessed and the columns can be
+    scanned chunk by chunk without building any result, which makes
+    filtering millions of results cheap
+
+    The views returned by `columns` point into the memory map and are
+    released when the reader is closed
+
+    >>> with ResultReader('results.pevr') as reader:
+    ...     len(reader)
+    ...     undeliverable = list(reader.select(result=False))
+    ...     reader[undeliverable[0]]
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap: Optional[mmap.mmap] = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise Exception(f'Not a result file: {path}')
+
+        self._view = memoryview(self._mmap)
+        # Views handed out on the memory map, which
+        # has to be closed without any of them left
+        self._exports: 'weakref.WeakValueDictionary[int, memoryview]' = weakref.WeakValueDictionary()
+        try:
+            self.chunks = self._read_chunks()
+        except Exception:
+            self.close()
+            raise
+        self.count = sum(chunk.count for chunk in self.chunks)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.count} results>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self) -> Iterator[VerificationResult]:
+        for chunk in self.chunks:
+            offsets, flags, ends, results, risky = self.columns(chunk)
+            heap = self._get_heap(chunk)
+            start = 0
+            for i in range(chunk.count):
+                email = str(heap[start:ends[i]], 'utf-8', errors='surrogatepass')
+                start = ends[i]
+                yield VerificationResult(email, _decode_result(results[i]), bool(risky[i]), from_flags(flags[i]))
+
+    def __getitem__(self, index: int) -> VerificationResult:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('Result index out of range')
+
+        chunk = self._find_chunk(index)
+        i = index - chunk.start
+        _, flags, ends, results, risky = self.columns(chunk)
+        heap = self._get_heap(chunk)
+        start = ends[i - 1] if i else 0
+        email = str(heap[start:ends[i]], 'utf-8', errors='surrogatepass')
+        return VerificationResult(email, _decode_result(results[i]), bool(risky[i]), from_flags(flags[i]))
+
+    def _read_chunks(self) -> List[Chunk]:
+        size = len(self._view)
+        if size < HEADER.size + TRAILER.size:
+            raise Exception(f'Not a result file: {self.path}')
+
+        magic, version, _ = HEADER.unpack_from(self._view, 0)
+        footer, count, trailer_magic = TRAILER.unpack_from(self._view, size - TRAILER.size)
+        if magic != MAGIC or trailer_magic != MAGIC:
+            raise Exception(f'Not a result file: {self.path}')
+        if version != VERSION:
+            raise Exception(f'Unsupported result file version: {version}')
+
+        chunks = []
+        start = 0
+        for position, rows, heap_size in CHUNK.iter_unpack(self._view[footer:footer + count * CHUNK.size]):
+            chunks.append(Chunk(position, rows, heap_size, start))
+            start += rows
+        return chunks
+
+    def _find_chunk(self, index: int) -> Chunk:
+        low, high = 0, len(self.chunks) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.chunks[middle].start <= index:
+                low = middle
+            else:
+                high = middle - 1
+        return self.chunks[low]
+
+    def _cast(self, start: int, stop: int, typecode: Literal['Q', 'I', 'b', 'B']):
+        view = self._view[start:stop]
+        if _LITTLE_ENDIAN or typecode in ('b', 'B'):
+            return self._export(view.cast(typecode))
+
+        values = array(typecode, view)
+        values.byteswap()
+        return values
+
+    def _export(self, view: memoryview) -> memoryview:
+        self._exports[id(view)] = view
+        return view
+
+    def _get_heap(self, chunk: Chunk) -> memoryview:
+        start = chunk.position + chunk.count * ROW_SIZE
+        return self._export(self._view[start:start + chunk.heap_size])
+
+    def columns(self, chunk: Chunk) -> Tuple[Any, ...]:
+        """Returns the offset, evaluation, end, result and risky
+        columns of the chunk without copying them"""
+        n = chunk.count
+        position = chunk.position
+        return (
+            self._cast(position, position + 8 * n, 'Q'),
+            self._cast(position + 8 * n, position + 12 * n, 'I'),
+            self._cast(position + 12 * n, position + 16 * n, 'I'),
+            self._cast(position + 16 * n, position + 17 * n, 'b'),
+            self._cast(position + 17 * n, position + 18 * n, 'B')
+        )
+
+    def select(self, include: int = 0, exclude: int = 0, result: Any = ..., risky: Optional[bool] = None) -> Iterator[int]:
+        """Yields the index of the rows having all the `include` flags,
+        none of the `exclude` flags and, when they are given, the
+        `result` and the `risky` value. Only the columns are read
+
+        >>> list(reader.select(include=Evaluation.CATCH_ALL, result=True))
+        ... [3, 18, 42]
+        """
+        include = int(include)
+        exclude = int(exclude)
+        for chunk in self.chunks:
+            _, flags, _, results, risky_column = self.columns(chunk)
+            indexes = range(chunk.count)
+            if include or exclude:
+                indexes = [i for i in indexes if flags[i] & include == include and not flags[i] & exclude]
+            if result is not ...:
+                value = _encode_result(result)
+                indexes = [i for i in indexes if results[i] == value]
+            if risky is not None:
+                indexes = [i for i in indexes if bool(risky_column[i]) is risky]
+            for i in indexes:
+                yield chunk.start + i
+
+    def offsets(self) -> Iterator[int]:
+        """Yields the position in the input of each row"""
+        for chunk in self.chunks:
+            yield from self.columns(chunk)[0]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of rows with each evaluation code"""
+        counts = dict.fromkeys(_FLAGS, 0)
+        for chunk in self.chunks:
+            for flags in self.columns(chunk)[1]:
+                if flags:
+                    for code in from_flags(flags):
+                        counts[code] += 1
+        return counts
+
+    def close(self):
+        if self._mmap is None:
+            return
+
+        for view in list(self._exports.values()):
+            view.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+        self._mmap = None
+
+
+def write_results(path: str, results: Iterable[VerificationResult], chunk_size: int = 65536) -> int:
+    """Writes the results to a new file and returns their number"""
+    with ResultWriter(path, chunk_size=chunk_size) as writer:
+        return writer.write_many(results)
+
+
+def convert_json_lines(stream: IO[str], path: str, chunk_size: int = 65536) -> int:
+    """Converts the JSON lines written by the pipeline to the binary
+    format and returns the number of results"""
+    with ResultWriter(path, chunk_size=chunk_size) as writer:
+        for line in stream:
+            if line.strip():
+                writer.write_response(json.loads(line))
+        return writer.count
@@ -0,0 +1,195 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from py_email_verifier.models import VerificationResult
+
+if TYPE_CHECKING:
+    from py_email_verifier.models import EmailAddress
+
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS mx_records ('
+    'domain TEXT PRIMARY KEY, preferences TEXT, error TEXT, expires_at REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS catch_all ('
+    'domain TEXT PRIMARY KEY, is_catch_all INTEGER NOT NULL, expires_at REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS addresses ('
+    'email TEXT PRIMARY KEY, result INTEGER, evaluation TEXT NOT NULL, expires_at REAL NOT NULL)'
+)
+
+TABLES = ('mx_records', 'catch_all', 'addresses')
+
+# DNS errors that are stable enough to be kept,
+# timeouts are always retried on the next run
+CACHEABLE_DNS_ERRORS = ('domain_error', 'dead_server')
+
+# SMTP outcomes that are definitive, temporary failures such as
+# greylisting, timeouts or ambiguous results are retried instead
+CACHEABLE_SMTP_ERRORS = ('unknown_email', 'catch_all')
+
+
+def get_address_key(email: 'EmailAddress') -> str:
+    """The local part is case sensitive but
+    the domain is not"""
+    return f'{email.user}@{email.ace_formatted_domain.lower()}'
+
+
+def is_cacheable_result(email: 'EmailAddress', result: Optional[bool]) -> bool:
+    """Whether the SMTP outcome of the address can be kept: the
+    server accepted the address, rejected it as unknown or the
+    domain is a catch-all one"""
+    if result is True:
+        return True
+    return any(error in email.evaluation for error in CACHEABLE_SMTP_ERRORS)
+
+
+class VerificationStore:
+    """
+    Persistent cache of the MX records and catch-all verdicts of the
+    domains and of the SMTP outcome of the addresses, backed by SQLite.
+    Each kind of entry has its own TTL and the writes are buffered and
+    committed in a single transaction every `batch_size` writes
+
+    >>> with VerificationStore('verifications.db') as store:
+    ...     validate_or_fail('test@gmail.com', store=store)
+    """
+
+    def __init__(self, path: str = 'verifications.db', mx_ttl: float = 86400, mx_error_ttl: float = 3600, catch_all_ttl: float = 604800, address_ttl: float = 604800, batch_size: int = 500, timer=time.time):
+        self.path = path
+        self.mx_ttl = mx_ttl
+        self.mx_error_ttl = mx_error_ttl
+        self.catch_all_ttl = catch_all_ttl
+        self.address_ttl = address_ttl
+        self.batch_size = batch_size
+        self.timer = timer
+        self._pending: Dict[str, Dict[str, Tuple[Any, ...]]] = {table: {} for table in TABLES}
+        self._lock = threading.RLock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.path}>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _get(self, table: str, column: str, key: str, fields: str) -> Optional[Tuple[Any, ...]]:
+        with self._lock:
+            row = self._pending[table].get(key)
+            if row is None:
+                row = self._connection.execute(
+                    f'SELECT {fields}, expires_at FROM {table} WHERE {column} = ?',
+                    (key,)
+                ).fetchone()
+            else:
+                row = row[1:]
+
+        if row is None or row[-1] <= self.timer():
+            return None
+        return row[:-1]
+
+    def _set(self, table: str, row: Tuple[Any, ...]):
+        with self._lock:
+            self._pending[table][row[0]] = row
+            if sum(len(rows) for rows in self._pending.values()) >= self.batch_size:
+                self.flush()
+
+    def get_mx_records(self, domain: str) -> Optional[Tuple[Optional[Dict[str, int]], Optional[str]]]:
+        """Returns the records of the domain with their preference
+        and the evaluation of the DNS error if the lookup failed"""
+        row = self._get('mx_records', 'domain', domain.lower(), 'preferences, error')
+        if row is None:
+            return None
+
+        preferences, error = row
+        return (json.loads(preferences) if preferences is not None else None), error
+
+    def set_mx_records(self, domain: str, preferences: Dict[str, int]):
+        expires_at = self.timer() + self.mx_ttl
+        self._set('mx_records', (domain.lower(), json.dumps(preferences), None, expires_at))
+
+    def set_mx_error(self, domain: str, error: str):
+        expires_at = self.timer() + self.mx_error_ttl
+        self._set('mx_records', (domain.lower(), None, error, expires_at))
+
+    def get_catch_all(self, domain: str) -> Optional[bool]:
+        row = self._get('catch_all', 'domain', domain.lower(), 'is_catch_all')
+        return None if row is None else bool(row[0])
+
+    def set_catch_all(self, domain: str, is_catch_all: bool):
+        expires_at = self.timer() + self.catch_all_ttl
+        self._set('catch_all', (domain.lower(), int(is_catch_all), expires_at))
+
+    def get_result(self, email: 'EmailAddress') -> Optional[VerificationResult]:
+        row = self._get('addresses', 'email', get_address_key(email), 'result, evaluation')
+        if row is None:
+            return None
+
+        result, evaluation = row
+        evaluation = frozenset(json.loads(evaluation))
+        return VerificationResult(
+            email.email,
+            None if result is None else bool(result),
+            'protected' in evaluation or 'catch_all' in evaluation,
+            evaluation
+        )
+
+    def set_result(self, email: 'EmailAddress', result: Optional[bool]):
+        expires_at = self.timer() + self.address_ttl
+        value = None if result is None else int(result)
+        evaluation = json.dumps(sorted(email.evaluation))
+        self._set('addresses', (get_address_key(email), value, evaluation, expires_at))
+
+    def flush(self):
+        """Writes the buffered entries in a single transaction"""
+        with self._lock:
+            with self._connection:
+                for table, rows in self._pending.items():
+                    if rows:
+                        placeholders = ', '.join('?' * len(next(iter(rows.values()))))
+                        self._connection.executemany(
+                            f'INSERT OR REPLACE INTO {table} VALUES ({placeholders})',
+                            rows.values()
+                        )
+                        rows.clear()
+
+    def prune(self) -> Dict[str, int]:
+        """Deletes the expired entries and returns the
+        number of rows deleted from each table"""
+        self.flush()
+        now = self.timer()
+
+        deleted = {}
+        with self._lock:
+            with self._connection:
+                for table in TABLES:
+                    cursor = self._connection.execute(
+                        f'DELETE FROM {table} WHERE expires_at <= ?',
+                        (now,)
+                    )
+                    deleted[table] = cursor.rowcount
+            self._connection.execute('VACUUM')
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        with self._lock:
+            return {
+                table: self._connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in TABLES
+            }
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._connection.close()
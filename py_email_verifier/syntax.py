@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from py_email_verifier.constants import USER_REGEX
+from py_email_verifier.domains import normalize_domain
+
+# This module is the entry point of the callers that only check the
+# syntax of the addresses. It must not import the DNS, SMTP or async
+# machinery, nor the typing module, so that it loads in a few
+# milliseconds, which is checked by benchmarks.import_time
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Iterable, List, Optional, Tuple
+
+# Reason codes returned by the batch syntax validator
+INVALID_TYPE = 'invalid_type'
+MISSING_AT = 'missing_at'
+INVALID_USER = 'invalid_user'
+INVALID_DOMAIN = 'invalid_domain'
+IDNA_ERROR = 'idna_error'
+
+
+def check_syntax(value: Any) -> Optional[str]:
+    """Validates the structure of a raw email address without building
+    an `EmailAddress` and returns None when it is valid or the reason
+    code of the failure otherwise
+
+    >>> check_syntax('test@gmail.com')
+    ... None
+    >>> check_syntax('test.gmail.com')
+    ... 'missing_at'
+    """
+    if not isinstance(value, str):
+        return INVALID_TYPE
+
+    user, at, domain = value.rpartition('@')
+    if not at:
+        return MISSING_AT
+
+    if not USER_REGEX.match(user):
+        return INVALID_USER
+
+    info = normalize_domain(domain)
+    if info.idna_error is not None:
+        return IDNA_ERROR
+
+    if not info.is_valid:
+        return INVALID_DOMAIN
+    return None
+
+
+def validate_syntax_many(values: Iterable[Any]) -> Tuple[List[bool], List[Optional[str]]]:
+    """Validates the structure of many raw email addresses at once and
+    returns a boolean mask with the reason code of each failure. No
+    exception is raised and the domain checks are only done once for
+    each unique domain which makes it cheap to pre-filter large lists
+    before the DNS and SMTP stages
+
+    >>> mask, reasons = validate_syntax_many(['test@gmail.com', 'test@'])
+    ... mask
+    ... [True, False]
+    ... reasons
+    ... [None, 'invalid_domain']
+    """
+    # Local names avoid the global lookups
+    # in the loop when there are millions
+    # of values
+    match_user = USER_REGEX.match
+    normalize = normalize_domain
+
+    mask: List[bool] = []
+    reasons: List[Optional[str]] = []
+    add_mask = mask.append
+    add_reason = reasons.append
+
+    for value in values:
+        reason = None
+        if not isinstance(value, str):
+            reason = INVALID_TYPE
+        else:
+            user, at, domain = value.rpartition('@')
+            if not at:
+                reason = MISSING_AT
+            elif not match_user(user):
+                reason = INVALID_USER
+            else:
+                info = normalize(domain)
+                if info.idna_error is not None:
+                    reason = IDNA_ERROR
+                elif not info.is_valid:
+                    reason = INVALID_DOMAIN
+
+        add_mask(reason is None)
+        add_reason(reason)
+    return mask, reasons
+
+
+def is_valid_syntax(value: Any) -> bool:
+    """
+    >>> is_valid_syntax('test@gmail.com')
+    ... True
+    """
+    return check_syntax(value) is None
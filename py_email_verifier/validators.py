@@ -1,44 +1,185 @@
-from functools import cached_property
-
-import idna
+from functools import cached_property, partial
+from itertools import islice
+from typing import (TYPE_CHECKING, Any, Dict, Iterable, Iterator, List,
+                    Optional, Tuple, Union)
 
 from py_email_verifier.blacklist import blacklist
-from py_email_verifier.models import EmailAddress
-from py_email_verifier.verifiers.smtp_verifier import smtp_check
-from py_email_verifier.verifiers.dns_verifier import verify_dns
-from py_email_verifier.verifiers.email_verifier import validate_email
+from py_email_verifier.exceptions import (AddressNotDeliverableError,
+                                          DomainBlacklistedError)
+from py_email_verifier.models import EmailAddress, VerificationResult
+from py_email_verifier.verifiers.email_verifier import (validate_email,
+                                                       validate_syntax_many)
+
+if TYPE_CHECKING:
+    from py_email_verifier.store import VerificationStore
+    from py_email_verifier.verifiers.identities import IdentityPool
+
+
+# The DNS and SMTP verifiers pull in dnspython, smtplib, ssl and
+# asyncio. They are only imported once an address needs them so
+# that the syntax checks stay cheap to import
+
+
+def verify_dns(email_object: EmailAddress, timeout: int = 10):
+    from py_email_verifier.verifiers.dns_verifier import verify_dns
+    return verify_dns(email_object, timeout=timeout)
+
+
+def smtp_check(email: EmailAddress, mx_records=None, **kwargs):
+    from py_email_verifier.verifiers.smtp_verifier import smtp_check
+    return smtp_check(email, mx_records, **kwargs)
+
+
+def smtp_check_many(emails: Iterable[EmailAddress], mx_records: Iterable[str], **kwargs):
+    from py_email_verifier.verifiers.smtp_verifier import smtp_check_many
+    return smtp_check_many(emails, mx_records, **kwargs)
+
+
+def smtp_check_scheduled(emails: Iterable[EmailAddress], mx_records: Iterable[str], scheduling: Dict[str, Any], **kwargs) -> Dict[EmailAddress, Optional[bool]]:
+    """Same as `smtp_check_many` but the sessions are rate limited and the
+    temporary failures retried by an `SMTPScheduler` created with the
+    `scheduling` options"""
+    from py_email_verifier.verifiers.scheduler import SMTPScheduler
+
+    scheduler = SMTPScheduler(**scheduling, **kwargs)
+    scheduler.submit(emails, mx_records)
+    return dict(scheduler.run())
+
+
+def _get_catch_all_cache():
+    from py_email_verifier.verifiers.smtp_verifier import catch_all_cache
+    return catch_all_cache
+
+
+def _verify_dns(email_object: EmailAddress, timeout: int = 10, store: Optional['VerificationStore'] = None):
+    """Resolves the MX records of the address or reuses the
+    records, or the DNS error, kept in the store for its domain"""
+    if store is None or email_object.get_literal_ip:
+        return verify_dns(email_object, timeout=timeout)
+
+    from py_email_verifier.store import CACHEABLE_DNS_ERRORS
+
+    domain = email_object.ace_formatted_domain
+    cached = store.get_mx_records(domain)
+    if cached is not None:
+        preferences, error = cached
+        if error is not None:
+            email_object.add_error(error)
+            raise Exception(f'Cached DNS error for domain: {error}')
+
+        records = set(preferences or ())
+        email_object.add_mx_records(records, preferences)
+        return records
+
+    try:
+        mx_records = verify_dns(email_object, timeout=timeout)
+    except Exception:
+        for error in CACHEABLE_DNS_ERRORS:
+            if error in email_object.evaluation:
+                store.set_mx_error(domain, error)
+        raise
+
+    preferences = {record: email_object.mx_preferences.get(record, 0) for record in mx_records}
+    store.set_mx_records(domain, preferences)
+    return mx_records
+
+
+def _load_catch_all(email_object: EmailAddress, store: 'VerificationStore'):
+    # The in-memory cache is the one used by the
+    # SMTP checks so it is seeded from the store
+    catch_all_cache = _get_catch_all_cache()
+    domain = email_object.ace_formatted_domain.lower()
+    if domain not in catch_all_cache:
+        verdict = store.get_catch_all(domain)
+        if verdict is not None:
+            catch_all_cache.set(domain, verdict)
+
 
+def _save_catch_all(email_object: EmailAddress, store: 'VerificationStore'):
+    domain = email_object.ace_formatted_domain.lower()
+    verdict = _get_catch_all_cache().get(domain)
+    if verdict is not None:
+        store.set_catch_all(domain, verdict)
 
-def validate_or_fail(email, *, check_format=True, check_blacklist=True, check_dns=True, dns_timeout=10, check_smtp=True, smtp_timeout=10, smtp_helo_host=None, smtp_from_address=None, smtp_debug=False):
+
+def _save_result(email_object: EmailAddress, result: Optional[bool], store: 'VerificationStore'):
+    # Temporary failures are retried on the next run
+    # instead of being served from the store
+    from py_email_verifier.store import is_cacheable_result
+    if is_cacheable_result(email_object, result):
+        store.set_result(email_object, result)
+
+
+def validate_or_fail(email, *, check_format=True, check_blacklist=True, check_dns=True, dns_timeout=10, check_smtp=True, smtp_timeout=10, smtp_helo_host=None, smtp_from_address=None, smtp_debug=False, smtp_check_catch_all=True, smtp_source_address=None, smtp_identities: Optional['IdentityPool'] = None, store: Optional['VerificationStore'] = None):
     """
     Return `True` if the email address validation is successful, `None`
     if the validation result is ambigious, and raise an exception if the
     validation fails
+
+    With `smtp_check_catch_all`, the domain is first probed with a random
+    address and the addresses of catch-all domains are accepted as risky
+
+    The SMTP sessions leave from `smtp_source_address` or use the sender
+    identities of `smtp_identities`, see `IdentityPool`. The address, or
+    `smtp_from_address` when given, is used in the MAIL FROM command
+
+    When a `store` is given, the outcome of an address verified during
+    a previous run is returned without any DNS or SMTP work and the MX
+    records and catch-all verdicts of the domains are reused. Temporary
+    failures such as greylisting or timeouts are not kept in the store
     """
     email_object = EmailAddress(email)
 
     if check_format:
         validate_email(email_object)
 
-    if check_blacklist:
-        pass
+    if check_blacklist and blacklist.is_blacklisted(email_object):
+        email_object.add_error('blacklisted')
+        raise DomainBlacklistedError(email_object)
+
+    if store is not None and check_smtp:
+        cached = store.get_result(email_object)
+        if cached is not None:
+            for error in cached.evaluation:
+                email_object.add_error(error)
+            if cached.result is False:
+                # Same outcome as the verification that was stored
+                raise AddressNotDeliverableError(email_object, 'unknown_email')
+            return email_object, [cached.result is True]
 
-    mx_records = verify_dns(email_object, timeout=dns_timeout)
+    mx_records = _verify_dns(email_object, timeout=dns_timeout, store=store)
 
     if not check_smtp:
-        return True
-    
-    if smtp_from_address is not None:
-        pass
+        return email_object, [True]
+
+    if isinstance(smtp_from_address, str):
+        # The sender of the MAIL FROM command
+        smtp_from_address = EmailAddress(smtp_from_address)
+
+    if store is not None:
+        _load_catch_all(email_object, store)
+
+    try:
+        results = smtp_check(
+            email=email_object,
+            mx_records=mx_records,
+            timeout=smtp_timeout,
+            helo_host=smtp_helo_host,
+            from_address=smtp_from_address,
+            debug=smtp_debug,
+            check_catch_all=smtp_check_catch_all,
+            source_address=smtp_source_address,
+            identities=smtp_identities
+        )
+    except AddressNotDeliverableError:
+        if store is not None:
+            _save_result(email_object, False, store)
+        raise
 
-    return email_object, smtp_check(
-        email=email_object,
-        mx_records=mx_records,
-        timeout=smtp_timeout,
-        helo_host=smtp_helo_host,
-        from_address=smtp_from_address,
-        debug=smtp_debug
-    )
+    if store is not None:
+        _save_catch_all(email_object, store)
+        _save_result(email_object, any(results), store)
+    return email_object, results
 
 
 def validate(email, **kwargs):
@@ -53,3 +194,195 @@ def validate(email, **kwargs):
         return None, False
     else:
         return any(validation_results), email_object
+
+
+def build_email_objects(chunk: List[Union[str, EmailAddress]], check_format: bool = True, check_blacklist: bool = True):
+    """Creates the `EmailAddress` instances for a chunk of raw values
+    and groups them by their ACE formatted domain. Values that cannot
+    be parsed and addresses of blacklisted domains are returned
+    separately with their position
+
+    >>> groups, rejected = build_email_objects(['foo@gmail.com', 'bar'])
+    ... groups, rejected
+    ... ({'gmail.com': [(0, <EmailAddress: foo@gmail.com>)]}, [(1, 'bar')])
+    """
+    groups: Dict[str, List[Tuple[int, EmailAddress]]] = {}
+    rejected: List[Tuple[int, Union[str, EmailAddress]]] = []
+
+    if check_format:
+        # Reject the malformed values in one pass before
+        # building any object for the rest of the chunk
+        values = [value.email if isinstance(value, EmailAddress) else value for value in chunk]
+        mask, _ = validate_syntax_many(values)
+    else:
+        mask = [True] * len(chunk)
+
+    for index, value in enumerate(chunk):
+        if not mask[index]:
+            rejected.append((index, value))
+            continue
+
+        try:
+            email_object = value if isinstance(value, EmailAddress) else EmailAddress(value)
+        except Exception:
+            rejected.append((index, value))
+        else:
+            if check_blacklist and blacklist.is_blacklisted(email_object):
+                email_object.add_error('blacklisted')
+                rejected.append((index, email_object))
+                continue
+
+            key = email_object.ace_formatted_domain.lower()
+            groups.setdefault(key, []).append((index, email_object))
+    return groups, rejected
+
+
+def validate_domain(items: List[Tuple[int, EmailAddress]], *, check_dns=True, dns_timeout=10, check_smtp=True, smtp_timeout=10, smtp_helo_host=None, smtp_from_address=None, smtp_debug=False, smtp_max_recipients=50, smtp_check_catch_all=True, smtp_source_address=None, smtp_identities: Optional['IdentityPool'] = None, smtp_scheduling: Optional[Dict[str, Any]] = None, store: Optional['VerificationStore'] = None):
+    """Validates every address of a single domain. The MX records
+    are resolved once using the first address of the group and then
+    shared with the remaining addresses which are all probed over
+    the same SMTP sessions. Yields `(index, result, email)` for each
+    item, the options are the ones of `validate_many`
+
+    With `smtp_scheduling`, the options of an `SMTPScheduler`, the
+    temporary failures of the domain are retried with a backoff before
+    the results are returned, see `smtp_check_scheduled`"""
+    if store is not None and check_dns and check_smtp:
+        remaining = []
+        for index, email_object in items:
+            cached = store.get_result(email_object)
+            if cached is None:
+                remaining.append((index, email_object))
+                continue
+
+            for error in cached.evaluation:
+                email_object.add_error(error)
+            yield index, cached.result, email_object
+
+        items = remaining
+        if not items:
+            return
+
+    first = items[0][1]
+
+    mx_records = None
+    if check_dns:
+        try:
+            mx_records = _verify_dns(first, timeout=dns_timeout, store=store)
+        except Exception:
+            for index, email_object in items:
+                yield index, False, email_object
+            return
+
+        for _, email_object in items[1:]:
+            email_object.add_mx_records(set(mx_records), first.mx_preferences)
+
+    if not check_smtp:
+        for index, email_object in items:
+            yield index, True, email_object
+        return
+
+    mx_records = first.sort_mx_records(mx_records)
+
+    if store is not None:
+        _load_catch_all(first, store)
+
+    check = smtp_check_many
+    if smtp_scheduling is not None:
+        check = partial(smtp_check_scheduled, scheduling=smtp_scheduling)
+
+    try:
+        results = check(
+            [email_object for _, email_object in items],
+            mx_records=mx_records,
+            timeout=smtp_timeout,
+            helo_host=smtp_helo_host,
+            from_address=smtp_from_address,
+            debug=smtp_debug,
+            max_recipients=smtp_max_recipients,
+            check_catch_all=smtp_check_catch_all,
+            source_address=smtp_source_address,
+            identities=smtp_identities
+        )
+    except Exception:
+        results = {}
+
+    if store is not None:
+        _save_catch_all(first, store)
+        for email_object, result in results.items():
+            _save_result(email_object, result, store)
+
+    for index, email_object in items:
+        yield index, results.get(email_object), email_object
+
+
+def rejected_result(value: Union[str, EmailAddress]) -> VerificationResult:
+    """Returns the failed result of a value that was rejected by
+    `build_email_objects`, either a raw value that could not be
+    parsed or an address of a blacklisted domain"""
+    if isinstance(value, EmailAddress):
+        return value.to_result(False)
+    return VerificationResult(str(value), False, evaluation=frozenset(['syntax_error']))
+
+
+def validate_many(emails: Iterable[Union[str, EmailAddress]], *, ordered: bool = True, chunk_size: int = 10000, check_format=True, check_blacklist=True, **kwargs) -> Iterator[VerificationResult]:
+    """
+    Validates an iterable of email addresses and yields an immutable
+    `VerificationResult` for each one of them. The addresses are read in
+    chunks of `chunk_size` and grouped by domain so that the DNS lookup
+    and the SMTP probes are done once per unique domain instead of once
+    per address
+
+    When `ordered` is True, the results are yielded in the same order as
+    the input, otherwise they are yielded as soon as each domain is done
+
+    Temporary SMTP failures such as greylisting are returned with a None
+    result unless `smtp_scheduling` gives the options of the scheduler
+    which retries them, for example `{'greylist_delay': 300}`
+
+    >>> for item in validate_many(['foo@gmail.com', 'bar@gmail.com']):
+    ...     print(item.email, item.result, item.risky)
+    """
+    if chunk_size < 1:
+        raise ValueError("'chunk_size' should be greater than 0")
+
+    iterator = iter(emails)
+
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+
+        groups, rejected = build_email_objects(
+            chunk,
+            check_format=check_format,
+            check_blacklist=check_blacklist
+        )
+
+        if not ordered:
+            for _, value in rejected:
+                yield rejected_result(value)
+
+            for items in groups.values():
+                for _, result, email_object in validate_domain(items, **kwargs):
+                    yield email_object.to_result(result)
+            continue
+
+        completed: Dict[int, VerificationResult] = {}
+        for index, value in rejected:
+            completed[index] = rejected_result(value)
+
+        next_index = 0
+        for items in groups.values():
+            for index, result, email_object in validate_domain(items, **kwargs):
+                completed[index] = email_object.to_result(result)
+
+            # Release the results that are now contiguous
+            # with the ones that were already yielded
+            while next_index in completed:
+                yield completed.pop(next_index)
+                next_index += 1
+
+        while next_index in completed:
+            yield completed.pop(next_index)
+            next_index += 1
@@ -0,0 +1,335 @@
+import asyncio
+import socket
+import ssl
+import sys
+import time
+from functools import lru_cache
+from smtplib import SMTPResponseException, SMTPServerDisconnected
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from py_email_verifier.exceptions import CircuitOpenError
+from py_email_verifier.verifiers.dns_verifier import get_host_addresses
+from py_email_verifier.verifiers.timeouts import (AdaptiveTimeouts,
+                                                  host_timeouts)
+
+if TYPE_CHECKING:
+    from py_email_verifier.models import EmailAddress
+
+
+STAGES = ('connect', 'banner', 'starttls', 'ehlo', 'mail', 'rcpt', 'quit')
+
+
+@lru_cache(maxsize=1)
+def get_local_hostname() -> str:
+    """Returns the fully qualified name of the machine which
+    is used in the EHLO/HELO command, like `smtplib.SMTP`"""
+    fqdn = socket.getfqdn()
+    if '.' in fqdn:
+        return fqdn
+    try:
+        address = socket.gethostbyname(socket.gethostname())
+    except socket.gaierror:
+        address = '127.0.0.1'
+    return f'[{address}]'
+
+
+def create_tls_context() -> ssl.SSLContext:
+    # Same behaviour as smtplib.SMTP.starttls which does
+    # not validate the certificate of the remote server
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class AsyncSMTPVerifier:
+    """
+    Non blocking version of the `SMTPVerifier` built on top of
+    `asyncio.open_connection`. It runs the same connect -> STARTTLS ->
+    EHLO/HELO -> MAIL -> RCPT dialogue and records the same evaluations
+    on the email address
+
+    Each stage of the dialogue has its own deadline which defaults to
+    `timeout` and can be overriden with `stage_timeouts`. It is shortened
+    to the deadline learned from the latency of the host by
+    `adaptive_timeouts`, see `SMTPVerifier`
+
+    >>> verifier = AsyncSMTPVerifier(sender, recip, stage_timeouts={'connect': 3})
+    ... await verifier.check('mta-gw.infomaniak.ch')
+    """
+
+    def __init__(self, sender: 'EmailAddress', recip: Optional['EmailAddress'] = None, local_hostname: Optional[str] = None, timeout: float = 10, stage_timeouts: Optional[Dict[str, float]] = None, port: int = 25, debug: bool = False, adaptive_timeouts: Optional[AdaptiveTimeouts] = None):
+        self._sender = sender
+        self._recip = recip
+        self._command = None
+        self._stage = None
+        self._host = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self.local_hostname = local_hostname
+        self.timeout = timeout
+        self.stage_timeouts = stage_timeouts or {}
+        self.adaptive_timeouts = adaptive_timeouts or host_timeouts
+        self.port = port
+        self.debug = debug
+        self.does_esmtp = False
+        self.esmtp_features: Dict[str, str] = {}
+        self.helo_resp: Optional[Tuple[int, str]] = None
+
+    def __str__(self):
+        name = self.__class__.__name__
+        return f'<{name} [{self._sender} -> {self._recip}]>'
+
+    def _print_debug(self, *args):
+        if self.debug:
+            print(f'{self._host}:', *args, file=sys.stderr)
+
+    def get_timeout(self, stage: str) -> float:
+        default = self.stage_timeouts.get(stage, self.timeout)
+        return self.adaptive_timeouts.get_timeout(self._host, stage, default)
+
+    async def _wait(self, aw, stage: str, record: bool = True):
+        # Only the replies of the server are recorded, not
+        # the time spent writing or in the TLS handshake
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(aw, self.get_timeout(stage))
+        except (asyncio.TimeoutError, OSError, EOFError) as error:
+            if record and isinstance(error, asyncio.TimeoutError):
+                self.adaptive_timeouts.record_timeout(self._host, stage)
+            await self.close()
+            raise SMTPServerDisconnected(f'{stage}: {error or "timed out"}')
+
+        if record:
+            self.adaptive_timeouts.observe(self._host, stage, time.perf_counter() - start)
+        return result
+
+    async def getreply(self, stage: str) -> Tuple[int, str]:
+        """Reads a complete, possibly multiline, reply from
+        the server and returns the code and the message"""
+        reader = self._reader
+        if reader is None:
+            raise SMTPServerDisconnected('Please run connect() first')
+
+        async def read():
+            code = -1
+            lines = []
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise EOFError('Connection unexpectedly closed')
+
+                self._print_debug('reply:', repr(line))
+                lines.append(line[4:].strip(b' \t\r\n'))
+
+                try:
+                    code = int(line[:3])
+                except ValueError:
+                    code = -1
+                    break
+
+                if line[3:4] != b'-':
+                    break
+            return code, b'\n'.join(lines).decode('utf-8', errors='replace')
+        return await self._wait(read(), stage)
+
+    async def docmd(self, cmd: str, args: str = '', stage: Optional[str] = None) -> Tuple[int, str]:
+        if self._writer is None:
+            raise SMTPServerDisconnected('Please run connect() first')
+
+        self._command = f'{cmd} {args}' if args else cmd
+        self._stage = stage or cmd.lower()
+        self._print_debug('send:', repr(self._command))
+        self._writer.write(f'{self._command}\r\n'.encode('utf-8'))
+        await self._wait(self._writer.drain(), self._stage, record=False)
+        return await self.getreply(self._stage)
+
+    async def connect(self, host: str = 'localhost', port: Optional[int] = None, source_address=None):
+        """Tries to establish a connection to the email host"""
+        self._command = 'connect'
+        self._stage = 'connect'
+        self._host = host
+
+        try:
+            self.adaptive_timeouts.check(host)
+        except CircuitOpenError as e:
+            self._sender.add_error('smtp_protocol')
+            raise SMTPServerDisconnected(str(e))
+
+        # The addresses resolved along with the MX records are tried
+        # in order, the host name is kept for the STARTTLS handshake
+        for address in get_host_addresses(host):
+            start = time.perf_counter()
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        address,
+                        port or self.port,
+                        local_addr=source_address
+                    ),
+                    self.get_timeout('connect')
+                )
+            except asyncio.TimeoutError as e:
+                self.adaptive_timeouts.record_timeout(host, 'connect')
+                error = e
+            except OSError as e:
+                error = e
+            else:
+                self.adaptive_timeouts.observe(host, 'connect', time.perf_counter() - start)
+                break
+        else:
+            self._sender.add_error('smtp_protocol')
+            raise SMTPServerDisconnected(str(error) or 'connect: timed out')
+
+        code, message = await self.getreply('banner')
+        if code >= 400:
+            raise SMTPResponseException(code, message)
+        self._sender.add_message(host, code, message)
+        return code, message
+
+    async def ehlo(self):
+        code, message = await self.docmd('EHLO', self.local_hostname or get_local_hostname(), stage='ehlo')
+        if code == 250:
+            self.does_esmtp = True
+            self.esmtp_features = {}
+            for line in message.split('\n')[1:]:
+                feature, _, params = line.partition(' ')
+                self.esmtp_features[feature.lower()] = params
+        return code, message
+
+    async def helo(self):
+        return await self.docmd('HELO', self.local_hostname or get_local_hostname(), stage='ehlo')
+
+    async def ehlo_or_helo_if_needed(self):
+        if self.helo_resp is not None:
+            return self.helo_resp
+
+        code, message = await self.ehlo()
+        if not (200 <= code <= 299):
+            code, message = await self.helo()
+            if not (200 <= code <= 299):
+                raise SMTPResponseException(code, message)
+        self.helo_resp = (code, message)
+        return code, message
+
+    async def starttls(self):
+        """Upgrades the connection to TLS when the server
+        supports it. Servers without the extension are used
+        in plain text like in `SMTPVerifier`"""
+        await self.ehlo_or_helo_if_needed()
+        if 'starttls' not in self.esmtp_features:
+            return
+
+        code, _ = await self.docmd('STARTTLS', stage='starttls')
+        if code != 220 or self._writer is None:
+            return
+
+        await self._wait(
+            self._writer.start_tls(create_tls_context(), server_hostname=self._host),
+            'starttls',
+            record=False
+        )
+        # The state of the session has to be
+        # reset after a successful handshake
+        self.helo_resp = None
+        self.does_esmtp = False
+        self.esmtp_features = {}
+
+    async def mail(self, sender: str):
+        code, message = await self.docmd('MAIL', f'FROM:<{sender}>')
+        if code >= 400:
+            self._sender.add_error('attempt_rejected')
+            raise SMTPResponseException(code, message)
+        return code, message
+
+    async def rcpt(self, recip: str):
+        code, message = await self.docmd('RCPT', f'TO:<{recip}>')
+        if code >= 500:
+            # Address clearly invalid
+            self._sender.add_error('unknown_email')
+            raise SMTPResponseException(code, message)
+        elif code >= 400:
+            self._sender.add_error('attempt_rejected')
+            raise SMTPResponseException(code, message)
+        return code, message
+
+    async def close(self):
+        writer, self._writer, self._reader = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), self.get_timeout('quit'))
+            except Exception:
+                pass
+
+    async def quit(self):
+        """Sends QUIT and closes the connection even if
+        it has been lost before"""
+        if self._writer is not None:
+            try:
+                await self.docmd('QUIT')
+            except Exception:
+                pass
+        await self.close()
+        self.helo_resp = None
+        self.does_esmtp = False
+        self.esmtp_features = {}
+
+    async def check(self, record: str) -> bool:
+        """Starts the MTA validation on a single record. Unlike
+        `SMTPVerifier.check`, permanent failures are recorded on
+        the email and returned as False instead of being raised"""
+        if self._recip is None:
+            raise ValueError('A recipient is required to check a record')
+
+        try:
+            await self.connect(host=record)
+            await self.starttls()
+            # Start the standard MTA email validation
+            # ehlo/helo -> mail -> rcpt
+            await self.ehlo_or_helo_if_needed()
+            await self.mail(self._sender.restructure)
+            code, _ = await self.rcpt(self._recip.restructure)
+        except SMTPServerDisconnected:
+            self._sender.add_error('Timeout or dead server or port 25 blocked')
+            return False
+        except SMTPResponseException as e:
+            if e.smtp_code >= 500 and self._stage != 'rcpt':
+                self._sender.add_error('dead_server')
+            self._sender.add_message(self._host, e.smtp_code, str(e.smtp_error))
+            return False
+        finally:
+            await self.quit()
+        return code < 400
+
+
+async def async_smtp_check(email: 'EmailAddress', mx_records: Optional[Iterable[str]] = None, timeout: float = 10, stage_timeouts: Optional[Dict[str, float]] = None, helo_host: Optional[str] = None, from_address: Optional['EmailAddress'] = None, port: int = 25, debug: bool = False) -> List[bool]:
+    """
+    Asynchronous counterpart of `smtp_check`. Every MX record is
+    probed concurrently and the results are returned in the order
+    in which the hosts answered
+
+    >>> email = EmailAddress('test@gmail.com')
+    ... await async_smtp_check(email, await async_verify_dns(email))
+    """
+    sender = from_address or email
+    if mx_records is None:
+        mx_records = email.mx_records
+
+    probes = []
+    for record in mx_records:
+        instance = AsyncSMTPVerifier(
+            sender,
+            recip=email,
+            local_hostname=helo_host,
+            timeout=timeout,
+            stage_timeouts=stage_timeouts,
+            port=port,
+            debug=debug
+        )
+        probes.append(instance.check(record))
+
+    results = []
+    for probe in asyncio.as_completed(probes):
+        results.append(await probe)
+    return results
@@ -1,17 +1,117 @@
-from typing import TYPE_CHECKING, Set
+import asyncio
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, NoReturn, Optional, Set, cast
 
 from dns import resolver
+from dns.exception import DNSException
+from dns.rdatatype import AAAA as rdtype_aaaa
+from dns.rdatatype import A as rdtype_a
 from dns.rdatatype import MX as rdtype_mx
 from dns.rdtypes.ANY.MX import MX
 from dns.resolver import Answer
 
+from py_email_verifier import resolvers
+from py_email_verifier.cache import TTLCache
 from py_email_verifier.constants import HOST_REGEX
+from py_email_verifier.instrumentation import register_cache, timed
 
 if TYPE_CHECKING:
     from py_email_verifier.models import EmailAddress
 
 
-def get_mx_records(email_instance: 'EmailAddress', timeout: int = 10) -> Answer:
+class MXCache(TTLCache):
+    """Process wide cache for the MX answers. Positive answers are
+    kept for the TTL of the record, capped by `ttl`, while NXDOMAIN
+    and NoAnswer results are kept for the shorter `negative_ttl`"""
+
+    negative_errors = (resolver.NXDOMAIN, resolver.NoAnswer)
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600, negative_ttl: float = 300, **kwargs):
+        super().__init__(maxsize=maxsize, ttl=ttl, **kwargs)
+        self.negative_ttl = negative_ttl
+
+    def set_answer(self, domain: str, answer: Answer):
+        rrset = answer.rrset
+        ttl = self.ttl if rrset is None else min(rrset.ttl, self.ttl)
+        self.set(domain, answer, ttl=ttl)
+
+    def set_error(self, domain: str, error: Exception):
+        if isinstance(error, self.negative_errors):
+            self.set(domain, error.__class__, ttl=self.negative_ttl)
+
+
+mx_cache = MXCache()
+register_cache('mx', mx_cache)
+
+# Addresses of the MX hosts, resolved along with the MX records
+# so that the SMTP stage does not have to resolve them again
+host_address_cache = TTLCache(maxsize=10000, ttl=3600)
+register_cache('host_addresses', host_address_cache)
+
+# Time to live of the hosts without any address
+NEGATIVE_ADDRESS_TTL = 300
+
+# The IPv4 addresses come first since many
+# networks cannot reach port 25 over IPv6
+ADDRESS_RDTYPES = (rdtype_a, rdtype_aaaa)
+
+# Upper bound of the threads resolving the host addresses
+MAX_ADDRESS_QUERIES = 16
+
+RESOLVER_ERRORS = (resolver.NXDOMAIN, resolver.NoNameservers, resolver.Timeout, resolver.YXDOMAIN, resolver.NoAnswer)
+
+
+def _raise_resolver_error(email_instance: 'EmailAddress', error: Exception) -> NoReturn:
+    """Records the evaluation corresponding to the resolver
+    error on the email and raises a readable exception"""
+    if isinstance(error, resolver.NXDOMAIN):
+        email_instance.add_error('domain_error')
+        raise Exception('Domain not found')
+    elif isinstance(error, resolver.NoNameservers):
+        raise resolver.NoNameservers
+    elif isinstance(error, resolver.Timeout):
+        email_instance.add_error('timeout')
+        raise Exception('Domain lookup timed out')
+    elif isinstance(error, resolver.YXDOMAIN):
+        email_instance.add_error('dns_error')
+        raise Exception('Misconfigurated DNS entries for domain')
+    elif isinstance(error, resolver.NoAnswer):
+        email_instance.add_error('dead_server')
+        raise Exception('No MX record for domain found')
+    raise error
+
+
+def _lookup_mx(email_instance: 'EmailAddress', timeout: int = 10, use_cache: bool = True) -> Answer:
+    """Same as `get_mx_records` but the resolver
+    errors are raised as they are"""
+    key = email_instance.ace_formatted_domain.lower()
+
+    if use_cache:
+        cached = mx_cache.get(key)
+        if isinstance(cached, Answer):
+            return cached
+        elif cached is not None:
+            raise cached()
+
+    try:
+        with timed('dns'):
+            answer = resolvers.resolve(
+                qname=email_instance.domain,
+                rdtype=rdtype_mx,
+                lifetime=timeout
+            )
+    except RESOLVER_ERRORS as error:
+        if use_cache:
+            mx_cache.set_error(key, error)
+        raise
+    else:
+        if use_cache:
+            mx_cache.set_answer(key, answer)
+        return answer
+
+
+def get_mx_records(email_instance: 'EmailAddress', timeout: int = 10, use_cache: bool = True) -> Answer:
     """Returns the DNS (Domain Name System) records that specify the mail servers 
     responsible for handling incoming email for the particular domain
 
@@ -23,60 +123,209 @@ def get_mx_records(email_instance: 'EmailAddress', timeout: int = 10) -> Answer:
     * example.com.      IN MX 10 mail1.example.com.
     * example.com.      IN MX 20 mail2.example.com.
 
+    The answers are stored in the process wide `mx_cache` so that
+    addresses sharing the same domain only trigger one lookup
+
     >>> email = EmailAddress('test@example.com')
     ... get_mx_records('example.com', 10, email)
     """
     try:
-        return resolver.resolve(
-            qname=email_instance.domain,
-            rdtype=rdtype_mx,
-            lifetime=timeout
-        )
-    except resolver.NXDOMAIN:
-        email_instance.add_error('domain_error')
-        raise Exception('Domain not found')
-    except resolver.NoNameservers:
-        raise resolver.NoNameservers
-    except resolver.Timeout:
-        email_instance.add_error('timeout')
-        raise Exception('Domain lookup timed out')
-    except resolver.YXDOMAIN:
-        email_instance.add_error('dns_error')
-        raise Exception('Misconfigurated DNS entries for domain')
-    except resolver.NoAnswer:
-        email_instance.add_error('dead_server')
-        raise Exception('No MX record for domain found')
+        return _lookup_mx(email_instance, timeout, use_cache)
+    except RESOLVER_ERRORS as error:
+        _raise_resolver_error(email_instance, error)
 
 
-def clean_mx_records(email_instance: 'EmailAddress', timeout: int = 10) -> Set[str]:
-    """Function used to iterate over the Answer provided
-    by the `get_mx_records` function. If an email's domain
-    is valid, it should return a set of valid mx records"""
-    answer = get_mx_records(email_instance, timeout)
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def get_host_addresses(host: str) -> List[str]:
+    """Returns the addresses of the host that were resolved along
+    with the MX records or the host itself when they are unknown,
+    in which case the system resolver is used on connection
+
+    >>> get_host_addresses('gmail-smtp-in.l.google.com')
+    ... ['142.250.27.26', '2a00:1450:4025:c03::1b']
+    """
+    cached = host_address_cache.get(host.lower())
+    return list(cached) if cached else [host]
+
+
+def _get_glue_addresses(answer: Answer) -> Dict[str, List[str]]:
+    """Addresses of the MX hosts sent by the server
+    in the additional section of the MX answer"""
+    result: Dict[str, List[str]] = {}
+    response = getattr(answer, 'response', None)
+    if response is None:
+        return result
+
+    for rdtype in ADDRESS_RDTYPES:
+        for rrset in response.additional:
+            if rrset.rdtype == rdtype:
+                host = rrset.name.to_text().rstrip('.').lower()
+                result.setdefault(host, []).extend(record.address for record in rrset)
+    return result
+
+
+def _get_missing_hosts(hosts: Iterable[str], result: Dict[str, List[str]]) -> List[str]:
+    """Fills the result with the known addresses and
+    returns the hosts that have to be resolved"""
+    missing = []
+    for host in hosts:
+        key = host.lower()
+        if is_ip_address(host):
+            result[host] = [host]
+            continue
+
+        cached = host_address_cache.get(key)
+        if cached is not None:
+            result[host] = list(cached)
+        else:
+            missing.append(host)
+    return missing
+
+
+def _store_addresses(host: str, addresses: List[str]):
+    ttl = None if addresses else NEGATIVE_ADDRESS_TTL
+    host_address_cache.set(host.lower(), tuple(addresses), ttl=ttl)
+
+
+def _use_glue_addresses(hosts: List[str], answer: Answer, result: Dict[str, List[str]]) -> List[str]:
+    """Fills the result with the addresses found in the MX answer
+    and returns the hosts that still have to be resolved"""
+    glue = _get_glue_addresses(answer)
+    missing = []
+    for host in hosts:
+        addresses = glue.get(host.lower())
+        if addresses:
+            _store_addresses(host, addresses)
+            result[host] = addresses
+        else:
+            missing.append(host)
+    return missing
 
+
+def _store_answers(hosts: List[str], queries: List[tuple], answers: List[List[str]], result: Dict[str, List[str]]):
+    for host in hosts:
+        result[host] = []
+    for (host, _), addresses in zip(queries, answers):
+        result[host].extend(addresses)
+    for host in hosts:
+        _store_addresses(host, result[host])
+
+
+def _query_addresses(host: str, rdtype, timeout: int) -> List[str]:
+    try:
+        with timed('dns_address', host):
+            answer = resolvers.resolve(qname=host, rdtype=rdtype, lifetime=timeout)
+    except DNSException:
+        return []
+    return [record.address for record in answer.rrset or []]
+
+
+def resolve_host_addresses(hosts: Iterable[str], timeout: int = 10, answer: Optional[Answer] = None) -> Dict[str, List[str]]:
+    """Resolves the A and AAAA records of the hosts concurrently. The
+    addresses given by the server in the additional section of the MX
+    `answer` are used without any query. The results are stored in
+    `host_address_cache` where the SMTP verifiers look them up
+
+    >>> resolve_host_addresses({'mx1.example.com', 'mx2.example.com'})
+    ... {'mx1.example.com': ['192.0.2.1'], 'mx2.example.com': ['192.0.2.2']}
+    """
+    result: Dict[str, List[str]] = {}
+    missing = _get_missing_hosts(hosts, result)
+
+    if missing and answer is not None:
+        missing = _use_glue_addresses(missing, answer, result)
+
+    if missing:
+        queries = [(host, rdtype) for host in missing for rdtype in ADDRESS_RDTYPES]
+        with ThreadPoolExecutor(max_workers=min(MAX_ADDRESS_QUERIES, len(queries))) as executor:
+            answers = list(executor.map(lambda x: _query_addresses(x[0], x[1], timeout), queries))
+        _store_answers(missing, queries, answers, result)
+    return result
+
+
+def _implicit_mx(email_instance: 'EmailAddress', error: Exception, addresses: Dict[str, List[str]]) -> Set[str]:
+    """A domain without any MX record receives its emails on the host
+    of its A or AAAA record, as if it had an MX record pointing to
+    itself with a preference of 0 (RFC 5321, section 5.1)"""
+    domain = email_instance.ace_formatted_domain.lower()
+    if not addresses.get(domain):
+        _raise_resolver_error(email_instance, error)
+
+    result = {domain}
+    email_instance.add_mx_records(result, {domain: 0})
+    return result
+
+
+def _clean_answer(email_instance: 'EmailAddress', answer: Answer) -> Set[str]:
     result = set()
+    preferences = {}
 
     rrset_values = answer.rrset
 
     if rrset_values is not None:
-        for record in rrset_values.processing_order():
+        for record in cast(List[MX], rrset_values.processing_order()):
             dns_string = record.exchange.to_text().rstrip('.')
+            if not dns_string:
+                # Null MX, the domain does not accept
+                # any email (RFC 7505)
+                continue
             result.add(dns_string)
 
+            preference = preferences.get(dns_string, record.preference)
+            preferences[dns_string] = min(preference, record.preference)
+
+        if not result:
+            email_instance.add_error('dead_server')
+            raise Exception('Domain does not accept emails')
+
         # Check that each record follows RFC
         values = list(map(lambda x: HOST_REGEX.search(string=x), result))
         if not values:
             email_instance.add_error('domain_error')
             raise ValueError('No MX records found')
 
-        email_instance.add_mx_records(result)
+        email_instance.add_mx_records(result, preferences)
+    return result
+
+
+def clean_mx_records(email_instance: 'EmailAddress', timeout: int = 10, prefetch: bool = True) -> Set[str]:
+    """Function used to iterate over the Answer provided
+    by the `get_mx_records` function. If an email's domain
+    is valid, it should return a set of valid mx records
+
+    With `prefetch`, the addresses of the MX hosts are resolved in the
+    same step and a domain without MX records falls back to its A and
+    AAAA records"""
+    if not prefetch:
+        answer = get_mx_records(email_instance, timeout)
+        return _clean_answer(email_instance, answer)
+
+    try:
+        answer = _lookup_mx(email_instance, timeout)
+    except resolver.NoAnswer as error:
+        domain = email_instance.ace_formatted_domain.lower()
+        return _implicit_mx(email_instance, error, resolve_host_addresses([domain], timeout))
+    except RESOLVER_ERRORS as error:
+        _raise_resolver_error(email_instance, error)
+
+    result = _clean_answer(email_instance, answer)
+    resolve_host_addresses(result, timeout, answer)
     return result
 
 
 def verify_dns(email: 'EmailAddress', timeout: int = 10):
     """
     Checks whether there are any SMTP servers for the email
-    address by looking up the DNS MX records
+    address by looking up the DNS MX records. The addresses of
+    the servers are resolved at the same time and a domain
+    without MX records falls back to its A and AAAA records
 
     In case there no SMTP server can be determined, a variety of
     exceptions is raised depending on the exact issue, all derived 
@@ -88,3 +337,149 @@ def verify_dns(email: 'EmailAddress', timeout: int = 10):
     if email.get_literal_ip:
         return [email.get_literal_ip]
     return clean_mx_records(email, timeout)
+
+
+class AsyncMXResolver:
+    """Resolves MX records on the running event loop using
+    `dns.asyncresolver`. The number of queries in flight is bounded
+    by `max_concurrency` and concurrent queries for the same domain
+    are coalesced into a single lookup
+
+    >>> async_resolver = AsyncMXResolver(max_concurrency=500)
+    ... await async_resolver.resolve('gmail.com', 'gmail.com')
+    """
+
+    def __init__(self, max_concurrency: int = 1000):
+        self.max_concurrency = max_concurrency
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self._inflight)} in flight>'
+
+    def _bind_loop(self) -> asyncio.Semaphore:
+        # The semaphore and the pending queries belong to
+        # the loop that created them and cannot be shared
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._semaphore is None:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+        return self._semaphore
+
+    async def _query(self, semaphore: asyncio.Semaphore, domain: str, timeout: int, rdtype):
+        async with semaphore:
+            stage = 'dns' if rdtype == rdtype_mx else 'dns_address'
+            with timed(stage, None if rdtype == rdtype_mx else domain):
+                return await resolvers.async_resolve(
+                    qname=domain,
+                    rdtype=rdtype,
+                    lifetime=timeout
+                )
+
+    async def resolve(self, key: str, domain: str, timeout: int = 10, rdtype=rdtype_mx) -> Answer:
+        semaphore = self._bind_loop()
+
+        inflight_key = (key, rdtype)
+        future = self._inflight.get(inflight_key)
+        if future is None:
+            future = asyncio.ensure_future(self._query(semaphore, domain, timeout, rdtype))
+            self._inflight[inflight_key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+
+        # Shield the shared query so that cancelling one
+        # waiter does not cancel it for the others
+        return await asyncio.shield(future)
+
+
+async_mx_resolver = AsyncMXResolver()
+
+
+async def _async_lookup_mx(email_instance: 'EmailAddress', timeout: int = 10, use_cache: bool = True) -> Answer:
+    key = email_instance.ace_formatted_domain.lower()
+
+    if use_cache:
+        cached = mx_cache.get(key)
+        if isinstance(cached, Answer):
+            return cached
+        elif cached is not None:
+            raise cached()
+
+    try:
+        answer = await async_mx_resolver.resolve(key, email_instance.domain, timeout)
+    except RESOLVER_ERRORS as error:
+        if use_cache:
+            mx_cache.set_error(key, error)
+        raise
+    else:
+        if use_cache:
+            mx_cache.set_answer(key, answer)
+        return answer
+
+
+async def async_get_mx_records(email_instance: 'EmailAddress', timeout: int = 10, use_cache: bool = True) -> Answer:
+    """Asynchronous counterpart of `get_mx_records`
+
+    >>> email = EmailAddress('test@example.com')
+    ... await async_get_mx_records(email)
+    """
+    try:
+        return await _async_lookup_mx(email_instance, timeout, use_cache)
+    except RESOLVER_ERRORS as error:
+        _raise_resolver_error(email_instance, error)
+
+
+async def _async_query_addresses(host: str, rdtype, timeout: int) -> List[str]:
+    try:
+        answer = await async_mx_resolver.resolve(host.lower(), host, timeout, rdtype=rdtype)
+    except DNSException:
+        return []
+    return [record.address for record in answer.rrset or []]
+
+
+async def async_resolve_host_addresses(hosts: Iterable[str], timeout: int = 10, answer: Optional[Answer] = None) -> Dict[str, List[str]]:
+    """Asynchronous counterpart of `resolve_host_addresses`. Concurrent
+    queries for the same host are coalesced into a single lookup"""
+    result: Dict[str, List[str]] = {}
+    missing = _get_missing_hosts(hosts, result)
+
+    if missing and answer is not None:
+        missing = _use_glue_addresses(missing, answer, result)
+
+    if missing:
+        queries = [(host, rdtype) for host in missing for rdtype in ADDRESS_RDTYPES]
+        answers = await asyncio.gather(*(_async_query_addresses(host, rdtype, timeout) for host, rdtype in queries))
+        _store_answers(missing, queries, answers, result)
+    return result
+
+
+async def async_clean_mx_records(email_instance: 'EmailAddress', timeout: int = 10, prefetch: bool = True) -> Set[str]:
+    """Asynchronous counterpart of `clean_mx_records`"""
+    if not prefetch:
+        answer = await async_get_mx_records(email_instance, timeout)
+        return _clean_answer(email_instance, answer)
+
+    try:
+        answer = await _async_lookup_mx(email_instance, timeout)
+    except resolver.NoAnswer as error:
+        domain = email_instance.ace_formatted_domain.lower()
+        addresses = await async_resolve_host_addresses([domain], timeout)
+        return _implicit_mx(email_instance, error, addresses)
+    except RESOLVER_ERRORS as error:
+        _raise_resolver_error(email_instance, error)
+
+    result = _clean_answer(email_instance, answer)
+    await async_resolve_host_addresses(result, timeout, answer)
+    return result
+
+
+async def async_verify_dns(email: 'EmailAddress', timeout: int = 10):
+    """Asynchronous counterpart of `verify_dns`
+
+    >>> emails = [EmailAddress('a@gmail.com'), EmailAddress('b@gmail.com')]
+    ... await asyncio.gather(*[async_verify_dns(email) for email in emails])
+    """
+    if email.get_literal_ip:
+        return [email.get_literal_ip]
+    return await async_clean_mx_records(email, timeout)
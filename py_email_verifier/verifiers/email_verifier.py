@@ -1,8 +1,12 @@
 from ipaddress import IPv4Address, IPv6Address
 from typing import Literal
 
-from py_email_verifier.constants import HOST_REGEX, LITERAL_REGEX, USER_REGEX
+from py_email_verifier.constants import USER_REGEX
+from py_email_verifier.domains import normalize_domain
 from py_email_verifier.models import EmailAddress
+# The syntax checks used to live in this module
+# and can still be imported from here
+from py_email_verifier.syntax import check_syntax, validate_syntax_many
 
 
 def validate_ipv4_address(value: str):
@@ -42,15 +46,9 @@ def validate_email(email: 'EmailAddress') -> Literal[True]:
     if not USER_REGEX.match(email.user):
         raise ValueError(f'Invalid email address. Got: {email}')
 
-    if email.get_literal_ip is not None:
-        result = LITERAL_REGEX.match(email.ace_formatted_domain)
-        if result is None:
-            raise ValueError(f'Invalid email address. Got: {email}')
-
-        if not validate_ipv6_address(result[1]):
-            raise ValueError(f'Invalid email address. Got: {email}')
-    else:
-        if HOST_REGEX.match(email.ace_formatted_domain) is None:
-            raise ValueError(f'Invalid email address. Got: {email}')
+    # The verdict for the domain is shared by
+    # every address using the same domain
+    if not normalize_domain(email.domain).is_valid:
+        raise ValueError(f'Invalid email address. Got: {email}')
 
     return True
@@ -0,0 +1,294 @@
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from py_email_verifier import logger
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.verifiers.scheduler import TokenBucket
+
+STRATEGIES = ('round_robin', 'least_loaded')
+
+# Wording of the replies which show that the sender itself is
+# refused by a blocklist or for its reputation. Ordinary rejections
+# such as "Access denied" for an unknown recipient do not match
+BLOCK_REGEX = re.compile(
+    r'blocklist|blacklist|\bblocked\b|spamhaus|spamcop|barracuda|'
+    r'dnsbl|\brbl\b|reputation',
+    re.IGNORECASE
+)
+
+# Enhanced status codes of the security and policy class (RFC 3463)
+POLICY_STATUS_REGEX = re.compile(r'\b[45]\.7\.\d{1,3}\b')
+
+# Stages at which the server has not seen any recipient yet. A 421
+# or a policy status code there concerns the connecting sender
+GREETING_STAGES = ('banner', 'ehlo')
+
+
+def is_sender_block(stage: str, code: int, message: str = '') -> bool:
+    """Whether the reply refuses the sender rather than the recipient:
+    any rejection of the MAIL command, a 421 or a x.7.x policy status
+    on connect or HELO, or a reply mentioning a blocklist
+
+    >>> is_sender_block('rcpt', 550, '5.7.1 Client host blocked using zen.spamhaus.org')
+    ... True
+    >>> is_sender_block('rcpt', 550, '5.4.1 Recipient address rejected: Access denied')
+    ... False
+    """
+    if code < 400:
+        return False
+
+    if stage == 'mail':
+        return True
+
+    message = message or ''
+    if stage in GREETING_STAGES and (code == 421 or POLICY_STATUS_REGEX.search(message)):
+        return True
+    return BLOCK_REGEX.search(message) is not None
+
+
+def parse_identity(value: str) -> 'SenderIdentity':
+    """Builds an identity from a `SOURCE_IP[,HELO[,MAIL_FROM]]`
+    string where every part can be left empty
+
+    >>> parse_identity('192.0.2.10,mx1.example.com,probe@example.com')
+    """
+    parts = [part.strip() or None for part in value.split(',')]
+    if len(parts) > 3:
+        raise ValueError(f'Identity is not valid. Got: {value}')
+
+    parts.extend([None] * (3 - len(parts)))
+    return SenderIdentity(*parts)
+
+
+class SenderIdentity:
+    """
+    Source address, HELO name and MAIL FROM address presented by the
+    SMTP sessions. A part that is None falls back to the default of
+    the verifier: the address chosen by the system, the `helo_host`
+    and the `from_address`
+
+    >>> SenderIdentity('192.0.2.10', 'mx1.example.com', 'probe@example.com')
+    """
+
+    def __init__(self, source_address: Optional[str] = None, helo_host: Optional[str] = None, from_address: Optional[str] = None, name: Optional[str] = None):
+        self.source_address = source_address
+        self.helo_host = helo_host
+        self.from_address = EmailAddress(from_address) if from_address else None
+        self.name = name or ','.join(str(x or '') for x in (source_address, helo_host, from_address))
+        self.bucket: Optional[TokenBucket] = None
+        self.active = 0
+        self.sessions = 0
+        self.probes = 0
+        self.accepted = 0
+        self.rejections: Dict[str, int] = {}
+        self.blocks = 0
+        self.consecutive_blocks = 0
+        self.quarantined_until = 0.0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.name}>'
+
+    @property
+    def source(self) -> Optional[Tuple[str, int]]:
+        """The `source_address` argument of `SMTP.connect`"""
+        if self.source_address is None:
+            return None
+        return (self.source_address, 0)
+
+
+class IdentityPool:
+    """
+    Spreads the SMTP sessions over many sender identities. Each session
+    gets an identity, round-robin or to the one with the fewest active
+    sessions, among the identities which have budget left: at most
+    `rate` new sessions per second with bursts of `burst`. When every
+    identity is out of budget, the session waits for the first one to
+    refill for at most `max_wait` seconds
+
+    An identity which gets `block_threshold` sender rejections in a row,
+    see `is_sender_block`, is taken out of the rotation for
+    `quarantine_time` seconds
+
+    Each worker process of `ShardedExecutor` gets its own copy of the
+    pool. The executor splits the budgets between the workers with
+    `split` so that the rates hold overall, but the quarantines are
+    only known to the worker that observed the blocks
+
+    >>> identities = IdentityPool([
+    ...     SenderIdentity('192.0.2.10', 'mx1.example.com'),
+    ...     SenderIdentity('192.0.2.11', 'mx2.example.com')
+    ... ], rate=0.5, strategy='least_loaded')
+    ... smtp_check_many(emails, mx_records, identities=identities)
+    ... identities.stats()
+    """
+
+    def __init__(self, identities: Iterable[SenderIdentity], strategy: str = 'round_robin', rate: float = 1, burst: Optional[float] = None, max_wait: Optional[float] = 60, block_threshold: int = 3, quarantine_time: float = 3600, timer=time.monotonic, sleep=time.sleep):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"'strategy' should be one of {STRATEGIES}. Got: {strategy}")
+
+        self.identities: List[SenderIdentity] = list(identities)
+        if not self.identities:
+            raise ValueError('At least one identity is required')
+
+        self.strategy = strategy
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.max_wait = max_wait
+        self.block_threshold = block_threshold
+        self.quarantine_time = quarantine_time
+        self.timer = timer
+        self.sleep = sleep
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+        for identity in self.identities:
+            identity.bucket = TokenBucket(rate, self.burst, timer=timer)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self.identities)} identities>'
+
+    def __len__(self):
+        return len(self.identities)
+
+    def __getstate__(self):
+        # The lock cannot be sent to the worker processes
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def split(self, parts: int) -> 'IdentityPool':
+        """Returns a new pool with the same identities and `1/parts`
+        of the rate and burst of this one, for example for each of
+        the `parts` worker processes sharing the identities"""
+        identities = [
+            SenderIdentity(
+                identity.source_address,
+                identity.helo_host,
+                identity.from_address.email if identity.from_address is not None else None,
+                name=identity.name
+            )
+            for identity in self.identities
+        ]
+        return IdentityPool(
+            identities,
+            strategy=self.strategy,
+            rate=self.rate / parts,
+            # A bucket smaller than one token never allows a session
+            burst=max(self.burst / parts, 1),
+            max_wait=self.max_wait,
+            block_threshold=self.block_threshold,
+            quarantine_time=self.quarantine_time,
+            timer=self.timer,
+            sleep=self.sleep
+        )
+
+    def _get_bucket(self, identity: SenderIdentity) -> TokenBucket:
+        if identity.bucket is None:
+            identity.bucket = TokenBucket(self.rate, self.burst, timer=self.timer)
+        return identity.bucket
+
+    def is_quarantined(self, identity: SenderIdentity) -> bool:
+        return identity.quarantined_until > self.timer()
+
+    def _select(self) -> Tuple[Optional[SenderIdentity], Optional[float]]:
+        # Must be called with the lock acquired. Returns the identity
+        # or the shortest delay before one of them has budget again
+        now = self.timer()
+        candidates = [x for x in self.identities if x.quarantined_until <= now]
+        if not candidates:
+            return None, None
+
+        available = [x for x in candidates if self._get_bucket(x).delay() == 0]
+        if not available:
+            return None, min(self._get_bucket(x).delay() for x in candidates)
+
+        if self.strategy == 'least_loaded':
+            identity = min(available, key=lambda x: (x.active, x.sessions))
+        else:
+            start = self._cursor
+            self._cursor += 1
+            order = self.identities[start % len(self.identities):] + self.identities[:start % len(self.identities)]
+            identity = next(x for x in order if x in available)
+
+        self._get_bucket(identity).consume()
+        identity.active += 1
+        identity.sessions += 1
+        return identity, None
+
+    def acquire(self) -> Optional[SenderIdentity]:
+        """Returns the identity of a new session or None when all
+        of them are quarantined or out of budget for too long"""
+        deadline = None if self.max_wait is None else self.timer() + self.max_wait
+        while True:
+            with self._lock:
+                identity, delay = self._select()
+
+            if identity is not None:
+                return identity
+            if delay is None:
+                return None
+
+            if deadline is not None:
+                remaining = deadline - self.timer()
+                if remaining < delay:
+                    return None
+            self.sleep(delay)
+
+    def release(self, identity: SenderIdentity):
+        with self._lock:
+            identity.active = max(0, identity.active - 1)
+
+    def record(self, identity: SenderIdentity, stage: str, code: int, message: str = ''):
+        """Records a reply received by a session of the identity
+        and quarantines the identity once it keeps being refused"""
+        with self._lock:
+            if stage == 'rcpt':
+                identity.probes += 1
+
+            if code < 400:
+                if stage in ('mail', 'rcpt'):
+                    identity.consecutive_blocks = 0
+                    if stage == 'rcpt':
+                        identity.accepted += 1
+                return
+
+            identity.rejections[stage] = identity.rejections.get(stage, 0) + 1
+            if not is_sender_block(stage, code, message):
+                return
+
+            identity.blocks += 1
+            identity.consecutive_blocks += 1
+            if identity.consecutive_blocks >= self.block_threshold:
+                identity.quarantined_until = self.timer() + self.quarantine_time
+                identity.consecutive_blocks = 0
+                logger.warning('Sender identity %s quarantined after %s: %s %s', identity.name, stage, code, message)
+
+    def restore(self, identity: SenderIdentity):
+        """Puts a quarantined identity back in the rotation"""
+        with self._lock:
+            identity.quarantined_until = 0.0
+            identity.consecutive_blocks = 0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Sessions, probes and rejections of each identity"""
+        with self._lock:
+            now = self.timer()
+            return {
+                identity.name: {
+                    'active': identity.active,
+                    'sessions': identity.sessions,
+                    'probes': identity.probes,
+                    'accepted': identity.accepted,
+                    'rejections': dict(identity.rejections),
+                    'blocks': identity.blocks,
+                    'rejection_rate': identity.rejections.get('rcpt', 0) / max(identity.probes, 1),
+                    'quarantined': identity.quarantined_until > now
+                }
+                for identity in self.identities
+            }
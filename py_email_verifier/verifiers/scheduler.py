@@ -0,0 +1,233 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import (TYPE_CHECKING, Dict, Hashable, Iterable, Iterator, List,
+                    Optional, Tuple)
+
+from py_email_verifier.verifiers.smtp_verifier import smtp_check_many
+
+if TYPE_CHECKING:
+    from py_email_verifier.models import EmailAddress
+
+
+# Reply codes used by the servers for greylisting
+GREYLIST_CODES = (450, 451)
+
+
+class TokenBucket:
+    """Allows `rate` operations per second on average with
+    bursts of at most `capacity` operations"""
+
+    def __init__(self, rate: float, capacity: float, timer=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.timer = timer
+        self.tokens = capacity
+        self.updated_at = timer()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.tokens:.2f}/{self.capacity}>'
+
+    def _refill(self):
+        now = self.timer()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, tokens: float = 1) -> float:
+        """Returns the number of seconds to wait before
+        the tokens can be consumed"""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0
+        return (tokens - self.tokens) / self.rate
+
+    def consume(self, tokens: float = 1) -> float:
+        """Consumes the tokens when they are available and returns
+        0, otherwise returns the number of seconds to wait"""
+        delay = self.delay(tokens)
+        if delay == 0:
+            self.tokens -= tokens
+        return delay
+
+
+class RateLimiter:
+    """Keeps a `TokenBucket` for each key, for example
+    for each MX host or each recipient domain
+
+    >>> limiter = RateLimiter(rate=2, capacity=5)
+    ... limiter.consume('gmail-smtp-in.l.google.com')
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, timer=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.timer = timer
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity, timer=self.timer)
+            self._buckets[key] = bucket
+        return bucket
+
+    def delay(self, key: Hashable, tokens: float = 1) -> float:
+        with self._lock:
+            return self._get_bucket(key).delay(tokens)
+
+    def consume(self, key: Hashable, tokens: float = 1) -> float:
+        with self._lock:
+            return self._get_bucket(key).consume(tokens)
+
+
+class SMTPScheduler:
+    """
+    Schedules the SMTP probes of many addresses while respecting a rate
+    limit for each MX host and each recipient domain. The limits count
+    SMTP sessions since a session probes all the pending addresses of a
+    domain at once. Each attempt dials a single MX host, by preference,
+    and the addresses without a definitive answer move on to the next
+    host which takes a token from its own bucket
+
+    `validate_many`, `JobQueue`, the pipeline and the `verify` command
+    go through a scheduler when they are given its options with
+    `smtp_scheduling` or `scheduling`, otherwise a temporary failure is
+    returned as it is
+
+    Temporary failures are queued again with an exponential backoff that
+    starts at `backoff` seconds. Greylisted addresses (450/451) are not
+    retried before `greylist_delay` seconds, which is the usual window
+    servers wait for before accepting the second attempt. After
+    `max_retries` attempts, an address is returned with a None result
+
+    >>> scheduler = SMTPScheduler(host_rate=0.5, domain_rate=1)
+    ... scheduler.submit(emails, mx_records)
+    ... for email, result in scheduler.run():
+    ...     print(email, result)
+    """
+
+    def __init__(self, host_rate: float = 1, host_burst: Optional[float] = None, domain_rate: float = 1, domain_burst: Optional[float] = None, max_retries: int = 3, backoff: float = 60, max_backoff: float = 3600, greylist_delay: float = 300, jitter: float = 0.1, timer=time.monotonic, sleep=time.sleep, **smtp_kwargs):
+        self.host_limiter = RateLimiter(host_rate, host_burst, timer=timer)
+        self.domain_limiter = RateLimiter(domain_rate, domain_burst, timer=timer)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.greylist_delay = greylist_delay
+        self.jitter = jitter
+        self.timer = timer
+        self.sleep = sleep
+        self.smtp_kwargs = smtp_kwargs
+        self.attempts: Dict['EmailAddress', int] = {}
+        self._queue: List[Tuple[float, int, str, List['EmailAddress'], List[str], int]] = []
+        self._reply_codes: Dict['EmailAddress', int] = {}
+        self._counter = itertools.count()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self)} batches queued>'
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _push(self, due: float, emails: List['EmailAddress'], mx_records: List[str], position: int = 0):
+        domain = emails[0].ace_formatted_domain.lower()
+        heapq.heappush(self._queue, (due, next(self._counter), domain, emails, mx_records, position))
+
+    def submit(self, emails: Iterable['EmailAddress'], mx_records: Optional[Iterable[str]] = None):
+        """Queues the addresses for probing. The addresses are
+        grouped by domain and the MX records of each address are
+        used when `mx_records` is not provided"""
+        groups: Dict[str, List['EmailAddress']] = {}
+        for email in emails:
+            groups.setdefault(email.ace_formatted_domain.lower(), []).append(email)
+
+        now = self.timer()
+        for items in groups.values():
+            records = items[0].sort_mx_records(mx_records)
+            self._push(now, items, records)
+
+    def clear(self):
+        """Drops the queued probes and the retry counts"""
+        self._queue.clear()
+        self._reply_codes.clear()
+        self.attempts.clear()
+
+    def get_retry_delay(self, code: int, attempt: int) -> float:
+        """Returns the number of seconds to wait before the
+        next attempt after a temporary failure"""
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        if code in GREYLIST_CODES:
+            delay = max(delay, self.greylist_delay)
+
+        if self.jitter:
+            delay += delay * random.uniform(0, self.jitter)
+        return delay
+
+    def _reserve(self, host: str, domain: str) -> float:
+        delay = max(
+            self.host_limiter.delay(host),
+            self.domain_limiter.delay(domain)
+        )
+        if delay == 0:
+            self.host_limiter.consume(host)
+            self.domain_limiter.consume(domain)
+        return delay
+
+    def run(self) -> Iterator[Tuple['EmailAddress', Optional[bool]]]:
+        """Runs the queued probes and yields an `(email, result)`
+        tuple once an address has a final result"""
+        while self._queue:
+            due, _, domain, emails, mx_records, position = heapq.heappop(self._queue)
+
+            wait = due - self.timer()
+            if wait > 0:
+                self.sleep(wait)
+
+            # Each attempt dials a single host so that every
+            # host contacted takes a token from its own bucket
+            records = mx_records[position:position + 1]
+            host = records[0] if records else domain
+            delay = self._reserve(host, domain)
+            if delay > 0:
+                self._push(self.timer() + delay, emails, mx_records, position)
+                continue
+
+            reply_codes: Dict['EmailAddress', int] = {}
+            results = smtp_check_many(
+                emails,
+                records,
+                reply_codes=reply_codes,
+                **self.smtp_kwargs
+            )
+            self._reply_codes.update(reply_codes)
+
+            fallback: List['EmailAddress'] = []
+            retries: Dict[Tuple[int, int], List['EmailAddress']] = {}
+            for email in emails:
+                result = results.get(email)
+                if result is None and position + 1 < len(mx_records):
+                    # The next host is tried before the address
+                    # is considered as temporarily failing
+                    fallback.append(email)
+                    continue
+
+                code = self._reply_codes.pop(email, None)
+                attempt = self.attempts.get(email, 0) + 1
+
+                if result is None and code is not None and 400 <= code < 500 and attempt <= self.max_retries:
+                    self.attempts[email] = attempt
+                    retries.setdefault((code, attempt), []).append(email)
+                    continue
+
+                self.attempts.pop(email, None)
+                yield email, result
+
+            now = self.timer()
+            if fallback:
+                self._push(now, fallback, mx_records, position + 1)
+
+            for (code, attempt), items in retries.items():
+                delay = self.get_retry_delay(code, attempt)
+                self._push(now + delay, items, mx_records)
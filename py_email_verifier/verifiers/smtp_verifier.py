@@ -1,19 +1,46 @@
 import asyncio
 import asgiref
 import socket
+import secrets
 import smtplib
+import threading
+import time
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
 from smtplib import (SMTP, SMTPNotSupportedError, SMTPResponseException,
                      SMTPServerDisconnected)
 from socket import timeout
 from ssl import SSLError
-from typing import TYPE_CHECKING, Optional, Set
+from typing import (TYPE_CHECKING, Callable, Dict, Iterable, List, Optional,
+                    Set, Tuple, Union)
 
 import asgiref.sync
 
+from py_email_verifier import logger
+from py_email_verifier.cache import TTLCache
 from py_email_verifier.exceptions import AddressNotDeliverableError
+from py_email_verifier.instrumentation import register_cache, timed
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.verifiers.async_smtp_verifier import (AsyncSMTPVerifier,
+                                                             async_smtp_check)
+from py_email_verifier.verifiers.dns_verifier import get_host_addresses
+from py_email_verifier.verifiers.timeouts import (AdaptiveTimeouts,
+                                                  host_timeouts)
 
 if TYPE_CHECKING:
-    from py_email_verifier.models import EmailAddress
+    from py_email_verifier.verifiers.identities import IdentityPool
+
+
+# Verdicts of the catch-all detection for each domain
+catch_all_cache = TTLCache(maxsize=10000, ttl=86400)
+register_cache('catch_all', catch_all_cache)
+
+# Domains whose servers gave no definitive answer to the probe
+# are kept with a None verdict for a shorter time so that they
+# are not probed again on every call
+CATCH_ALL_UNKNOWN_TTL = 300
+
+_MISSING = object()
 
 
 class SMTPVerifier(SMTP):
@@ -21,10 +48,24 @@ class SMTPVerifier(SMTP):
     Performs an MTA validation, also known as Mail Transfer Agent validation 
     by verifying the integrity and deliverability of email addresses by 
     simulating email delivery and interacting with the recipient's mail server
+
+    Many recipients of the same domain can be probed over a single session
+    with `check_recipients`. In that case at most `max_recipients` RCPT
+    commands are issued for each MAIL transaction
+
+    The deadline of each stage is derived from the latency previously
+    observed on the host by `adaptive_timeouts` and never exceeds
+    `timeout`. Hosts that kept timing out are skipped during their
+    cool-off period
+
+    With `identities`, each session takes the source address, HELO name
+    and MAIL FROM address of an identity of the pool and reports the
+    replies it gets back to the pool
     """
 
-    def __init__(self, sender: 'EmailAddress', recip: Optional['EmailAddress'] = None, local_hostname: Optional[str] = None, timeout: int = 10, debug: bool = False):
+    def __init__(self, sender: 'EmailAddress', recip: Optional['EmailAddress'] = None, local_hostname: Optional[str] = None, timeout: float = 10, debug: bool = False, max_recipients: int = 50, port: int = 25, adaptive_timeouts: Optional[AdaptiveTimeouts] = None, source_address: Optional[Union[str, Tuple[str, int]]] = None, identities: Optional['IdentityPool'] = None):
         super().__init__(local_hostname=local_hostname, timeout=timeout)
+        self._default_hostname = self.local_hostname
 
         debug_level = 2 if debug else False
         self.set_debuglevel(debug_level)
@@ -32,9 +73,24 @@ class SMTPVerifier(SMTP):
         self._sender = sender
         self._recip = recip
         self._command = None
+        # The banner is the first reply of a session
+        self._stage = 'banner'
         self._host = None
+        self.adaptive_timeouts = adaptive_timeouts or host_timeouts
+        if isinstance(source_address, str):
+            source_address = (source_address, 0)
+        self.default_source_address = source_address
+        self.identities = identities
+        self.identity = None
         self.errors = {}
         self.sock = None
+        self.max_recipients = max_recipients
+        self.port = port
+        # Host of the `SMTPConnectionPool` holding the session
+        # and the time at which the pool last released it
+        self.pool_key: str = ''
+        self.last_used: float = 0.0
+        self._transaction = False
 
     def __str__(self):
         name = self.__class__.__name__
@@ -42,19 +98,47 @@ class SMTPVerifier(SMTP):
 
     def putcmd(self, cmd, args=''):
         self._command = f'{cmd} {args}' if args else cmd
+        self._stage = cmd.lower()
+        if self._stage == 'helo':
+            self._stage = 'ehlo'
         super().putcmd(cmd, args)
 
-    def starttls(self, *args, **kwargs):
+    def getreply(self):
+        # Wait for the reply within the deadline learned for
+        # the stage and record how long the server took
+        stage = self._stage
+        if self.sock is not None:
+            self.sock.settimeout(self.adaptive_timeouts.get_timeout(self._host, stage, self.timeout))
+
+        start = time.perf_counter()
         try:
-            super().starttls(*args, **kwargs)
-        except SMTPNotSupportedError:
-            # The server does not support the STARTTLS extension
-            pass
-        except RuntimeError:
-            # SSL/TLS support is not available to your Python interpreter
-            pass
-        except (SSLError, timeout) as error:
-            raise Exception(error)
+            reply = super().getreply()
+        except SMTPServerDisconnected as error:
+            if isinstance(error.__context__, TimeoutError):
+                self.adaptive_timeouts.record_timeout(self._host, stage)
+            raise
+        self.adaptive_timeouts.observe(self._host, stage, time.perf_counter() - start)
+        return reply
+
+    def _record_reply(self, stage: str, code: int, message: Union[str, bytes]):
+        if self.identities is not None and self.identity is not None:
+            if isinstance(message, bytes):
+                message = message.decode('utf-8', errors='replace')
+            self.identities.record(self.identity, stage, code, message)
+
+    def starttls(self, *args, **kwargs):
+        with timed('starttls', self._host) as timer:
+            try:
+                super().starttls(*args, **kwargs)
+            except SMTPNotSupportedError:
+                # The server does not support the STARTTLS extension
+                pass
+            except RuntimeError:
+                # SSL/TLS support is not available to your Python interpreter
+                pass
+            except (SSLError, timeout) as error:
+                timer.error = error.__class__.__name__
+                raise Exception(error)
 
     def mail(self, sender, options=[]):
         """Establishes the legitimacy of the sender's address and assists in the verification process. 
@@ -62,7 +146,15 @@ class SMTPVerifier(SMTP):
         verifying its existence or analyzing the sending domain's reputation, 
         to determine whether to accept or reject the email
         """
-        code, message = super().mail(sender=sender, options=options)
+        if self.identity is not None and self.identity.from_address is not None:
+            sender = self.identity.from_address.restructure
+
+        with timed('mail', self._host) as timer:
+            code, message = super().mail(sender=sender, options=options)
+            if code >= 400:
+                timer.error = str(code)
+        self._record_reply('mail', code, message)
+
         if code >= 400:
             self._sender.add_error('attempt_rejected')
             raise SMTPResponseException(code, message)
@@ -73,18 +165,29 @@ class SMTPVerifier(SMTP):
         the recipient's email address is valid and can 
         accept incoming emails
         """
-        code, message = super().rcpt(recip=recip, options=options)
+        with timed('rcpt', self._host) as timer:
+            code, message = super().rcpt(recip=recip, options=options)
+            if code >= 400:
+                timer.error = str(code)
+        self._record_reply('rcpt', code, message)
+
         if code >= 500:
             # Address clearly invalid
-            # print('rcpt', code, message)
             self._sender.add_error('unknown_email')
-            raise AddressNotDeliverableError(code, message)
+            raise AddressNotDeliverableError(self._recip or recip, message)
         elif code >= 400:
-            # print('rcpt', code, message)
             self._sender.add_error('attempt_rejected')
             raise SMTPResponseException(code, message)
         return code, message
 
+    def ehlo(self, name=''):
+        with timed('ehlo', self._host) as timer:
+            code, message = super().ehlo(name)
+            if code != 250:
+                timer.error = str(code)
+        self._record_reply('ehlo', code, message)
+        return code, message
+
     def quit(self):
         """
         Like `smtplib.SMTP.quit`, but make sure that everything is
@@ -98,24 +201,71 @@ class SMTPVerifier(SMTP):
             self.does_esmtp = False
             self.close()
 
+    def close(self):
+        super().close()
+        if self.identities is not None and self.identity is not None:
+            self.identities.release(self.identity)
+            self.identity = None
+
+    def _acquire_identity(self):
+        """Takes an identity from the pool for the next session"""
+        if self.identities is None or self.identity is not None:
+            return
+
+        self.identity = self.identities.acquire()
+        if self.identity is None:
+            raise SMTPServerDisconnected('No sender identity available')
+        self.local_hostname = self.identity.helo_host or self._default_hostname
+
+    def _get_socket(self, host, port, timeout):
+        # Use the addresses resolved along with the MX records. The
+        # host name is kept for the STARTTLS server name indication
+        self.adaptive_timeouts.check(host)
+        timeout = self.adaptive_timeouts.get_timeout(host, 'connect', timeout)
+
+        error: OSError = OSError(f'Could not resolve {host}')
+        for address in get_host_addresses(host):
+            start = time.perf_counter()
+            try:
+                sock = socket.create_connection((address, port), timeout, self.source_address)
+            except TimeoutError as e:
+                self.adaptive_timeouts.record_timeout(host, 'connect')
+                error = e
+            except OSError as e:
+                error = e
+            else:
+                self.adaptive_timeouts.observe(host, 'connect', time.perf_counter() - start)
+                return sock
+        raise error
+
     def connect(self, host='localhost', port=25, source_address=None):
         """Tries to establish a connection to the email host"""
         self._command = 'connect'
+        self._stage = 'banner'
         self._host = host
 
+        self._acquire_identity()
+        if self.identity is not None and self.identity.source is not None:
+            source_address = self.identity.source
+        source_address = source_address or self.default_source_address
+
         try:
-            code, message = super().connect(
-                host=host,
-                port=port,
-                source_address=source_address
-            )
+            with timed('connect', host) as timer:
+                code, message = super().connect(
+                    host=host,
+                    port=port,
+                    source_address=source_address
+                )
+                if code >= 400:
+                    timer.error = str(code)
         except OSError as error:
             self._sender.add_error('smtp_protocol')
             raise SMTPServerDisconnected(str(error))
         except Exception as e:
             self._sender.add_error('error')
-            print(e)
+            logger.warning('Could not connect to %s: %s', host, e)
         else:
+            self._record_reply('banner', code, message)
             if code >= 400:
                 raise SMTPResponseException(code, message)
             message = message.decode()
@@ -125,7 +275,7 @@ class SMTPVerifier(SMTP):
     def check(self, record: str):
         """Starts the MTA validation on a single record"""
         try:
-            self.connect(host=record, port=25)
+            self.connect(host=record, port=self.port)
             self.starttls()
             # Start the standard MTA email validation
             # ehlo/helo -> mail -> rcpt
@@ -139,93 +289,593 @@ class SMTPVerifier(SMTP):
             if e.smtp_code >= 500:
                 self._sender.add_error('dead_server')
                 raise Exception(
-                    f'Communication error: {self._host} / {message}')
+                    f'Communication error: {self._host} / {e.smtp_error}')
             else:
                 # self.errors[self._host] = message
-                self._sender.add_message(self._host, code, message)
+                self._sender.add_message(self._host, e.smtp_code, e.smtp_error)
             return False
         finally:
             self.quit()
         return code < 400
 
-    def check_multiple(self, records: Set[str]):
-        """Checks multiple MX records at once"""
-        result = [self.check(x) for x in records]
+    def check_multiple(self, records: Iterable[str]):
+        """Checks the MX records one after another in the order in
+        which they are given and stops at the first definitive answer.
+        The next record is only tried after a connection failure or a
+        temporary 4xx reply. An undeliverable address is definitive and
+        raises `AddressNotDeliverableError`"""
+        result = []
+        for record in records:
+            is_valid = self.check(record)
+            result.append(is_valid)
+            if is_valid:
+                break
+
         if self.errors:
             raise Exception(f'Host errors: {self.errors}')
         return result
 
+    def _evaluate_rcpt(self, recipient: 'EmailAddress', code: int, message: Union[str, bytes]):
+        """Maps the reply of a RCPT command to the recipient
+        that it was issued for"""
+        recipient.add_message(self._host, code, message)
+
+        if code >= 500:
+            recipient.add_error('unknown_email')
+            return False
+        elif code >= 400:
+            # Temporary failures are not definitive and
+            # the recipient can be tried on the next host
+            recipient.add_error('attempt_rejected')
+            return None
+        return True
+
+    def open(self, record: str):
+        """Connects to the record and greets the server so that
+        the session is ready to run MAIL transactions"""
+        self.connect(host=record, port=self.port)
+        self.starttls()
+        self.ehlo_or_helo_if_needed()
+        self._transaction = False
+        return self
+
+    def probe(self, recipients: List['EmailAddress'], results: Dict['EmailAddress', Optional[bool]], reply_codes: Optional[Dict['EmailAddress', int]] = None):
+        """Runs the MAIL and RCPT commands for the recipients on a
+        session that was already opened. A single MAIL command is
+        used for each batch of `max_recipients` recipients and the
+        transaction is reset with RSET between batches. The results,
+        and the reply codes when `reply_codes` is given, are updated
+        in place so that they survive a disconnection"""
+        for i in range(0, len(recipients), self.max_recipients):
+            if self._transaction:
+                self.rset()
+                self._transaction = False
+
+            self.mail(sender=self._sender.restructure)
+            self._transaction = True
+
+            for recipient in recipients[i:i + self.max_recipients]:
+                # Use the base implementation in order to map
+                # the reply code to the recipient instead of
+                # raising on the first rejected address
+                with timed('rcpt', self._host) as timer:
+                    code, message = SMTP.rcpt(self, recipient.restructure)
+                    if code >= 400:
+                        timer.error = str(code)
+                self._record_reply('rcpt', code, message)
+
+                results[recipient] = self._evaluate_rcpt(recipient, code, message)
+                if reply_codes is not None:
+                    reply_codes[recipient] = code
+        return results
+
+    def _evaluate_session_error(self, results: Dict['EmailAddress', Optional[bool]], error: Exception, reply_codes: Optional[Dict['EmailAddress', int]] = None):
+        """Records a session level error on every recipient
+        that did not get an answer from the server"""
+        for recipient, result in results.items():
+            if result is not None:
+                continue
+
+            if isinstance(error, SMTPResponseException):
+                if error.smtp_code >= 500:
+                    recipient.add_error('dead_server')
+                recipient.add_message(self._host, error.smtp_code, str(error.smtp_error))
+                if reply_codes is not None:
+                    reply_codes[recipient] = error.smtp_code
+            else:
+                recipient.add_error('Timeout or dead server or port 25 blocked')
 
-def smtp_check(email: 'EmailAddress', timeout: int = 10, helo_host: Optional[str] = None, from_address: Optional['EmailAddress'] = None, debug: bool = False):
+    def check_recipients(self, record: str, recipients: Iterable['EmailAddress'], reply_codes: Optional[Dict['EmailAddress', int]] = None) -> Dict['EmailAddress', Optional[bool]]:
+        """Probes many recipients of the same domain over a single
+        session on the record. Recipients without a definitive answer,
+        for example because the server disconnected or replied with a
+        temporary failure, are returned with a None result
+
+        >>> instance = SMTPVerifier(sender, max_recipients=20)
+        ... instance.check_recipients('mta-gw.infomaniak.ch', [email1, email2])
+        """
+        recipients = list(recipients)
+        results: Dict['EmailAddress', Optional[bool]] = dict.fromkeys(recipients)
+
+        try:
+            self.open(record)
+            self.probe(recipients, results, reply_codes)
+        except (SMTPServerDisconnected, SMTPResponseException) as error:
+            self._evaluate_session_error(results, error, reply_codes)
+        finally:
+            self.quit()
+        return results
+
+
+class SMTPConnectionPool:
     """
-    Perform an MTA validation, also known as Mail Transfer Agent validation 
-    by verifying the integrity and deliverability of an email address"""
-    sender = from_address or email
-    # instance = SMTPVerifier(helo_host, timeout, debug, sender, email)
-    instance = SMTPVerifier(
-        sender,
-        local_hostname=helo_host,
-        timeout=timeout,
-        debug=debug
-    )
-    return instance.check_multiple(email.mx_records)
+    Keeps the greeted SMTP sessions of each MX host open so that they
+    can be reused across addresses and calls instead of opening a new
+    socket for every probe. The number of sessions is capped for each
+    host with `max_per_host` and globally with `max_total`
 
+    Sessions that stayed idle for more than `idle_timeout` seconds are
+    closed and idle sessions are health checked with NOOP, or RSET when
+    a transaction is still open, before being handed out again
 
-async def _simple_verify_smtp(mx_record: str, email: 'EmailAddress', timeout=20):
-    try:
-        smtp = SMTP(mx_record, timeout=timeout)
-        status, _ = smtp.ehlo()
+    The sessions keep the sender identity they were opened with
+    until they are closed
+
+    >>> with SMTPConnectionPool(max_per_host=2) as pool:
+    ...     smtp_check_many(emails, mx_records, pool=pool)
+    """
 
-        if status >= 400:
-            smtp.quit()
+    def __init__(self, max_per_host: int = 2, max_total: int = 100, idle_timeout: float = 60, acquire_timeout: Optional[float] = None, local_hostname: Optional[str] = None, timeout: int = 10, debug: bool = False, max_recipients: int = 50, port: int = 25, source_address: Optional[str] = None, identities: Optional['IdentityPool'] = None):
+        self.max_per_host = max_per_host
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.local_hostname = local_hostname
+        self.timeout = timeout
+        self.debug = debug
+        self.max_recipients = max_recipients
+        self.port = port
+        self.source_address = source_address
+        self.identities = identities
+        self._idle: Dict[str, List[SMTPVerifier]] = {}
+        self._counts: Dict[str, int] = {}
+        self._total = 0
+        self._condition = threading.Condition()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self._total}/{self.max_total} sessions>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _forget(self, host: str):
+        # Must be called with the condition acquired
+        self._total -= 1
+        self._counts[host] -= 1
+        if not self._counts[host]:
+            del self._counts[host]
+        self._condition.notify_all()
+
+    def _pop_expired(self) -> List[SMTPVerifier]:
+        # Must be called with the condition acquired
+        expired = []
+        limit = time.monotonic() - self.idle_timeout
+        for host, sessions in list(self._idle.items()):
+            for session in [x for x in sessions if x.last_used < limit]:
+                sessions.remove(session)
+                self._forget(host)
+                expired.append(session)
+            if not sessions:
+                del self._idle[host]
+        return expired
+
+    def _pop_oldest_idle(self) -> Optional[SMTPVerifier]:
+        # Must be called with the condition acquired
+        sessions = [x for items in self._idle.values() for x in items]
+        if not sessions:
+            return None
+
+        session = min(sessions, key=lambda x: x.last_used)
+        self._idle[session.pool_key].remove(session)
+        if not self._idle[session.pool_key]:
+            del self._idle[session.pool_key]
+        self._forget(session.pool_key)
+        return session
+
+    def _is_healthy(self, session: SMTPVerifier) -> bool:
+        try:
+            if session._transaction:
+                code, _ = session.rset()
+                session._transaction = False
+            else:
+                code, _ = session.noop()
+        except Exception:
             return False
+        return code == 250
+
+    def _close_sessions(self, sessions: List[SMTPVerifier]):
+        for session in sessions:
+            session.quit()
+
+    def acquire(self, host: str, sender: 'EmailAddress') -> SMTPVerifier:
+        """Returns an open session for the host, either by reusing
+        an idle one or by opening a new one when the limits allow
+        it. Blocks until a session is released otherwise"""
+        deadline = None
+        if self.acquire_timeout is not None:
+            deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            session = None
+            to_close = []
+
+            with self._condition:
+                to_close.extend(self._pop_expired())
+
+                idle = self._idle.get(host)
+                if idle:
+                    session = idle.pop()
+                    if not idle:
+                        del self._idle[host]
+                elif self._counts.get(host, 0) < self.max_per_host:
+                    if self._total >= self.max_total:
+                        oldest = self._pop_oldest_idle()
+                        if oldest is not None:
+                            to_close.append(oldest)
+
+                    if self._total < self.max_total:
+                        # Reserve the slot and open the
+                        # session outside of the lock
+                        self._total += 1
+                        self._counts[host] = self._counts.get(host, 0) + 1
+                        break
+
+                if session is None and not to_close:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise SMTPServerDisconnected(f'No session available for {host}')
+                    self._condition.wait(remaining)
+
+            self._close_sessions(to_close)
+
+            if session is not None:
+                if self._is_healthy(session):
+                    session._sender = sender
+                    return session
+
+                session.close()
+                with self._condition:
+                    self._forget(host)
+
+        self._close_sessions(to_close)
+
+        session = SMTPVerifier(
+            sender,
+            local_hostname=self.local_hostname,
+            timeout=self.timeout,
+            debug=self.debug,
+            max_recipients=self.max_recipients,
+            port=self.port,
+            source_address=self.source_address,
+            identities=self.identities
+        )
+        session.pool_key = host
+
+        try:
+            session.open(host)
+        except BaseException:
+            session.quit()
+            with self._condition:
+                self._forget(host)
+            raise
+        return session
+
+    def release(self, session: SMTPVerifier, reusable: bool = True):
+        """Gives the session back to the pool. Sessions that are
+        not reusable, for example after a protocol error, are closed"""
+        if reusable and session.sock is not None:
+            session.last_used = time.monotonic()
+            with self._condition:
+                self._idle.setdefault(session.pool_key, []).append(session)
+                self._condition.notify_all()
+        else:
+            session.quit()
+            with self._condition:
+                self._forget(session.pool_key)
+
+    def check_recipients(self, record: str, recipients: Iterable['EmailAddress'], sender: 'EmailAddress', reply_codes: Optional[Dict['EmailAddress', int]] = None) -> Dict['EmailAddress', Optional[bool]]:
+        """Same as `SMTPVerifier.check_recipients` but runs the
+        transactions on a pooled session of the record"""
+        recipients = list(recipients)
+        results: Dict['EmailAddress', Optional[bool]] = dict.fromkeys(recipients)
+
+        try:
+            session = self.acquire(record, sender)
+        except (SMTPServerDisconnected, SMTPResponseException) as error:
+            for recipient in recipients:
+                if isinstance(error, SMTPResponseException):
+                    if error.smtp_code >= 500:
+                        recipient.add_error('dead_server')
+                    if reply_codes is not None:
+                        reply_codes[recipient] = error.smtp_code
+                else:
+                    recipient.add_error('Timeout or dead server or port 25 blocked')
+            return results
+
+        reusable = False
+        try:
+            session.probe(recipients, results, reply_codes)
+            reusable = True
+        except (SMTPServerDisconnected, SMTPResponseException) as error:
+            session._evaluate_session_error(results, error, reply_codes)
+        finally:
+            self.release(session, reusable=reusable)
+        return results
+
+    def close(self):
+        """Closes all the idle sessions of the pool"""
+        with self._condition:
+            sessions = [x for items in self._idle.values() for x in items]
+            for session in sessions:
+                self._forget(session.pool_key)
+            self._idle.clear()
+        self._close_sessions(sessions)
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            idle = sum(len(x) for x in self._idle.values())
+            return {
+                'total': self._total,
+                'idle': idle,
+                'busy': self._total - idle,
+                'hosts': len(self._counts)
+            }
+
+
+def _merge_evaluation(email: 'EmailAddress', source: 'EmailAddress'):
+    """Copies the errors and the messages recorded on `source`
+    to `email`"""
+    for error in source.evaluation:
+        email.add_error(error)
+    for host, code, message in source.messages:
+        email.add_message(host, code, message)
+
+
+def _hedged_check(records: List[str], sender: 'EmailAddress', create_verifier: Callable[['EmailAddress'], SMTPVerifier], hedge_delay: float) -> List[bool]:
+    """Probes the records in priority order but starts the next
+    record when the current ones did not answer within `hedge_delay`
+    seconds. The first definitive answer wins
+
+    Each probe records its errors on its own copy of the sender and
+    only the copies of the probes that answered before the result was
+    decided are merged into `sender`, so that the slower probes which
+    are still running cannot change its evaluation afterwards"""
+    results = []
+    remaining = iter(records)
+    pending = set()
+    sinks: Dict[Future, 'EmailAddress'] = {}
+    executor = ThreadPoolExecutor(thread_name_prefix='smtp_hedge')
+
+    def start_next():
+        record = next(remaining, None)
+        if record is not None:
+            sink = EmailAddress(sender.email)
+            future = executor.submit(create_verifier(sink).check, record)
+            sinks[future] = sink
+            pending.add(future)
+
+    try:
+        start_next()
+        while pending:
+            done, pending = wait(pending, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+            for future in done:
+                _merge_evaluation(sender, sinks.pop(future))
+                # Undeliverable addresses are raised
+                # like in SMTPVerifier.check_multiple
+                is_valid = future.result()
+                results.append(is_valid)
+                if is_valid:
+                    return results
+            start_next()
+    finally:
+        # Do not wait for the slower records
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def create_catch_all_probe(email: 'EmailAddress') -> 'EmailAddress':
+    """Returns an address of the same domain with a random
+    local part that is very unlikely to exist"""
+    return EmailAddress(f'{secrets.token_hex(12)}@{email.ace_formatted_domain}')
+
+
+def _set_catch_all(domain: str, verdict: Optional[bool]):
+    ttl = CATCH_ALL_UNKNOWN_TTL if verdict is None else None
+    catch_all_cache.set(domain, verdict, ttl=ttl)
+
+
+def detect_catch_all(email: 'EmailAddress', mx_records: Optional[Iterable[str]] = None, **kwargs) -> Optional[bool]:
+    """Checks whether the domain of the email accepts any recipient
+    by probing a random address that does not exist. The verdict is
+    cached for each domain in `catch_all_cache` and None is returned,
+    and cached for `CATCH_ALL_UNKNOWN_TTL` seconds, when the servers
+    did not give a definitive answer
+
+    >>> detect_catch_all(EmailAddress('test@gmail.com'))
+    ... False
+    """
+    domain = email.ace_formatted_domain.lower()
+    verdict = catch_all_cache.get(domain, _MISSING)
 
-        smtp.mail('')
-        status, _ = smtp.rcpt(str(email))
+    if verdict is _MISSING:
+        probe = create_catch_all_probe(email)
+        kwargs.setdefault('from_address', email)
+        results = smtp_check_many([probe], email.sort_mx_records(mx_records), check_catch_all=False, **kwargs)
+        verdict = results[probe]
+        _set_catch_all(domain, verdict)
+    return verdict
 
-        if status >= 400:
-            print(f'{mx_record} answer: {status} - {_}')
-            result = False
 
-        if status >= 200 and status <= 250:
-            result = True
+def smtp_check(email: 'EmailAddress', mx_records: Optional[Iterable[str]] = None, timeout: int = 10, helo_host: Optional[str] = None, from_address: Optional['EmailAddress'] = None, debug: bool = False, pool: Optional[SMTPConnectionPool] = None, hedge_delay: Optional[float] = None, check_catch_all: bool = True, port: int = 25, source_address: Optional[str] = None, identities: Optional['IdentityPool'] = None):
+    """
+    Perform an MTA validation, also known as Mail Transfer Agent validation 
+    by verifying the integrity and deliverability of an email address. The
+    MX records of the email are used when `mx_records` is not provided and
+    the sessions of the `pool` are reused when one is given
+
+    The records are probed by MX preference and the probing stops at the
+    first definitive answer. With `hedge_delay`, the next record is probed
+    in parallel when the current one did not answer after that delay. An
+    undeliverable address raises `AddressNotDeliverableError`, with or
+    without a `pool`
+
+    Addresses of catch-all domains are not probed and are marked with the
+    'catch_all' evaluation when `check_catch_all` is True
+
+    The sessions leave from `source_address` or, with `identities`, from
+    the identities of the pool which also pick the HELO name and the
+    MAIL FROM address"""
+    sender = from_address or email
+    records = email.sort_mx_records(mx_records)
+
+    if check_catch_all:
+        is_catch_all = detect_catch_all(
+            email,
+            records,
+            timeout=timeout,
+            helo_host=helo_host,
+            from_address=sender,
+            debug=debug,
+            pool=pool,
+            port=port,
+            source_address=source_address,
+            identities=identities
+        )
+        if is_catch_all:
+            email.add_error('catch_all')
+            return [True]
+
+    if pool is not None:
+        results = []
+        for record in records:
+            result = pool.check_recipients(record, [email], sender)[email]
+            if result is False:
+                # Same outcome as SMTPVerifier.check_multiple
+                raise AddressNotDeliverableError(email, 'unknown_email')
+            results.append(result is True)
+            if result is not None:
+                break
+        return results
+
+    def create_verifier(sink: 'EmailAddress' = sender):
+        return SMTPVerifier(
+            sink,
+            recip=email,
+            local_hostname=helo_host,
+            timeout=timeout,
+            debug=debug,
+            port=port,
+            source_address=source_address,
+            identities=identities
+        )
+
+    if hedge_delay is not None:
+        return _hedged_check(records, sender, create_verifier, hedge_delay)
+    # instance = SMTPVerifier(helo_host, timeout, debug, sender, email)
+    return create_verifier().check_multiple(records)
 
-        print(f'{mx_record} answer: {status} - {_}')
 
-        smtp.quit()
-    except smtplib.SMTPServerDisconnected:
-        print(
-            f'Server does not permit verify user, {mx_record} disconnected')
-    except smtplib.SMTPConnectError:
-        print(f'Unable to connect to {mx_record}.\n')
-    except socket.timeout as e:
-        print(f'Timeout connecting to server {mx_record}: {e}')
-        return None
-    except socket.error as e:
-        print(f'ServerError or socket.error exception raised {e}')
-        return None
+def smtp_check_many(emails: Iterable['EmailAddress'], mx_records: Iterable[str], timeout: int = 10, helo_host: Optional[str] = None, from_address: Optional['EmailAddress'] = None, debug: bool = False, max_recipients: int = 50, port: int = 25, pool: Optional[SMTPConnectionPool] = None, check_catch_all: bool = True, reply_codes: Optional[Dict['EmailAddress', int]] = None, source_address: Optional[str] = None, identities: Optional['IdentityPool'] = None) -> Dict['EmailAddress', Optional[bool]]:
+    """
+    Perform an MTA validation for many email addresses sharing the same
+    domain. The addresses are probed over a single session per MX record,
+    by MX preference, and the recipients that did not get a definitive
+    answer from a record are tried on the next one. When a `pool` is given,
+    its sessions are used instead of opening a new one for each call
+
+    When `check_catch_all` is True and the verdict for the domain is not
+    cached yet, a random address is probed in the same session. Addresses
+    of catch-all domains are marked with the 'catch_all' evaluation
+
+    The last reply code received for each address is stored in
+    `reply_codes` when it is given. `source_address` and `identities`
+    are used like in `smtp_check`
+
+    >>> emails = [EmailAddress('a@gmail.com'), EmailAddress('b@gmail.com')]
+    ... smtp_check_many(emails, verify_dns(emails[0]))
+    """
+    emails = list(emails)
+    results: Dict['EmailAddress', Optional[bool]] = dict.fromkeys(emails)
+
+    if not emails:
+        return results
+
+    first = emails[0]
+    sender = from_address or first
+    mx_records = first.sort_mx_records(mx_records)
+
+    probe = None
+    domain = first.ace_formatted_domain.lower()
+    if check_catch_all:
+        verdict = catch_all_cache.get(domain, _MISSING)
+        if verdict is True:
+            for email in emails:
+                email.add_error('catch_all')
+                results[email] = True
+            return results
+        elif verdict is _MISSING:
+            probe = create_catch_all_probe(first)
+
+    pending = emails if probe is None else [probe, *emails]
+    for record in mx_records:
+        if not pending:
+            break
+
+        if pool is not None:
+            answers = pool.check_recipients(record, pending, sender, reply_codes)
+        else:
+            instance = SMTPVerifier(
+                sender,
+                local_hostname=helo_host,
+                timeout=timeout,
+                debug=debug,
+                max_recipients=max_recipients,
+                port=port,
+                source_address=source_address,
+                identities=identities
+            )
+            answers = instance.check_recipients(record, pending, reply_codes)
+        results.update(
+            (email, result) for email, result in answers.items()
+            if result is not None
+        )
+        pending = [email for email in pending if answers.get(email) is None]
 
-    return result
+    if probe is not None:
+        if reply_codes is not None:
+            reply_codes.pop(probe, None)
 
+        is_catch_all = results.pop(probe, None)
+        _set_catch_all(domain, is_catch_all)
 
-async def _simple_verify_smtp_records(records: Set[str], email: 'EmailAddress', timeout: int = 5):
-    aws = []
-    for record in records:
-        aw = _simple_verify_smtp(record, email, timeout)
-        aws.append(asyncio.wait_for(aw, 10))
+        if is_catch_all:
+            for email in emails:
+                email.add_error('catch_all')
+    return results
 
-    for aw in aws:
-        try:
-            aw = await aw
-        except TimeoutError:
-            print(f'{aw} Timed out')
 
+async def _simple_verify_smtp(mx_record: str, email: 'EmailAddress', timeout=20):
+    instance = AsyncSMTPVerifier(email, recip=email, timeout=timeout)
+    return await instance.check(mx_record)
 
-    # aws = list(map(lambda x: asyncio.wait_for(
-    #     _simple_verify_smtp(x, email, timeout), 30), records))
 
-    # async for aw in asyncio.as_completed(aws):
-    #     print(await aw)
+async def _simple_verify_smtp_records(records: Set[str], email: 'EmailAddress', timeout: int = 5):
+    return await async_smtp_check(email, mx_records=records, timeout=timeout)
 
 
 def simple_verify_smtp(records: Set[str], email: 'EmailAddress', timeout: int = 20):
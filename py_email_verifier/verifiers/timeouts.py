@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from py_email_verifier.exceptions import CircuitOpenError
+
+
+class LatencyWindow:
+    """Keeps the last `size` durations of a stage
+    and gives their percentiles"""
+
+    __slots__ = ('values',)
+
+    def __init__(self, size: int = 100):
+        self.values: Deque[float] = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value: float):
+        self.values.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.values:
+            return 0.0
+        values = sorted(self.values)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class HostState:
+    """Latencies of each stage of a MX host
+    and the state of its circuit breaker"""
+
+    __slots__ = ('windows', 'timeouts', 'open_until')
+
+    def __init__(self):
+        self.windows: Dict[str, LatencyWindow] = {}
+        # Consecutive timeouts, whatever the stage
+        self.timeouts = 0
+        self.open_until = 0.0
+
+
+class AdaptiveTimeouts:
+    """
+    Learns the latency of each stage (connect, banner, STARTTLS, EHLO,
+    MAIL and RCPT) of each MX host and derives the deadline of the next
+    probe from it: `multiplier` times the `quantile` of the last `window`
+    durations, bounded by `min_timeout` and by the timeout the caller
+    asked for. The caller's timeout is used until `min_samples` durations
+    were observed
+
+    A host timing out `failure_threshold` times in a row is considered
+    down and its connections fail immediately with `CircuitOpenError`
+    for `cool_off` seconds. The next timeout after the cool-off opens
+    the circuit again while a reply of the server closes it
+
+    >>> timeouts = AdaptiveTimeouts(quantile=0.95, multiplier=4)
+    ... SMTPVerifier(sender, recip=email, adaptive_timeouts=timeouts)
+    """
+
+    def __init__(self, quantile: float = 0.99, multiplier: float = 3, min_timeout: float = 1, window: int = 100, min_samples: int = 5, failure_threshold: int = 3, cool_off: float = 300, maxsize: int = 10000, timer=time.monotonic):
+        self.quantile = quantile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.window = window
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.cool_off = cool_off
+        self.maxsize = maxsize
+        self.timer = timer
+        self.enabled = True
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self._hosts)} hosts>'
+
+    def _get_state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            if len(self._hosts) >= self.maxsize:
+                # Forget the host that was seen first
+                del self._hosts[next(iter(self._hosts))]
+            state = self._hosts[host] = HostState()
+        return state
+
+    def get_timeout(self, host: Optional[str], stage: str, default: float) -> float:
+        """Returns the deadline of the stage for the host"""
+        if not self.enabled or host is None:
+            return default
+
+        with self._lock:
+            state = self._hosts.get(host)
+            window = None if state is None else state.windows.get(stage)
+            if window is None or len(window) < self.min_samples:
+                return default
+            timeout = window.quantile(self.quantile) * self.multiplier
+
+        return min(default, max(self.min_timeout, timeout))
+
+    def observe(self, host: Optional[str], stage: str, duration: float):
+        """Records the duration of a stage that succeeded"""
+        if not self.enabled or host is None:
+            return
+
+        with self._lock:
+            state = self._get_state(host)
+            window = state.windows.get(stage)
+            if window is None:
+                window = state.windows[stage] = LatencyWindow(self.window)
+            window.add(duration)
+
+            # Tarpitting hosts accept the connections, only
+            # a reply proves that the server is responsive
+            if stage != 'connect':
+                state.timeouts = 0
+                state.open_until = 0.0
+
+    def record_timeout(self, host: Optional[str], stage: str):
+        if not self.enabled or host is None:
+            return
+
+        with self._lock:
+            state = self._get_state(host)
+            state.timeouts += 1
+            if state.timeouts >= self.failure_threshold:
+                state.open_until = self.timer() + self.cool_off
+
+    def is_open(self, host: str) -> bool:
+        """Indicates whether the connections to
+        the host currently fail immediately"""
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            state = self._hosts.get(host)
+            return state is not None and state.open_until > self.timer()
+
+    def check(self, host: str):
+        """Raises `CircuitOpenError` when the host is
+        in its cool-off period"""
+        if self.is_open(host):
+            raise CircuitOpenError(host)
+
+    def reset(self, host: Optional[str] = None):
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Percentiles of each stage and state of the
+        circuit breaker for each host"""
+        now = self.timer()
+        result = {}
+        with self._lock:
+            for host, state in self._hosts.items():
+                stages: Dict[str, Tuple[int, float, float]] = {
+                    stage: (len(window), window.quantile(0.5), window.quantile(self.quantile))
+                    for stage, window in state.windows.items()
+                }
+                result[host] = {
+                    'stages': stages,
+                    'timeouts': state.timeouts,
+                    'open': state.open_until > now
+                }
+        return result
+
+
+# Timeouts learned from every probe of the process
+host_timeouts = AdaptiveTimeouts()
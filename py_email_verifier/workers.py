@@ -0,0 +1,322 @@
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+import zlib
+from typing import (IO, Any, Callable, Dict, Iterable, Iterator, List,
+                    Optional, Tuple)
+
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.pipeline import (Checkpoint, PipelineItem,
+                                        accept_stage, blacklist_stage,
+                                        dns_stage, read_addresses,
+                                        smtp_stage, store_stage,
+                                        syntax_stage)
+from py_email_verifier.store import VerificationStore
+from py_email_verifier.verifiers.dns_verifier import mx_cache
+from py_email_verifier.verifiers.smtp_verifier import catch_all_cache
+
+# Sentinel sent to the workers once all the input was dispatched
+_STOP = None
+
+
+def get_shard(value: str, workers: int) -> int:
+    """Returns the worker responsible for the domain of the address.
+    All the addresses of a domain go to the same worker so that its
+    DNS cache and its SMTP sessions stay warm for that domain
+
+    >>> get_shard('foo@gmail.com', 4)
+    ... 2
+    """
+    domain = value.rpartition('@')[2].strip().lower()
+    return zlib.crc32(domain.encode('utf-8', errors='replace')) % workers
+
+
+def process_batch(batch: List[Tuple[int, str]], check_blacklist: Optional[Callable[[EmailAddress], bool]] = None, store: Optional[VerificationStore] = None, check_dns: bool = True, dns_timeout: int = 10, check_smtp: bool = True, **smtp_kwargs) -> List[Dict[str, Any]]:
+    """Runs a batch of `(offset, address)` through the stages of the
+    pipeline and returns the JSON response of each address"""
+    items: Iterable[PipelineItem] = (PipelineItem(offset, value) for offset, value in batch)
+    items = syntax_stage(items)
+    items = blacklist_stage(items, check_blacklist)
+
+    if not (check_dns and check_smtp):
+        store = None
+
+    if store is not None:
+        items = store_stage(items, store)
+
+    if check_dns:
+        items = dns_stage(items, timeout=dns_timeout)
+
+    if check_dns and check_smtp:
+        items = smtp_stage(items, batch_size=len(batch), store=store, **smtp_kwargs)
+    else:
+        items = accept_stage(items)
+    return [item.json_response() for item in items]
+
+
+def _worker_main(index: int, tasks: multiprocessing.Queue, results: multiprocessing.Queue, options: Dict[str, Any]):
+    # The parent process handles the interruptions
+    # and asks the workers to stop once it is done
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    stats = {'worker': index, 'pid': os.getpid(), 'batches': 0, 'addresses': 0, 'busy_time': 0.0}
+    domains = set()
+
+    # SQLite connections cannot be shared between
+    # processes so each worker opens its own
+    store_path = options.pop('store_path', None)
+    if store_path is not None:
+        options['store'] = VerificationStore(store_path)
+
+    while True:
+        batch = tasks.get()
+        if batch is _STOP:
+            break
+
+        start = time.perf_counter()
+        try:
+            responses = process_batch(batch, **options)
+        except Exception:
+            results.put(('error', index, traceback.format_exc()))
+            responses = [
+                {'risky': False, 'email': value, 'evaluation': [], 'offset': offset, 'result': None}
+                for offset, value in batch
+            ]
+
+        stats['busy_time'] += time.perf_counter() - start
+        stats['batches'] += 1
+        stats['addresses'] += len(batch)
+        domains.update(value.rpartition('@')[2].lower() for _, value in batch)
+        results.put(('results', index, responses))
+
+    if store_path is not None:
+        options['store'].close()
+
+    stats['domains'] = len(domains)
+    stats['mx_cache'] = mx_cache.stats()
+    stats['catch_all_cache'] = catch_all_cache.stats()
+    results.put(('stats', index, stats))
+
+
+class ShardedExecutor:
+    """
+    Verifies the addresses over a pool of processes. The addresses are
+    sharded by the CRC32 of their domain so that each worker keeps its
+    own DNS cache and SMTP sessions warm for the domains it owns. The
+    results are streamed back to the parent as soon as a batch is done
+    and are therefore not in the order of the input
+
+    When the iteration stops early, or is interrupted, the workers are
+    asked to stop after their current batch and are terminated if they
+    did not exit after `shutdown_timeout` seconds
+
+    The session budget of the `identities` pool is split evenly
+    between the workers, see `IdentityPool.split`
+
+    >>> with ShardedExecutor(workers=8, check_smtp=False) as executor:
+    ...     for response in executor.run(['foo@gmail.com', 'bar@outlook.com']):
+    ...         print(response)
+    ... executor.stats
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 100, queue_size: int = 8, shutdown_timeout: float = 30, **options):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.shutdown_timeout = shutdown_timeout
+        self.options = options
+
+        store = options.pop('store', None)
+        if store is not None:
+            options['store_path'] = store.path
+
+        # Every worker gets a copy of the sender identities so
+        # each one only gets its share of their session budget
+        identities = options.get('identities')
+        if identities is not None:
+            options['identities'] = identities.split(self.workers)
+        self.stats: Dict[int, Dict[str, Any]] = {}
+        self.errors: List[str] = []
+        self._processes: List[multiprocessing.Process] = []
+        self._tasks: List[multiprocessing.Queue] = []
+        self._results: Optional[multiprocessing.Queue] = None
+        self._stopping = threading.Event()
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.workers} workers>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def _start(self) -> multiprocessing.Queue:
+        results = self._results = multiprocessing.Queue()
+        for index in range(self.workers):
+            # Bounded queues keep the parent from
+            # reading the whole input in advance
+            tasks = multiprocessing.Queue(maxsize=self.queue_size)
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(index, tasks, results, self.options),
+                name=f'py_email_verifier-worker-{index}',
+                daemon=True
+            )
+            process.start()
+            self._tasks.append(tasks)
+            self._processes.append(process)
+        return results
+
+    def _put(self, index: int, batch: Optional[List[Tuple[int, str]]]):
+        while not self._stopping.is_set():
+            try:
+                self._tasks[index].put(batch, timeout=0.1)
+            except queue.Full:
+                continue
+            else:
+                return
+
+    def _dispatch(self, items: Iterable[Tuple[int, str]]):
+        batches: List[List[Tuple[int, str]]] = [[] for _ in range(self.workers)]
+        try:
+            for offset, value in items:
+                if self._stopping.is_set():
+                    return
+
+                index = get_shard(value, self.workers)
+                batches[index].append((offset, value))
+                if len(batches[index]) >= self.batch_size:
+                    self._put(index, batches[index])
+                    batches[index] = []
+
+            for index, batch in enumerate(batches):
+                if batch:
+                    self._put(index, batch)
+        except Exception:
+            self.errors.append(traceback.format_exc())
+        finally:
+            for index in range(self.workers):
+                self._put(index, _STOP)
+
+    def run(self, values: Iterable[str], start: int = 0) -> Iterator[Dict[str, Any]]:
+        """Verifies the addresses and yields the JSON response of each
+        one of them. The offset of the first value is `start`"""
+        return self.run_items((start + offset, value) for offset, value in enumerate(values))
+
+    def run_items(self, items: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+        results = self._start()
+        self._dispatcher = threading.Thread(target=self._dispatch, args=(items,), daemon=True)
+        self._dispatcher.start()
+
+        try:
+            while len(self.stats) < self.workers:
+                responses = self._receive(results.get())
+                if responses:
+                    yield from responses
+        finally:
+            self.shutdown()
+
+    def _receive(self, message: Tuple[str, int, Any]) -> Optional[List[Dict[str, Any]]]:
+        kind, index, payload = message
+        if kind == 'stats':
+            self.stats[index] = payload
+        elif kind == 'error':
+            self.errors.append(payload)
+        else:
+            return payload
+        return None
+
+    def shutdown(self):
+        """Asks the workers that are still running to stop after their
+        current batch and terminates the ones that did not exit after
+        the timeout"""
+        self._stopping.set()
+        deadline = time.monotonic() + self.shutdown_timeout
+
+        # The dispatcher stops within one put attempt unless
+        # it is blocked on reading the input, in which case
+        # its batches are never sent
+        if self._dispatcher is not None:
+            self._dispatcher.join(1)
+            self._dispatcher = None
+
+        for process, tasks in zip(self._processes, self._tasks):
+            if not process.is_alive():
+                continue
+
+            # Drop the batches that were not started yet
+            try:
+                while True:
+                    tasks.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                tasks.put(_STOP, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                pass
+        # The workers cannot exit before the parent read what
+        # they have sent, their statistics come last
+        results = self._results
+        while results is not None and len(self.stats) < len(self._processes) and time.monotonic() < deadline:
+            try:
+                self._receive(results.get(timeout=0.1))
+            except queue.Empty:
+                if not any(process.is_alive() for process in self._processes):
+                    break
+
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+        for tasks in self._tasks:
+            tasks.cancel_join_thread()
+        self._processes = []
+        self._tasks = []
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals of the statistics reported by the workers"""
+        return {
+            'workers': len(self.stats),
+            'addresses': sum(item['addresses'] for item in self.stats.values()),
+            'batches': sum(item['batches'] for item in self.stats.values()),
+            'busy_time': sum(item['busy_time'] for item in self.stats.values()),
+            'errors': len(self.errors)
+        }
+
+
+def run_parallel_pipeline(stream: IO[str], output: IO[str], *, file_format: str = 'text', column: str = 'email', checkpoint: Optional[Checkpoint] = None, workers: Optional[int] = None, batch_size: int = 100, queue_size: int = 1000, **options) -> int:
+    """Same as `run_pipeline` but the addresses are verified by a pool
+    of processes. The rows are written in the order they complete and
+    at most `queue_size` rows are waiting for each worker"""
+    start = checkpoint.load() if checkpoint is not None else 0
+    items = ((item.offset, item.value) for item in read_addresses(stream, file_format, column, start))
+
+    executor = ShardedExecutor(
+        workers=workers,
+        batch_size=batch_size,
+        queue_size=max(1, queue_size // batch_size),
+        **options
+    )
+
+    count = 0
+    for response in executor.run_items(items):
+        output.write(json.dumps(response) + '\n')
+        count += 1
+
+        if checkpoint is not None and checkpoint.complete(response['offset']):
+            output.flush()
+            checkpoint.save()
+
+    output.flush()
+    if checkpoint is not None:
+        checkpoint.save()
+    return count
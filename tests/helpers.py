@@ -0,0 +1,12 @@
+class FakeClock:
+    """Timer that only moves when `sleep` is called
+    or when `now` is changed by the test"""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from benchmarks.import_time import (LAZY_MODULES, SYNTAX_IMPORT_BUDGET,
+                                    SYNTAX_LAZY_MODULES,
+                                    get_lazy_modules_loaded, measure_import)
+from benchmarks.run import MODES, benchmark, generate_addresses
+from benchmarks.stub_dns import StubResolver
+from py_email_verifier import resolvers
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.verifiers import dns_verifier
+
+
+class TestStubResolver(TestCase):
+    def setUp(self):
+        dns_verifier.mx_cache.clear()
+        dns_verifier.host_address_cache.clear()
+        self.stub = StubResolver({'gmail.com': [(20, 'mx2.local'), (5, 'mx1.local')]}, default=None)
+        self.previous = resolvers.set_resolver(self.stub)
+
+    def tearDown(self):
+        resolvers.set_resolver(self.previous)
+        dns_verifier.mx_cache.clear()
+        dns_verifier.host_address_cache.clear()
+
+    def test_injection(self):
+        email = EmailAddress('Kendall@gmail.com')
+        self.assertSetEqual(set(dns_verifier.verify_dns(email)), {'mx1.local', 'mx2.local'})
+        self.assertListEqual(email.sort_mx_records(), ['mx1.local', 'mx2.local'])
+
+        with self.assertRaises(Exception):
+            dns_verifier.verify_dns(EmailAddress('Kendall@unknown.test'))
+        # The MX hosts have no address, their A and
+        # AAAA records are queried without any answer
+        self.assertEqual(self.stub.queries, 6)
+
+
+class TestBenchmarks(TestCase):
+    def test_modes(self):
+        addresses = generate_addresses(20, 4)
+        server_options = {'permanent_ratio': 0.2, 'temporary_ratio': 0.1}
+
+        for mode in MODES:
+            with self.subTest(mode=mode):
+                result = benchmark(mode, addresses, server_options, concurrency=4, trace_memory=False)
+                self.assertEqual(result['addresses'], 20)
+                self.assertGreater(result['connections'], 0)
+
+
+class TestImportTime(TestCase):
+    def test_syntax_entry_point(self):
+        timings = []
+        for _ in range(3):
+            seconds, loaded = measure_import('py_email_verifier.syntax')
+            self.assertListEqual(get_lazy_modules_loaded(loaded, SYNTAX_LAZY_MODULES), [])
+            timings.append(seconds)
+        self.assertLess(min(timings), SYNTAX_IMPORT_BUDGET)
+
+    def test_lazy_verifiers(self):
+        for module in ('py_email_verifier.validators', 'py_email_verifier.pipeline'):
+            with self.subTest(module=module):
+                _, loaded = measure_import(module)
+                self.assertListEqual(get_lazy_modules_loaded(loaded, LAZY_MODULES), [])
+
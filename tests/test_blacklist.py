@@ -0,0 +1,68 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from py_email_verifier.blacklist import Blacklist, blacklist
+from py_email_verifier.exceptions import DomainBlacklistedError
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.validators import validate_many, validate_or_fail
+from tests.helpers import FakeClock
+
+
+class TestBlacklist(TestCase):
+    def setUp(self):
+        self.timer = FakeClock()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'domains.txt')
+        self.write('# Blocked domains\nexample.com\n.example.org\n*.bücher.de\n')
+        self.blacklist = Blacklist([self.path], check_interval=10, timer=self.timer)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, content, mtime=None):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_exact_and_suffix_rules(self):
+        self.assertTrue(self.blacklist.is_blacklisted('foo@example.com'))
+        self.assertTrue(self.blacklist.is_blacklisted('foo@EXAMPLE.com'))
+        self.assertFalse(self.blacklist.is_blacklisted('foo@mail.example.com'))
+
+        self.assertTrue(self.blacklist.is_blacklisted('foo@example.org'))
+        self.assertTrue(self.blacklist.is_blacklisted('foo@a.b.example.org'))
+        self.assertFalse(self.blacklist.is_blacklisted('foo@anexample.org'))
+
+        self.assertTrue(self.blacklist.is_blacklisted(EmailAddress('foo@shop.bücher.de')))
+        self.assertFalse(self.blacklist.is_blacklisted('foo@gmail.com'))
+
+    def test_hot_reload(self):
+        self.write('gmail.com\n', mtime=1)
+        self.assertTrue(self.blacklist.is_blacklisted('foo@example.com'))
+
+        self.timer.now = 11
+        self.assertFalse(self.blacklist.is_blacklisted('foo@example.com'))
+        self.assertTrue(self.blacklist.is_blacklisted('foo@gmail.com'))
+        self.assertFalse(self.blacklist.reload_if_changed())
+
+    def test_default_lists(self):
+        self.assertIn('foo@mailinator.com', blacklist)
+        self.assertIn('foo@eu.yopmail.com', blacklist)
+
+
+class TestValidators(TestCase):
+    def test_validate_or_fail(self):
+        with self.assertRaises(DomainBlacklistedError):
+            validate_or_fail('foo@mailinator.com', check_dns=False)
+
+    def test_validate_many(self):
+        results = list(validate_many(
+            ['foo@mailinator.com', 'foo@gmail.com'],
+            check_dns=False,
+            check_smtp=False
+        ))
+        self.assertFalse(results[0].result)
+        self.assertIn('blacklisted', results[0].evaluation)
+        self.assertTrue(results[1].result)
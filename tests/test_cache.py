@@ -0,0 +1,69 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from dns import resolver
+from dns.resolver import Answer
+
+from py_email_verifier.cache import TTLCache
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.verifiers import dns_verifier
+from tests.helpers import FakeClock
+
+
+class TestTTLCache(TestCase):
+    def setUp(self):
+        self.timer = FakeClock()
+        self.cache = TTLCache(maxsize=2, ttl=10, timer=self.timer)
+
+    def test_expiration(self):
+        self.cache.set('gmail.com', 1)
+        self.assertEqual(self.cache.get('gmail.com'), 1)
+
+        self.timer.now = 11
+        self.assertIsNone(self.cache.get('gmail.com'))
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_lru_eviction(self):
+        self.cache.set('a.com', 1)
+        self.cache.set('b.com', 2)
+        self.cache.get('a.com')
+        self.cache.set('c.com', 3)
+
+        self.assertIn('a.com', self.cache)
+        self.assertNotIn('b.com', self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+
+
+class TestMXCache(TestCase):
+    def setUp(self):
+        dns_verifier.mx_cache.clear()
+        self.email = EmailAddress('Timothe@digitalille.fr')
+
+    def tearDown(self):
+        dns_verifier.mx_cache.clear()
+
+    def test_positive_answers_are_cached(self):
+        answer = Mock(spec=Answer)
+        answer.rrset = Mock(ttl=300)
+
+        with patch.object(resolver, 'resolve', return_value=answer) as mock_resolve:
+            for _ in range(3):
+                self.assertIs(dns_verifier.get_mx_records(self.email), answer)
+            self.assertEqual(mock_resolve.call_count, 1)
+
+        self.assertEqual(dns_verifier.mx_cache.hits, 2)
+
+    def test_negative_answers_are_cached(self):
+        with patch.object(resolver, 'resolve', side_effect=resolver.NXDOMAIN) as mock_resolve:
+            for _ in range(2):
+                with self.assertRaises(Exception):
+                    dns_verifier.get_mx_records(self.email)
+            self.assertEqual(mock_resolve.call_count, 1)
+
+    def test_timeouts_are_not_cached(self):
+        with patch.object(resolver, 'resolve', side_effect=resolver.Timeout) as mock_resolve:
+            for _ in range(2):
+                with self.assertRaises(Exception):
+                    dns_verifier.get_mx_records(self.email)
+            self.assertEqual(mock_resolve.call_count, 2)
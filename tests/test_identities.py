@@ -0,0 +1,194 @@
+import asyncio
+import pickle
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.verifiers import smtp_verifier
+from py_email_verifier.verifiers.identities import (IdentityPool,
+                                                    SenderIdentity,
+                                                    parse_identity)
+from py_email_verifier.verifiers.smtp_verifier import (smtp_check,
+                                                       smtp_check_many)
+from tests.helpers import FakeClock
+
+
+class TestIdentityPool(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.identities = [SenderIdentity(f'192.0.2.{i}', f'mx{i}.example.com') for i in range(3)]
+
+    def create_pool(self, **kwargs):
+        kwargs.setdefault('rate', 1)
+        return IdentityPool(self.identities, timer=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def acquire(self, pool: IdentityPool) -> SenderIdentity:
+        identity = pool.acquire()
+        if identity is None:
+            self.fail('No sender identity available')
+        return identity
+
+    def test_round_robin(self):
+        pool = self.create_pool()
+        names = [self.acquire(pool).source_address for _ in range(3)]
+        self.assertListEqual(names, ['192.0.2.0', '192.0.2.1', '192.0.2.2'])
+
+        # Every identity is out of budget until the next second
+        self.assertEqual(self.acquire(pool).source_address, '192.0.2.0')
+        self.assertEqual(self.clock.now, 1)
+
+    def test_least_loaded(self):
+        pool = self.create_pool(strategy='least_loaded', rate=10)
+        first = self.acquire(pool)
+        second = self.acquire(pool)
+        self.assertIsNot(first, second)
+
+        pool.release(first)
+        self.assertIs(pool.acquire(), self.identities[2])
+        self.assertIs(pool.acquire(), first)
+
+    def test_max_wait(self):
+        pool = self.create_pool(rate=0.1, max_wait=5)
+        for _ in range(3):
+            self.assertIsNotNone(pool.acquire())
+        self.assertIsNone(pool.acquire())
+
+    def test_quarantine(self):
+        pool = self.create_pool(block_threshold=2, quarantine_time=60)
+        identity = self.identities[0]
+
+        pool.record(identity, 'rcpt', 550, 'No such user')
+        pool.record(identity, 'mail', 554, 'Sender rejected')
+        pool.record(identity, 'rcpt', 250, 'OK')
+        pool.record(identity, 'rcpt', 550, 'Blocked using zen.spamhaus.org')
+        self.assertFalse(pool.is_quarantined(identity))
+
+        pool.record(identity, 'banner', 421, 'Too busy')
+        self.assertTrue(pool.is_quarantined(identity))
+        self.assertNotIn(identity, [pool.acquire() for _ in range(4)])
+
+        stats = pool.stats()[identity.name]
+        self.assertDictEqual(stats['rejections'], {'rcpt': 2, 'mail': 1, 'banner': 1})
+        self.assertEqual((stats['probes'], stats['accepted'], stats['blocks']), (3, 1, 3))
+        self.assertTrue(stats['quarantined'])
+
+        self.clock.now += 60
+        self.assertFalse(pool.is_quarantined(identity))
+
+    def test_unknown_recipient_not_block(self):
+        pool = self.create_pool(block_threshold=3)
+        identity = self.identities[0]
+
+        for _ in range(5):
+            pool.record(identity, 'rcpt', 550, '5.4.1 Recipient address rejected: Access denied')
+            pool.record(identity, 'rcpt', 452, '4.5.3 Too many recipients')
+        pool.record(identity, 'ehlo', 502, 'Command not implemented')
+        self.assertFalse(pool.is_quarantined(identity))
+        self.assertEqual(pool.stats()[identity.name]['blocks'], 0)
+
+        pool.record(identity, 'rcpt', 550, '5.7.1 Service unavailable, Client host blocked using Spamhaus')
+        pool.record(identity, 'ehlo', 421, '4.7.0 Try again later')
+        pool.record(identity, 'banner', 554, '5.7.1 Connection refused')
+        self.assertTrue(pool.is_quarantined(identity))
+
+    def test_pickle(self):
+        pool = self.create_pool(rate=4, burst=8)
+        pool.acquire()
+
+        copy = pickle.loads(pickle.dumps(pool))
+        self.assertEqual(self.acquire(copy).source_address, '192.0.2.1')
+
+        shares = pool.split(4)
+        self.assertEqual((shares.rate, shares.burst), (1, 2))
+        self.assertListEqual([x.name for x in shares.identities], [x.name for x in self.identities])
+        self.assertIsNot(shares.identities[0], self.identities[0])
+
+    def test_parse_identity(self):
+        identity = parse_identity('192.0.2.10,,probe@example.com')
+        self.assertEqual(identity.source, ('192.0.2.10', 0))
+        self.assertIsNone(identity.helo_host)
+        if identity.from_address is None:
+            self.fail('The sender address was not parsed')
+        self.assertEqual(identity.from_address.email, 'probe@example.com')
+
+        with self.assertRaises(ValueError):
+            parse_identity('a,b,c,d')
+
+
+class TestSenderIdentities(IsolatedAsyncioTestCase):
+    """The server refuses the senders of the blocked
+    domain and accepts every other recipient"""
+
+    async def asyncSetUp(self):
+        smtp_verifier.catch_all_cache.clear()
+        self.sessions = []
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        session = {'peer': writer.get_extra_info('peername')[0]}
+        self.sessions.append(session)
+
+        writer.write(b'220 localhost ESMTP\r\n')
+        while line := await reader.readline():
+            command = line.decode().strip()
+            if command.upper().startswith('EHLO'):
+                session['helo'] = command[5:]
+                writer.write(b'250 localhost\r\n')
+            elif command.upper().startswith('MAIL'):
+                session['mail'] = command
+                if '@blocked.example' in command:
+                    writer.write(b'554 5.7.1 Sender address rejected\r\n')
+                else:
+                    writer.write(b'250 OK\r\n')
+            elif command.upper().startswith('QUIT'):
+                writer.write(b'221 Bye\r\n')
+                break
+            else:
+                writer.write(b'250 OK\r\n')
+            await writer.drain()
+        writer.close()
+
+    async def test_identities(self):
+        identities = IdentityPool([
+            SenderIdentity('127.0.0.2', 'one.example', 'probe@blocked.example'),
+            SenderIdentity('127.0.0.3', 'two.example', 'probe@allowed.example')
+        ], rate=100, block_threshold=2)
+
+        results = []
+        for _ in range(4):
+            email = EmailAddress('Kendall@digitalille.fr')
+            result = await asyncio.to_thread(
+                smtp_check_many,
+                [email],
+                ['127.0.0.1'],
+                port=self.port,
+                check_catch_all=False,
+                identities=identities
+            )
+            results.append(result[email])
+
+        # The blocked identity is quarantined after its second
+        # session and the next ones all use the other identity
+        self.assertListEqual(results, [None, True, None, True])
+        peers = [session['peer'] for session in self.sessions]
+        self.assertListEqual(peers, ['127.0.0.2', '127.0.0.3', '127.0.0.2', '127.0.0.3'])
+        self.assertEqual(self.sessions[1]['helo'], 'two.example')
+        self.assertIn('probe@allowed.example', self.sessions[1]['mail'])
+
+        stats = identities.stats()
+        self.assertTrue(stats['127.0.0.2,one.example,probe@blocked.example']['quarantined'])
+        self.assertEqual(stats['127.0.0.3,two.example,probe@allowed.example']['accepted'], 2)
+
+        email = EmailAddress('Kendall@digitalille.fr')
+        self.assertListEqual(await asyncio.to_thread(smtp_check, email, ['127.0.0.1'], port=self.port, check_catch_all=False, identities=identities), [True])
+        self.assertEqual(self.sessions[-1]['peer'], '127.0.0.3')
+
+    async def test_source_address(self):
+        email = EmailAddress('Kendall@digitalille.fr')
+        result = await asyncio.to_thread(smtp_check, email, ['127.0.0.1'], port=self.port, check_catch_all=False, source_address='127.0.0.4')
+        self.assertListEqual(result, [True])
+        self.assertEqual(self.sessions[0]['peer'], '127.0.0.4')
@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from py_email_verifier import instrumentation
+from py_email_verifier.instrumentation import (Histogram, MetricsRegistry,
+                                               timed)
+
+
+class TestHistogram(TestCase):
+    def test_observe(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value)
+
+        self.assertListEqual(
+            histogram.cumulative_counts(),
+            [(0.1, 2), (1, 3), (float('inf'), 4)]
+        )
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.99), float('inf'))
+
+
+class TestMetricsRegistry(TestCase):
+    def setUp(self):
+        self.registry = instrumentation.add_sink(MetricsRegistry(buckets=(0.1, 1)))
+
+    def tearDown(self):
+        instrumentation.remove_sink(self.registry)
+
+    def test_no_sink(self):
+        instrumentation.remove_sink(self.registry)
+        timer = timed('rcpt', 'mx.gmail.com')
+        self.assertIs(timer, timed('mail'))
+        with timer:
+            timer.error = '550'
+
+    def test_errors(self):
+        with self.assertRaises(ConnectionError):
+            with timed('connect', 'mx.gmail.com'):
+                raise ConnectionError()
+
+        with timed('rcpt', 'mx.gmail.com') as timer:
+            timer.error = '550'
+
+        self.assertEqual(
+            self.registry.errors,
+            {
+                ('mx.gmail.com', 'connect', 'ConnectionError'): 1,
+                ('mx.gmail.com', 'rcpt', '550'): 1
+            }
+        )
+
+    def test_export(self):
+        self.registry.on_timing('dns', None, 0.05)
+        text = self.registry.export()
+        self.assertIn('# TYPE py_email_verifier_stage_duration_seconds histogram', text)
+        self.assertIn('py_email_verifier_stage_duration_seconds_bucket{stage="dns",le="0.1"} 1', text)
+        self.assertIn('py_email_verifier_stage_duration_seconds_bucket{stage="dns",le="+Inf"} 1', text)
+        self.assertIn('py_email_verifier_stage_duration_seconds_count{stage="dns"} 1', text)
+        self.assertIn('py_email_verifier_cache_hit_rate{cache="mx"}', text)
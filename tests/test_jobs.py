@@ -0,0 +1,114 @@
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from py_email_verifier import validators
+from py_email_verifier.jobs import BULK, INTERACTIVE, JobQueue
+from tests.helpers import FakeClock
+
+
+class TestJobQueue(TestCase):
+    def setUp(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.domains = []
+
+        def fake_verify_dns(email, timeout=10):
+            email.add_mx_records({'mx.local'}, {'mx.local': 10})
+            return {'mx.local'}
+
+        def fake_smtp_check_many(emails, **kwargs):
+            self.domains.append(emails[0].ace_formatted_domain)
+            self.started.set()
+            self.release.wait(5)
+            return {email: email.user.lower() == 'kendall' for email in emails}
+
+        patchers = [
+            patch.object(validators, 'verify_dns', side_effect=fake_verify_dns),
+            patch.object(validators, 'smtp_check_many', side_effect=fake_smtp_check_many)
+        ]
+        self.smtp_check_many = [patcher.start() for patcher in patchers][1]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+        self.jobs = JobQueue(workers=1, check_blacklist=False)
+        self.addCleanup(self.jobs.close)
+        self.addCleanup(self.release.set)
+
+    def test_deduplication(self):
+        first = self.jobs.submit(['Kendall@gmail.com', 'Timothe@gmail.com'])
+        self.assertTrue(self.started.wait(5))
+
+        second = self.jobs.submit(['Kendall@GMAIL.com', 'Kendall@gmail.com'])
+        self.release.set()
+
+        self.assertTrue(first.wait(5))
+        self.assertTrue(second.wait(5))
+        self.assertEqual(self.smtp_check_many.call_count, 1)
+        self.assertEqual(self.jobs.stats()['deduplicated'], 2)
+
+        results = second.ordered_results()
+        self.assertListEqual([item.email for item in results], ['Kendall@GMAIL.com', 'Kendall@gmail.com'])
+        self.assertListEqual([item.result for item in results], [True, True])
+
+    def test_priority_lanes(self):
+        self.jobs.submit(['Kendall@first.com'])
+        self.assertTrue(self.started.wait(5))
+
+        bulk = self.jobs.submit(['Kendall@bulk.com', 'Kendall@shared.com'], priority=BULK)
+        interactive = self.jobs.submit(['Kendall@shared.com'], priority=INTERACTIVE)
+        self.assertDictEqual(self.jobs.stats()['queued'], {BULK: 1, INTERACTIVE: 1})
+
+        self.release.set()
+        self.assertTrue(bulk.wait(5))
+        self.assertTrue(interactive.wait(5))
+        self.assertListEqual(self.domains, ['first.com', 'shared.com', 'bulk.com'])
+
+    def test_progress(self):
+        job = self.jobs.submit(['Kendall@gmail.com', 'not an email', 'Timothe@gmail.com'])
+        self.assertTrue(self.started.wait(5))
+
+        progress = job.progress()
+        self.assertEqual((progress['completed'], progress['total'], progress['done']), (1, 3, False))
+        self.assertFalse(job.partial_results()[1].result)
+
+        self.release.set()
+        offsets = [offset for offset, _ in job.iter_results(timeout=5)]
+        self.assertListEqual(offsets[:1], [1])
+        self.assertListEqual(sorted(offsets), [0, 1, 2])
+        self.assertListEqual([item.result for item in job.ordered_results()], [True, False, False])
+        self.assertEqual(job.progress()['ratio'], 1.0)
+
+    def test_check(self):
+        self.release.set()
+        result = self.jobs.check('Kendall@gmail.com', timeout=5)
+        if result is None:
+            self.fail('The check timed out')
+        self.assertTrue(result.result)
+
+    def test_retention(self):
+        self.release.set()
+        clock = FakeClock()
+        jobs = JobQueue(workers=1, check_blacklist=False, retention=60, max_jobs=2, timer=clock)
+        self.addCleanup(jobs.close)
+
+        first = jobs.submit(['Kendall@gmail.com'])
+        self.assertTrue(first.wait(5))
+
+        # The job of a single check is not kept
+        result = jobs.check('Timothe@gmail.com', timeout=5)
+        if result is None:
+            self.fail('The check timed out')
+        self.assertFalse(result.result)
+        self.assertListEqual(list(jobs.jobs), [first.id])
+
+        clock.now = 61
+        second = jobs.submit(['Kendall@outlook.com'])
+        self.assertListEqual(list(jobs.jobs), [second.id])
+        self.assertTrue(second.wait(5))
+
+        # The oldest finished jobs above the limit are removed
+        third = jobs.submit(['Kendall@yahoo.com'])
+        fourth = jobs.submit(['Kendall@icloud.com'])
+        self.assertListEqual(list(jobs.jobs), [third.id, fourth.id])
+        self.assertEqual(jobs.stats()['jobs'], 2)
@@ -1,6 +1,7 @@
 
 from unittest import TestCase
 
+from py_email_verifier.domains import normalize_domain
 from py_email_verifier.models import EmailAddress
 
 
@@ -15,6 +16,47 @@ class TestModels(TestCase):
         self.assertEqual(self.email.restructure, self.email)
         self.assertIsInstance(self.email.json_response(), dict)
 
+    def test_domain_normalization(self):
+        email = EmailAddress('kontakt@bücher.de')
+        self.assertEqual(email.ace_formatted_domain, 'xn--bcher-kva.de')
+        self.assertEqual(email.restructure, 'kontakt@xn--bcher-kva.de')
+
+        email = EmailAddress('admin@[IPv6:2001:db8::1]')
+        self.assertEqual(email.get_literal_ip, 'IPv6:2001:db8::1')
+        self.assertEqual(email.ace_formatted_domain, '[IPv6:2001:db8::1]')
+
+        hits = normalize_domain.cache_info().hits
+        EmailAddress('Kendall@digitalille.fr')
+        self.assertEqual(normalize_domain.cache_info().hits, hits + 1)
+
+    def test_sort_mx_records(self):
+        self.email.add_mx_records(
+            {'mx1.digitalille.fr', 'mx2.digitalille.fr', 'mx3.digitalille.fr'},
+            {'mx1.digitalille.fr': 20, 'mx2.digitalille.fr': 10, 'mx3.digitalille.fr': 30}
+        )
+        result = self.email.sort_mx_records()
+        self.assertEqual(
+            result,
+            ['mx2.digitalille.fr', 'mx1.digitalille.fr', 'mx3.digitalille.fr']
+        )
+
+    def test_state_is_not_shared(self):
+        other = EmailAddress('Kendall@digitalille.fr')
+        self.email.add_error('unknown_email')
+        self.email.add_message('mta-gw.infomaniak.ch', 550, b'No such user')
+
+        self.assertIn('unknown_email', self.email.evaluation)
+        self.assertNotIn('unknown_email', other.evaluation)
+        self.assertEqual(len(other.messages), 0)
+
+    def test_to_result(self):
+        self.email.add_error('catch_all')
+        result = self.email.to_result(True)
+        self.assertEqual(result.email, 'Timothe@digitalille.fr')
+        self.assertTrue(result.result)
+        self.assertTrue(result.risky)
+        self.assertIsInstance(result.evaluation, frozenset)
+
     def test_ns_lookup(self):
         result = self.email.ns_lookup()
         self.assertIsInstance(result, tuple)
@@ -0,0 +1,65 @@
+import io
+import json
+import os
+import tempfile
+import threading
+from itertools import count
+from unittest import TestCase
+
+from py_email_verifier.pipeline import Checkpoint, buffered, run_pipeline
+
+
+class TestPipeline(TestCase):
+    def setUp(self):
+        self.stream = io.StringIO(
+            'email\n'
+            'Timothe@digitalille.fr\n'
+            'not-an-email\n'
+            'k.akshay9721@gmail.com\n'
+        )
+
+    def _read_output(self, output):
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_syntax_only(self):
+        output = io.StringIO()
+        count = run_pipeline(self.stream, output, file_format='csv', check_dns=False)
+        self.assertEqual(count, 3)
+
+        rows = self._read_output(output)
+        self.assertEqual([row['offset'] for row in rows], [0, 1, 2])
+        self.assertEqual([row['result'] for row in rows], [True, False, True])
+
+    def test_resume_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checkpoint')
+            with open(path, 'w') as f:
+                f.write('2')
+
+            output = io.StringIO()
+            count = run_pipeline(
+                self.stream,
+                output,
+                file_format='csv',
+                check_dns=False,
+                checkpoint=Checkpoint(path)
+            )
+            self.assertEqual(count, 1)
+            self.assertEqual(self._read_output(output)[0]['offset'], 2)
+            self.assertEqual(Checkpoint(path).load(), 3)
+
+    def test_buffered_consumer_stops(self):
+        closed = threading.Event()
+
+        def produce():
+            try:
+                yield from count()
+            finally:
+                closed.set()
+
+        # Stopping the last stage stops every stage
+        # before it instead of blocking on a full queue
+        items = buffered(buffered(produce(), maxsize=2), maxsize=2)
+        self.assertEqual(next(items), 0)
+        items.close()
+        self.assertTrue(closed.wait(5))
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from dns import resolver
+
+from benchmarks.stub_dns import StubResolver
+from py_email_verifier.resolvers import MultiResolver
+from tests.helpers import FakeClock
+
+
+class FakeUpstreamResolver:
+    """Answers like the stub resolver after `latency` seconds
+    or raises `error` when one is given"""
+
+    def __init__(self, latency=0, error=None):
+        self.stub = StubResolver()
+        self.latency = latency
+        self.error = error
+        self.queries = 0
+
+    def resolve(self, qname, rdtype, lifetime=None):
+        self.queries += 1
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return self.stub.resolve(qname)
+
+
+
+class FakeAsyncUpstreamResolver(FakeUpstreamResolver):
+    async def resolve(self, qname, rdtype, lifetime=None):
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return self.stub.resolve(qname)
+
+
+def create_resolver(*upstreams, **kwargs):
+    instance = MultiResolver([f'10.0.0.{i}' for i in range(len(upstreams))], **kwargs)
+    for upstream, fake in zip(instance.upstreams, upstreams):
+        upstream.resolver = fake
+        upstream.async_resolver = fake
+    return instance
+
+
+class TestMultiResolver(TestCase):
+    def test_race_slow_upstream(self):
+        slow, fast = FakeUpstreamResolver(latency=1), FakeUpstreamResolver()
+        instance = create_resolver(slow, fast, race_after=0.05)
+
+        start = time.perf_counter()
+        answer = instance.resolve('gmail.com')
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(answer.qname.to_text(), 'gmail.com.')
+        self.assertEqual((slow.queries, fast.queries), (1, 1))
+
+    def test_definitive_answer_is_not_raced(self):
+        upstream = FakeUpstreamResolver(error=resolver.NXDOMAIN())
+        instance = create_resolver(upstream, FakeUpstreamResolver())
+
+        with self.assertRaises(resolver.NXDOMAIN):
+            instance.resolve('unknown.test')
+        self.assertEqual(instance.upstreams[1].queries, 0)
+
+    def test_failing_upstream_is_sidelined(self):
+        timer = FakeClock()
+        failing = FakeUpstreamResolver(error=resolver.NoNameservers())
+        healthy = FakeUpstreamResolver()
+        instance = create_resolver(failing, healthy, failure_threshold=2, sideline_time=30, timer=timer)
+
+        for _ in range(6):
+            instance.resolve('gmail.com')
+
+        self.assertEqual(failing.queries, 2)
+        self.assertGreater(instance.upstreams[0].sidelined_until, 0)
+
+        timer.now = 31
+        self.assertEqual(len(instance.get_candidates()), 2)
+
+
+class TestAsyncMultiResolver(IsolatedAsyncioTestCase):
+    async def test_race_slow_upstream(self):
+        slow, fast = FakeAsyncUpstreamResolver(latency=1), FakeAsyncUpstreamResolver()
+        instance = create_resolver(slow, fast, race_after=0.05)
+
+        start = time.perf_counter()
+        await instance.async_resolve('gmail.com')
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual((slow.queries, fast.queries), (1, 1))
@@ -0,0 +1,98 @@
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from py_email_verifier.__main__ import main
+from py_email_verifier.models import VerificationResult
+from py_email_verifier.results import (Evaluation, ResultReader,
+                                       ResultWriter, from_flags, to_flags,
+                                       write_results)
+
+
+class TestEvaluation(TestCase):
+    def test_flags(self):
+        codes = {'catch_all', 'Timeout or dead server or port 25 blocked'}
+        flags = to_flags(codes)
+        self.assertEqual(flags, Evaluation.CATCH_ALL | Evaluation.SMTP_UNREACHABLE)
+        self.assertSetEqual(from_flags(flags), codes)
+
+        self.assertEqual(to_flags(['something_new']), Evaluation.OTHER)
+        self.assertEqual(VerificationResult('a@b.com', True, evaluation=frozenset(['protected'])).flags, Evaluation.PROTECTED)
+
+
+class TestResultFile(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'results.pevr')
+
+        self.results = [
+            VerificationResult('Kendall@gmail.com', True),
+            VerificationResult('unknown@gmail.com', False, evaluation=frozenset(['unknown_email'])),
+            VerificationResult('Timothé@exemple.fr', True, True, frozenset(['catch_all'])),
+            VerificationResult('not an email', False, evaluation=frozenset(['syntax_error'])),
+            VerificationResult('Kendall@slow.com', None, evaluation=frozenset(['smtp_protocol', 'Timeout or dead server or port 25 blocked']))
+        ]
+
+    def test_round_trip(self):
+        # Chunks of two rows in order to cover the boundaries
+        self.assertEqual(write_results(self.path, self.results, chunk_size=2), 5)
+
+        with ResultReader(self.path) as reader:
+            self.assertEqual(len(reader), 5)
+            self.assertEqual(len(reader.chunks), 3)
+            self.assertListEqual(list(reader), self.results)
+            self.assertEqual(reader[2], self.results[2])
+            self.assertEqual(reader[-1], self.results[4])
+            self.assertListEqual(list(reader.offsets()), [0, 1, 2, 3, 4])
+
+            with self.assertRaises(IndexError):
+                reader[5]
+
+    def test_select(self):
+        write_results(self.path, self.results, chunk_size=2)
+
+        with ResultReader(self.path) as reader:
+            self.assertListEqual(list(reader.select(result=True)), [0, 2])
+            self.assertListEqual(list(reader.select(result=None)), [4])
+            self.assertListEqual(list(reader.select(include=Evaluation.CATCH_ALL, risky=True)), [2])
+            self.assertListEqual(list(reader.select(exclude=Evaluation.SYNTAX_ERROR | Evaluation.UNKNOWN_EMAIL, result=False)), [])
+            self.assertEqual(reader.counts()['smtp_protocol'], 1)
+
+    def test_close_with_views(self):
+        write_results(self.path, self.results, chunk_size=2)
+
+        reader = ResultReader(self.path)
+        columns = reader.columns(reader.chunks[0])
+        reader.close()
+
+        with self.assertRaises(ValueError):
+            columns[3][0]
+
+    def test_empty_file(self):
+        ResultWriter(self.path).close()
+        with ResultReader(self.path) as reader:
+            self.assertEqual(len(reader), 0)
+            self.assertListEqual(list(reader), [])
+
+    def test_convert(self):
+        source = os.path.join(self.directory.name, 'results.jsonl')
+        with open(source, 'w', encoding='utf-8') as f:
+            for offset, result in enumerate(self.results):
+                response = result.json_response()
+                response['offset'] = 10 + offset
+                f.write(json.dumps(response) + '\n')
+
+        self.assertEqual(main(['convert', source, self.path]), 0)
+        with ResultReader(self.path) as reader:
+            self.assertListEqual(list(reader), self.results)
+            self.assertListEqual(list(reader.offsets()), [10, 11, 12, 13, 14])
+
+    def test_stream(self):
+        stream = io.BytesIO()
+        with ResultWriter(stream) as writer:
+            writer.write_many(self.results)
+        self.assertFalse(stream.closed)
+        self.assertLess(len(stream.getvalue()), len(''.join(json.dumps(x.json_response()) for x in self.results)))
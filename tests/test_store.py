@@ -0,0 +1,142 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from py_email_verifier import validators
+from py_email_verifier.exceptions import AddressNotDeliverableError
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.store import VerificationStore
+from py_email_verifier.validators import validate_many, validate_or_fail
+from py_email_verifier.verifiers.smtp_verifier import catch_all_cache
+from tests.helpers import FakeClock
+
+
+class TestVerificationStore(TestCase):
+    def setUp(self):
+        self.timer = FakeClock()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'verifications.db')
+        self.store = VerificationStore(self.path, mx_ttl=10, address_ttl=100, batch_size=2, timer=self.timer)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_ttl(self):
+        self.store.set_mx_records('gmail.com', {'mx1.gmail.com': 5})
+        self.assertEqual(self.store.get_mx_records('GMAIL.com'), ({'mx1.gmail.com': 5}, None))
+
+        self.timer.now = 11
+        self.assertIsNone(self.store.get_mx_records('gmail.com'))
+
+    def test_batched_writes(self):
+        email = EmailAddress('Kendall@gmail.com')
+        email.add_error('catch_all')
+        self.store.set_result(email, True)
+        self.assertEqual(self.store._connection.execute('SELECT COUNT(*) FROM addresses').fetchone()[0], 0)
+
+        result = self.store.get_result(EmailAddress('Kendall@GMAIL.com'))
+        if result is None:
+            self.fail('The catch-all result was not stored')
+        self.assertTrue(result.result)
+        self.assertTrue(result.risky)
+
+        self.store.set_catch_all('gmail.com', False)
+        self.assertEqual(self.store._connection.execute('SELECT COUNT(*) FROM addresses').fetchone()[0], 1)
+
+        self.store.close()
+        self.store = VerificationStore(self.path, timer=self.timer)
+        self.assertFalse(self.store.get_catch_all('gmail.com'))
+        self.assertIsNotNone(self.store.get_result(email))
+
+    def test_prune(self):
+        self.store.set_mx_records('gmail.com', {'mx1.gmail.com': 5})
+        self.store.set_result(EmailAddress('Kendall@gmail.com'), False)
+
+        self.timer.now = 50
+        deleted = self.store.prune()
+        self.assertEqual(deleted, {'mx_records': 1, 'catch_all': 0, 'addresses': 0})
+        self.assertEqual(self.store.stats()['addresses'], 1)
+
+
+class TestValidatorsWithStore(TestCase):
+    def setUp(self):
+        catch_all_cache.clear()
+        self.store = VerificationStore(':memory:')
+
+    def tearDown(self):
+        self.store.close()
+
+    def fake_verify_dns(self, email, timeout=10):
+        email.add_mx_records({'mx.gmail.com'}, {'mx.gmail.com': 10})
+        return {'mx.gmail.com'}
+
+    def test_warm_run(self):
+        with patch.object(validators, 'verify_dns', side_effect=self.fake_verify_dns) as verify_dns:
+            with patch.object(validators, 'smtp_check', return_value=[True]) as smtp_check:
+                validate_or_fail('Kendall@gmail.com', store=self.store)
+                validate_or_fail('Timothe@gmail.com', store=self.store)
+                _, results = validate_or_fail('Kendall@gmail.com', store=self.store)
+
+        self.assertListEqual(results, [True])
+        self.assertEqual(verify_dns.call_count, 1)
+        self.assertEqual(smtp_check.call_count, 2)
+
+    def test_validate_many(self):
+        def fake_smtp_check_many(emails, **kwargs):
+            for email in emails:
+                if email.user != 'Kendall':
+                    email.add_error('unknown_email')
+            return {email: email.user == 'Kendall' for email in emails}
+
+        emails = ['Kendall@gmail.com', 'Timothe@gmail.com']
+        with patch.object(validators, 'verify_dns', side_effect=self.fake_verify_dns):
+            with patch.object(validators, 'smtp_check_many', side_effect=fake_smtp_check_many) as smtp_check_many:
+                first = [item.result for item in validate_many(emails, store=self.store)]
+                second = [item.result for item in validate_many(emails, store=self.store)]
+
+        self.assertListEqual(first, [True, False])
+        self.assertListEqual(second, first)
+        self.assertEqual(smtp_check_many.call_count, 1)
+
+    def test_temporary_failure_not_cached(self):
+        def fake_smtp_check(email, **kwargs):
+            # The server replied 450 to the RCPT command
+            email.add_error('attempt_rejected')
+            return [False]
+
+        def fake_smtp_check_many(emails, **kwargs):
+            for email in emails:
+                email.add_error('attempt_rejected')
+            return dict.fromkeys(emails)
+
+        with patch.object(validators, 'verify_dns', side_effect=self.fake_verify_dns):
+            with patch.object(validators, 'smtp_check', side_effect=fake_smtp_check) as smtp_check:
+                validate_or_fail('Kendall@gmail.com', store=self.store)
+                validate_or_fail('Kendall@gmail.com', store=self.store)
+
+            with patch.object(validators, 'smtp_check_many', side_effect=fake_smtp_check_many) as smtp_check_many:
+                list(validate_many(['Timothe@gmail.com'], store=self.store))
+                list(validate_many(['Timothe@gmail.com'], store=self.store))
+
+        self.assertEqual(smtp_check.call_count, 2)
+        self.assertEqual(smtp_check_many.call_count, 2)
+        self.assertIsNone(self.store.get_result(EmailAddress('Kendall@gmail.com')))
+
+    def test_unknown_email_cached(self):
+        def fake_smtp_check(email, **kwargs):
+            email.add_error('unknown_email')
+            raise AddressNotDeliverableError(email, 'No such user')
+
+        # The cold and the warm runs have the same outcome
+        outcomes = []
+        with patch.object(validators, 'verify_dns', side_effect=self.fake_verify_dns):
+            with patch.object(validators, 'smtp_check', side_effect=fake_smtp_check) as smtp_check:
+                for _ in range(2):
+                    with self.assertRaises(AddressNotDeliverableError) as context:
+                        validate_or_fail('Kendall@gmail.com', store=self.store)
+                    outcomes.append((str(context.exception), str(context.exception.email)))
+
+        self.assertEqual(outcomes[0], outcomes[1])
+        self.assertEqual(smtp_check.call_count, 1)
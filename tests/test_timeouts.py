@@ -0,0 +1,112 @@
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from py_email_verifier.exceptions import CircuitOpenError
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.verifiers.async_smtp_verifier import AsyncSMTPVerifier
+from py_email_verifier.verifiers.smtp_verifier import SMTPVerifier
+from py_email_verifier.verifiers.timeouts import AdaptiveTimeouts
+from tests.helpers import FakeClock
+
+
+class TestAdaptiveTimeouts(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.timeouts = AdaptiveTimeouts(
+            quantile=0.9,
+            multiplier=3,
+            min_timeout=0.5,
+            window=10,
+            min_samples=5,
+            failure_threshold=3,
+            cool_off=60,
+            timer=self.clock
+        )
+
+    def test_deadline_from_latency(self):
+        self.assertEqual(self.timeouts.get_timeout('mx.local', 'rcpt', 10), 10)
+
+        for duration in (0.1, 0.2, 0.3, 0.4, 1):
+            self.timeouts.observe('mx.local', 'rcpt', duration)
+        self.assertEqual(self.timeouts.get_timeout('mx.local', 'rcpt', 10), 3)
+        # Never longer than the configured timeout and
+        # other stages and hosts are not affected
+        self.assertEqual(self.timeouts.get_timeout('mx.local', 'rcpt', 2), 2)
+        self.assertEqual(self.timeouts.get_timeout('mx.local', 'connect', 10), 10)
+        self.assertEqual(self.timeouts.get_timeout('other.local', 'rcpt', 10), 10)
+
+        for _ in range(10):
+            self.timeouts.observe('mx.local', 'rcpt', 0.01)
+        self.assertEqual(self.timeouts.get_timeout('mx.local', 'rcpt', 10), 0.5)
+
+    def test_circuit_breaker(self):
+        for _ in range(2):
+            self.timeouts.record_timeout('mx.local', 'banner')
+        self.timeouts.check('mx.local')
+
+        self.timeouts.record_timeout('mx.local', 'connect')
+        with self.assertRaises(CircuitOpenError):
+            self.timeouts.check('mx.local')
+        self.assertTrue(self.timeouts.stats()['mx.local']['open'])
+
+        # The next timeout after the cool-off opens it again
+        self.clock.now = 61
+        self.timeouts.check('mx.local')
+        self.timeouts.record_timeout('mx.local', 'connect')
+        self.assertTrue(self.timeouts.is_open('mx.local'))
+
+        # Accepting the connection is not enough to close it
+        self.clock.now = 122
+        self.timeouts.observe('mx.local', 'connect', 0.1)
+        self.timeouts.record_timeout('mx.local', 'banner')
+        self.assertTrue(self.timeouts.is_open('mx.local'))
+
+        self.clock.now = 183
+        self.timeouts.observe('mx.local', 'banner', 0.1)
+        self.timeouts.record_timeout('mx.local', 'connect')
+        self.assertFalse(self.timeouts.is_open('mx.local'))
+
+
+class TestTarpittingHost(IsolatedAsyncioTestCase):
+    """A server which accepts connections but never
+    sends its banner"""
+
+    async def asyncSetUp(self):
+        self.connections = 0
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.timeouts = AdaptiveTimeouts(failure_threshold=2, cool_off=60)
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        await reader.read()
+        writer.close()
+
+    def _check(self):
+        email = EmailAddress('Kendall@digitalille.fr')
+        instance = SMTPVerifier(email, recip=email, timeout=0.2, port=self.port, adaptive_timeouts=self.timeouts)
+        return email, instance.check('127.0.0.1')
+
+    async def test_fail_fast(self):
+        for _ in range(2):
+            _, result = await asyncio.to_thread(self._check)
+            self.assertFalse(result)
+        self.assertEqual(self.connections, 2)
+
+        start = time.perf_counter()
+        email, result = await asyncio.to_thread(self._check)
+        self.assertFalse(result)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertIn('smtp_protocol', email.evaluation)
+        self.assertEqual(self.connections, 2)
+
+        email = EmailAddress('Kendall@digitalille.fr')
+        instance = AsyncSMTPVerifier(email, recip=email, port=self.port, adaptive_timeouts=self.timeouts)
+        self.assertFalse(await instance.check('127.0.0.1'))
+        self.assertIn('smtp_protocol', email.evaluation)
+        self.assertEqual(self.connections, 2)
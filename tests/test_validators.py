@@ -0,0 +1,81 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from py_email_verifier import validators
+from py_email_verifier.models import EmailAddress
+from py_email_verifier.validators import validate_many, validate_or_fail
+
+
+class TestValidateMany(TestCase):
+    emails = [
+        'Timothe@gmail.com',
+        'Kendall@outlook.com',
+        'not-an-email',
+        'unknown@gmail.com',
+        'Lucile@outlook.com'
+    ]
+
+    def setUp(self):
+        verify_dns = patch.object(validators, 'verify_dns', side_effect=self.fake_verify_dns)
+        smtp_check_many = patch.object(validators, 'smtp_check_many', side_effect=self.fake_smtp_check_many)
+        self.verify_dns = verify_dns.start()
+        self.smtp_check_many = smtp_check_many.start()
+        self.addCleanup(verify_dns.stop)
+        self.addCleanup(smtp_check_many.stop)
+
+    def fake_verify_dns(self, email, timeout=10):
+        records = {f'mx.{email.domain}'}
+        email.add_mx_records(records, {f'mx.{email.domain}': 10})
+        return records
+
+    def fake_smtp_check_many(self, emails, mx_records, **kwargs):
+        return {email: email.user != 'unknown' for email in emails}
+
+    def test_ordered(self):
+        results = list(validate_many(self.emails))
+        self.assertListEqual([x.email for x in results], self.emails)
+        self.assertListEqual([x.result for x in results], [True, True, False, False, True])
+        self.assertIn('syntax_error', results[2].evaluation)
+
+        # One lookup and one SMTP call for each domain
+        self.assertEqual(self.verify_dns.call_count, 2)
+        self.assertEqual(self.smtp_check_many.call_count, 2)
+
+    def test_unordered(self):
+        results = list(validate_many(self.emails, ordered=False))
+        self.assertEqual(results[0].email, 'not-an-email')
+        self.assertListEqual(sorted(x.email for x in results), sorted(self.emails))
+
+    def test_chunk_size(self):
+        consumed = []
+
+        def read():
+            for email in self.emails:
+                consumed.append(email)
+                yield email
+
+        results = validate_many(read(), chunk_size=2)
+        self.assertEqual(next(results).email, 'Timothe@gmail.com')
+        self.assertEqual(len(consumed), 2)
+
+        # The rejected row stays in position across the chunks
+        self.assertListEqual([x.email for x in results], self.emails[1:])
+        self.assertEqual(self.verify_dns.call_count, 4)
+
+        with self.assertRaises(ValueError):
+            list(validate_many(self.emails, chunk_size=0))
+
+
+class TestValidateOrFail(TestCase):
+    def fake_verify_dns(self, email, timeout=10):
+        email.add_mx_records({'mx.gmail.com'})
+        return {'mx.gmail.com'}
+
+    def test_from_address(self):
+        with patch.object(validators, 'verify_dns', side_effect=self.fake_verify_dns):
+            with patch.object(validators, 'smtp_check', return_value=[True]) as smtp_check:
+                validate_or_fail('Kendall@gmail.com', smtp_from_address='probe@example.com')
+
+        sender = smtp_check.call_args.kwargs['from_address']
+        self.assertIsInstance(sender, EmailAddress)
+        self.assertEqual(sender.restructure, 'probe@example.com')
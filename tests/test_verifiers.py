@@ -1,13 +1,34 @@
-from unittest import TestCase
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import Mock, patch
 
+from dns import asyncresolver
 from dns.resolver import Answer
+
+from benchmarks.fake_smtp import FakeSMTPServer
+from benchmarks.stub_dns import StubResolver
+from py_email_verifier import instrumentation, resolvers, validators
+from py_email_verifier.exceptions import AddressNotDeliverableError
 from py_email_verifier.models import EmailAddress
-from py_email_verifier.verifiers.dns_verifier import (clean_mx_records,
+from py_email_verifier.pipeline import PipelineItem, smtp_stage
+from py_email_verifier.validators import validate_many
+from py_email_verifier.verifiers import dns_verifier, smtp_verifier
+from py_email_verifier.verifiers.dns_verifier import (async_get_mx_records,
+                                                      clean_mx_records,
                                                       get_mx_records,
                                                       verify_dns)
 from py_email_verifier.verifiers.email_verifier import (check_is_ip_address,
-                                                        validate_email)
-from py_email_verifier.verifiers.smtp_verifier import SMTPVerifier, simple_verify_smtp
+                                                        validate_email,
+                                                        validate_syntax_many)
+from py_email_verifier.verifiers.async_smtp_verifier import async_smtp_check
+from py_email_verifier.verifiers.scheduler import SMTPScheduler
+from py_email_verifier.verifiers.smtp_verifier import (SMTPConnectionPool,
+                                                       SMTPVerifier,
+                                                       simple_verify_smtp,
+                                                       smtp_check,
+                                                       smtp_check_many)
+from tests.helpers import FakeClock
 
 
 class TestMixin:
@@ -36,6 +57,28 @@ class TestEmailVerifiers(TestMixin, TestCase):
         result = check_is_ip_address('192.168.1.1')
         self.assertTrue(result)
 
+    def test_validate_syntax_many(self):
+        values = [
+            'foo@bar.com',
+            'kontakt@bücher.de',
+            'admin@[2001:db8::1]',
+            'foo.bar.com',
+            'foo bar@bar.com',
+            'foo@bar',
+            None
+        ]
+        mask, reasons = validate_syntax_many(values)
+        self.assertListEqual(mask, [True, True, True, False, False, False, False])
+        self.assertListEqual(
+            reasons,
+            [None, None, None, 'missing_at', 'invalid_user', 'invalid_domain', 'invalid_type']
+        )
+
+        for value, valid in zip(values, mask):
+            if valid:
+                with self.subTest(email=value):
+                    self.assertTrue(validate_email(EmailAddress(value)))
+
 
 class TestDNSVerifiers(TestMixin, TestCase):
     def test_get_mx_records(self):
@@ -73,6 +116,429 @@ class TestDNSVerifiers(TestMixin, TestCase):
                 print(result)
 
 
+class TestAsyncDNSVerifiers(IsolatedAsyncioTestCase):
+    def setUp(self):
+        dns_verifier.mx_cache.clear()
+
+    def tearDown(self):
+        dns_verifier.mx_cache.clear()
+
+    async def test_duplicate_queries_are_coalesced(self):
+        answer = Mock(spec=Answer)
+        answer.rrset = Mock(ttl=300)
+
+        async def resolve(**kwargs):
+            await asyncio.sleep(0.01)
+            return answer
+
+        emails = [EmailAddress(f'user{i}@digitalille.fr') for i in range(5)]
+        with patch.object(asyncresolver, 'resolve', side_effect=resolve) as mock_resolve:
+            tasks = [async_get_mx_records(email, use_cache=False) for email in emails]
+            results = await asyncio.gather(*tasks)
+            self.assertEqual(mock_resolve.call_count, 1)
+
+        for result in results:
+            with self.subTest(result=result):
+                self.assertIs(result, answer)
+
+    async def test_error_evaluation(self):
+        email = EmailAddress('Timothe@digitalille.fr')
+        with patch.object(asyncresolver, 'resolve', side_effect=dns_verifier.resolver.Timeout):
+            with self.assertRaises(Exception):
+                await async_get_mx_records(email)
+        self.assertIn('timeout', email.evaluation)
+
+
+class TestAddressPrefetch(IsolatedAsyncioTestCase):
+    def setUp(self):
+        dns_verifier.mx_cache.clear()
+        dns_verifier.host_address_cache.clear()
+        self.stub = StubResolver(
+            {'gmail.com': ['mx.fake.test'], 'nomx.test': [], 'dead.test': []},
+            default=None,
+            addresses={'mx.fake.test': ['127.0.0.1'], 'nomx.test': ['127.0.0.1', '::1']}
+        )
+        self.previous = resolvers.set_resolver(self.stub)
+
+    def tearDown(self):
+        resolvers.set_resolver(self.previous)
+        dns_verifier.mx_cache.clear()
+        dns_verifier.host_address_cache.clear()
+
+    def test_glue_addresses(self):
+        self.assertSetEqual(set(verify_dns(EmailAddress('Kendall@gmail.com'))), {'mx.fake.test'})
+        self.assertListEqual(dns_verifier.get_host_addresses('mx.fake.test'), ['127.0.0.1'])
+        self.assertEqual(self.stub.queries, 1)
+
+    def test_implicit_mx(self):
+        email = EmailAddress('Kendall@nomx.test')
+        self.assertSetEqual(set(verify_dns(email)), {'nomx.test'})
+        self.assertDictEqual(email.mx_preferences, {'nomx.test': 0})
+        self.assertListEqual(dns_verifier.get_host_addresses('nomx.test'), ['127.0.0.1', '::1'])
+
+        email = EmailAddress('Kendall@dead.test')
+        with self.assertRaises(Exception):
+            verify_dns(email)
+        self.assertIn('dead_server', email.evaluation)
+
+    async def test_connect_to_resolved_address(self):
+        # The host name of the MX record is unknown
+        # to the system resolver
+        with FakeSMTPServer(user_prefix='kendall') as server:
+            email = EmailAddress('Kendall@gmail.com')
+            records = await dns_verifier.async_verify_dns(email)
+            self.assertEqual(await async_smtp_check(email, records, port=server.port), [True])
+
+            email = EmailAddress('Kendall@gmail.com')
+            records = verify_dns(email)
+            self.assertEqual(smtp_check(email, records, port=server.port, check_catch_all=False), [True])
+
+
+class FakeSMTPServerMixin:
+    """Runs a local SMTP server which only accepts the
+    known users unless it is configured as a catch-all
+    server"""
+
+    catch_all = False
+    greylist = False
+    users = ('TIMOTHE', 'KENDALL')
+    bind_host = '127.0.0.1'
+    # RCPT replies and delays for each local
+    # address the server was dialled on
+    rcpt_replies = {}
+    rcpt_delays = {}
+
+    def _accepts(self, command):
+        return self.catch_all or any(f'<{user}@' in command for user in self.users)
+
+    async def asyncSetUp(self):
+        smtp_verifier.catch_all_cache.clear()
+        self.greylisted = set()
+        self.commands = []
+        self.dialled = []
+        self.connections = 0
+        self.server = await asyncio.start_server(self._handle, self.bind_host, 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        address = writer.get_extra_info('sockname')[0]
+        writer.write(b'220 localhost ESMTP\r\n')
+        while line := await reader.readline():
+            command = line.decode().strip().upper()
+            self.commands.append(command)
+            if command.startswith('RCPT'):
+                self.dialled.append(address)
+                await asyncio.sleep(self.rcpt_delays.get(address, 0))
+
+            if command.startswith('EHLO'):
+                writer.write(b'250-localhost\r\n250 SIZE 1000\r\n')
+            elif command.startswith('RCPT') and address in self.rcpt_replies:
+                writer.write(self.rcpt_replies[address])
+            elif command.startswith('RCPT') and self.greylist and command not in self.greylisted:
+                self.greylisted.add(command)
+                writer.write(b'450 Greylisted, try again later\r\n')
+            elif command.startswith('RCPT') and not self._accepts(command):
+                writer.write(b'550 No such user\r\n')
+            elif command.startswith('QUIT'):
+                writer.write(b'221 Bye\r\n')
+                break
+            else:
+                writer.write(b'250 OK\r\n')
+            await writer.drain()
+        writer.close()
+
+
+class TestAsyncSMTPVerifier(FakeSMTPServerMixin, IsolatedAsyncioTestCase):
+    async def test_deliverable(self):
+        email = EmailAddress('Timothe@digitalille.fr')
+        result = await async_smtp_check(email, {'127.0.0.1'}, port=self.port)
+        self.assertEqual(result, [True])
+
+    async def test_undeliverable(self):
+        email = EmailAddress('unknown@digitalille.fr')
+        result = await async_smtp_check(email, {'127.0.0.1'}, port=self.port)
+        self.assertEqual(result, [False])
+        self.assertIn('unknown_email', email.evaluation)
+
+
+class TestMultipleRecipients(FakeSMTPServerMixin, IsolatedAsyncioTestCase):
+    async def test_single_session(self):
+        emails = [
+            EmailAddress('Timothe@digitalille.fr'),
+            EmailAddress('unknown@digitalille.fr'),
+            EmailAddress('Kendall@digitalille.fr')
+        ]
+        results = await asyncio.to_thread(
+            smtp_check_many,
+            emails,
+            ['127.0.0.1'],
+            max_recipients=2,
+            port=self.port
+        )
+        self.assertEqual(list(results.values()), [True, False, True])
+
+        mail_commands = [x for x in self.commands if x.startswith('MAIL')]
+        self.assertEqual(len(mail_commands), 2)
+        self.assertIn('RSET', self.commands)
+
+
+class TestInstrumentation(FakeSMTPServerMixin, IsolatedAsyncioTestCase):
+    async def test_stage_timings(self):
+        registry = instrumentation.add_sink(instrumentation.MetricsRegistry())
+        self.addCleanup(instrumentation.remove_sink, registry)
+
+        emails = [
+            EmailAddress('Timothe@digitalille.fr'),
+            EmailAddress('unknown@digitalille.fr')
+        ]
+        await asyncio.to_thread(
+            smtp_check_many,
+            emails,
+            ['127.0.0.1'],
+            port=self.port,
+            check_catch_all=False
+        )
+
+        for stage in ('connect', 'ehlo', 'mail', 'rcpt'):
+            with self.subTest(stage=stage):
+                self.assertIn(stage, registry.histograms)
+        self.assertEqual(registry.histograms['rcpt'].count, 2)
+        self.assertEqual(registry.errors, {('127.0.0.1', 'rcpt', '550'): 1})
+
+        text = registry.export()
+        self.assertIn('py_email_verifier_errors_total{host="127.0.0.1",stage="rcpt",error="550"} 1', text)
+        self.assertIn('py_email_verifier_cache_hits_total{cache="catch_all"}', text)
+
+
+class TestSMTPConnectionPool(FakeSMTPServerMixin, IsolatedAsyncioTestCase):
+    async def test_sessions_are_reused(self):
+        pool = SMTPConnectionPool(max_per_host=1, port=self.port)
+
+        for name in ('Timothe', 'unknown', 'Kendall'):
+            email = EmailAddress(f'{name}@digitalille.fr')
+            with self.subTest(email=email):
+                results = await asyncio.to_thread(
+                    smtp_check_many,
+                    [email],
+                    ['127.0.0.1'],
+                    pool=pool
+                )
+                self.assertEqual(results[email], name != 'unknown')
+
+        self.assertEqual(self.connections, 1)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+        await asyncio.to_thread(pool.close)
+        self.assertEqual(pool.stats()['total'], 0)
+
+
+class TestMXFallback(FakeSMTPServerMixin, IsolatedAsyncioTestCase):
+    """The server answers on two loopback addresses
+    which stand for the MX hosts of the domain"""
+
+    bind_host = '0.0.0.0'
+    records = ['127.0.0.1', '127.0.0.2']
+
+    def _smtp_check(self, email, **kwargs):
+        return asyncio.to_thread(
+            smtp_check,
+            email,
+            self.records,
+            port=self.port,
+            check_catch_all=False,
+            **kwargs
+        )
+
+    async def test_permanent_failure_stops(self):
+        email = EmailAddress('unknown@digitalille.fr')
+        with self.assertRaises(AddressNotDeliverableError):
+            await self._smtp_check(email)
+        self.assertListEqual(self.dialled, ['127.0.0.1'])
+        self.assertIn('unknown_email', email.evaluation)
+
+    async def test_temporary_failure_falls_through(self):
+        self.rcpt_replies = {'127.0.0.1': b'450 Mailbox unavailable\r\n'}
+        email = EmailAddress('Timothe@digitalille.fr')
+        self.assertListEqual(await self._smtp_check(email), [False, True])
+        self.assertListEqual(self.dialled, ['127.0.0.1', '127.0.0.2'])
+
+    async def test_hedged_check(self):
+        self.rcpt_replies = {'127.0.0.1': b'450 Mailbox unavailable\r\n'}
+        self.rcpt_delays = {'127.0.0.1': 0.5}
+        email = EmailAddress('Timothe@digitalille.fr')
+
+        start = time.perf_counter()
+        self.assertListEqual(await self._smtp_check(email, hedge_delay=0.05), [True])
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertListEqual(self.dialled, ['127.0.0.1', '127.0.0.2'])
+
+        # The slower probe answers once the result was returned
+        # and does not change the evaluation of the email
+        await asyncio.sleep(0.6)
+        self.assertNotIn('attempt_rejected', email.evaluation)
+
+    async def test_pool(self):
+        self.rcpt_replies = {'127.0.0.1': b'450 Mailbox unavailable\r\n'}
+        pool = SMTPConnectionPool(port=self.port)
+
+        email = EmailAddress('Timothe@digitalille.fr')
+        self.assertListEqual(await self._smtp_check(email, pool=pool), [False, True])
+
+        self.rcpt_replies = {}
+        with self.assertRaises(AddressNotDeliverableError):
+            await self._smtp_check(EmailAddress('unknown@digitalille.fr'), pool=pool)
+        self.assertListEqual(self.dialled, ['127.0.0.1', '127.0.0.2', '127.0.0.1'])
+        await asyncio.to_thread(pool.close)
+
+
+class TestCatchAllDetection(FakeSMTPServerMixin, IsolatedAsyncioTestCase):
+    catch_all = True
+
+    async def test_catch_all_domain(self):
+        emails = [
+            EmailAddress('Timothe@digitalille.fr'),
+            EmailAddress('unknown@digitalille.fr')
+        ]
+        results = await asyncio.to_thread(
+            smtp_check_many,
+            emails,
+            ['127.0.0.1'],
+            port=self.port
+        )
+        self.assertEqual(list(results.values()), [True, True])
+        self.assertTrue(smtp_verifier.catch_all_cache.get('digitalille.fr'))
+
+        for email in emails:
+            with self.subTest(email=email):
+                self.assertTrue(email.is_risky)
+
+        # The verdict is cached and the
+        # server is not contacted anymore
+        await asyncio.to_thread(smtp_check_many, emails, ['127.0.0.1'], port=self.port)
+        self.assertEqual(self.connections, 1)
+
+
+class TestAmbiguousCatchAllDetection(FakeSMTPServerMixin, IsolatedAsyncioTestCase):
+    greylist = True
+
+    async def test_unknown_verdict_is_cached(self):
+        results = []
+        for _ in range(2):
+            email = EmailAddress('Timothe@digitalille.fr')
+            results.append(await asyncio.to_thread(smtp_check, email, ['127.0.0.1'], port=self.port))
+        self.assertListEqual(results, [[False], [True]])
+
+        # The greylisted probe is not sent again
+        # while its None verdict is cached
+        self.assertIn('digitalille.fr', smtp_verifier.catch_all_cache)
+        self.assertIsNone(smtp_verifier.catch_all_cache.get('digitalille.fr'))
+        self.assertEqual(self.connections, 3)
+
+
+class TestSMTPScheduler(FakeSMTPServerMixin, IsolatedAsyncioTestCase):
+    greylist = True
+
+    def _run_scheduler(self, emails, mx_records=('127.0.0.1',), **kwargs):
+        clock = FakeClock()
+        self.scheduler = SMTPScheduler(
+            timer=clock,
+            sleep=clock.sleep,
+            jitter=0,
+            port=self.port,
+            check_catch_all=False,
+            **kwargs
+        )
+        self.scheduler.submit(emails, list(mx_records))
+        return clock, list(self.scheduler.run())
+
+    async def test_greylisted_addresses_are_retried(self):
+        emails = [
+            EmailAddress('Timothe@digitalille.fr'),
+            EmailAddress('unknown@digitalille.fr')
+        ]
+        clock, results = await asyncio.to_thread(
+            self._run_scheduler,
+            emails,
+            greylist_delay=300
+        )
+        self.assertEqual(dict(results), {emails[0]: True, emails[1]: False})
+        self.assertEqual(clock.now, 300)
+
+    async def test_pipeline_stage(self):
+        clock = FakeClock()
+        items = []
+        for offset, value in enumerate(['Timothe@digitalille.fr', 'unknown@digitalille.fr']):
+            item = PipelineItem(offset, value)
+            item.email = EmailAddress(value)
+            item.email.add_mx_records({'127.0.0.1'})
+            items.append(item)
+
+        scheduling = {'timer': clock, 'sleep': clock.sleep, 'jitter': 0, 'greylist_delay': 300}
+        stage = smtp_stage(items, scheduling=scheduling, port=self.port, check_catch_all=False)
+        results = await asyncio.to_thread(list, stage)
+        self.assertListEqual([item.result for item in results], [True, False])
+        self.assertEqual(clock.now, 300)
+
+    async def test_validate_many(self):
+        def fake_verify_dns(email, timeout=10):
+            email.add_mx_records({'127.0.0.1'})
+            return {'127.0.0.1'}
+
+        clock = FakeClock()
+        emails = ['Timothe@digitalille.fr', 'unknown@digitalille.fr']
+        scheduling = {'timer': clock, 'sleep': clock.sleep, 'jitter': 0, 'greylist_delay': 300, 'port': self.port}
+
+        with patch.object(validators, 'verify_dns', side_effect=fake_verify_dns):
+            results = await asyncio.to_thread(
+                list,
+                validate_many(emails, smtp_check_catch_all=False, smtp_scheduling=scheduling)
+            )
+        self.assertListEqual([item.result for item in results], [True, False])
+        self.assertEqual(clock.now, 300)
+
+    async def test_rate_limit(self):
+        emails = [
+            EmailAddress('Timothe@digitalille.fr'),
+            EmailAddress('Timothe@example.com')
+        ]
+        clock, _ = await asyncio.to_thread(
+            self._run_scheduler,
+            emails,
+            host_rate=0.1,
+            host_burst=1,
+            greylist_delay=1,
+            backoff=1
+        )
+        # The host only allows one session every 10 seconds
+        # and each domain needs two sessions
+        self.assertEqual(clock.now, 30)
+
+    async def test_rate_limit_fallback_hosts(self):
+        email = EmailAddress('Timothe@digitalille.fr')
+        clock, results = await asyncio.to_thread(
+            self._run_scheduler,
+            [email],
+            # Nothing listens on the first host
+            mx_records=('127.0.0.2', '127.0.0.1'),
+            host_rate=0.1,
+            host_burst=1,
+            greylist_delay=1,
+            backoff=1
+        )
+        self.assertEqual(dict(results), {email: True})
+
+        # Both hosts are dialled on each attempt, the retry waits
+        # for the budget of the first host and the second session
+        # waits one more second for the budget of the domain
+        self.assertSetEqual(set(self.scheduler.host_limiter._buckets), {'127.0.0.2', '127.0.0.1'})
+        self.assertEqual(clock.now, 11)
+
+
 class TestSMTPVerifier(TestMixin, TestCase):
     @classmethod
     def setUpClass(cls):
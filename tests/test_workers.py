@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from py_email_verifier.blacklist import blacklist
+from py_email_verifier.workers import ShardedExecutor, get_shard
+
+
+class TestShardedExecutor(TestCase):
+    def setUp(self):
+        self.emails = [f'user{i}@domain{i % 20}.com' for i in range(500)]
+        self.emails.extend(['foo.bar.com', 'foo@mailinator.com'])
+
+    def test_get_shard(self):
+        self.assertEqual(get_shard('foo@Gmail.com', 4), get_shard('bar@gmail.com', 4))
+        shards = {get_shard(email, 4) for email in self.emails}
+        self.assertGreater(len(shards), 1)
+
+    def test_run(self):
+        executor = ShardedExecutor(workers=3, batch_size=50, check_dns=False, check_blacklist=blacklist.is_blacklisted)
+        responses = list(executor.run(self.emails))
+
+        offsets = sorted(response['offset'] for response in responses)
+        self.assertListEqual(offsets, list(range(len(self.emails))))
+
+        by_offset = {response['offset']: response for response in responses}
+        self.assertIn('syntax_error', by_offset[500]['evaluation'])
+        self.assertIn('blacklisted', by_offset[501]['evaluation'])
+
+        self.assertEqual(len(executor.stats), 3)
+        self.assertEqual(executor.summary()['addresses'], len(self.emails))
+        self.assertEqual(sum(item['domains'] for item in executor.stats.values()), 22)
+
+    def test_early_stop(self):
+        executor = ShardedExecutor(workers=2, batch_size=10, check_dns=False, shutdown_timeout=5)
+        for index, _ in enumerate(executor.run(self.emails * 10)):
+            if index == 20:
+                break
+
+        self.assertListEqual(executor._processes, [])
+        self.assertEqual(len(executor.stats), 2)